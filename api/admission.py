@@ -0,0 +1,191 @@
+import math
+import time
+from collections import deque
+from typing import Mapping, Optional, Sequence
+from urllib.parse import parse_qs
+import anyio
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from services.metrics import metrics
+
+# Route classes from highest to lowest priority
+ROUTE_CLASSES = ("auth", "point", "list", "bulk")
+# Never queued or shed: health checks and long-lived change streams
+EXEMPT_PATHS = ("/health",)
+
+
+class Shed(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("event", "granted", "cancelled")
+
+    def __init__(self):
+        self.event = anyio.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    """Concurrency slots shared by route classes, handed out by priority.
+
+    A request runs when fewer than `capacity` requests are running overall
+    and fewer than `limits[class]` of its class. Otherwise it queues behind
+    its class; a freed slot goes to the highest-priority class that can
+    use it. Requests waiting longer than `max_wait[class]`, or arriving to a
+    queue of `max_queue`, are shed. Runs on the event loop, so no locking.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        limits: Mapping[str, int],
+        max_wait: Mapping[str, float],
+        max_queue: int = 200,
+    ):
+        self.capacity = capacity
+        self.limits = {name: limits.get(name, capacity) for name in ROUTE_CLASSES}
+        self.max_wait = {name: max_wait.get(name, 1.0) for name in ROUTE_CLASSES}
+        self.max_queue = max_queue
+        self.running = 0
+        self.in_flight = dict.fromkeys(ROUTE_CLASSES, 0)
+        self.queues: dict[str, deque[_Waiter]] = {name: deque() for name in ROUTE_CLASSES}
+        # Moving average of time spent queued, the basis for Retry-After
+        self.queue_wait = dict.fromkeys(ROUTE_CLASSES, 0.0)
+
+    def _can_run(self, route_class: str) -> bool:
+        return self.running < self.capacity and self.in_flight[route_class] < self.limits[route_class]
+
+    def _start(self, route_class: str) -> None:
+        self.running += 1
+        self.in_flight[route_class] += 1
+        metrics.incr(f"admission.admitted.{route_class}")
+
+    def _record_wait(self, route_class: str, waited: float) -> None:
+        self.queue_wait[route_class] += (waited - self.queue_wait[route_class]) * 0.2
+
+    def _gauges(self, route_class: str) -> None:
+        metrics.set_gauge(f"admission.queue_depth.{route_class}", len(self.queues[route_class]))
+        metrics.set_gauge(f"admission.in_flight.{route_class}", self.in_flight[route_class])
+
+    def retry_after(self, route_class: str) -> int:
+        """Seconds a shed client should wait, from recent queue waits"""
+        return max(1, math.ceil(self.queue_wait[route_class]))
+
+    def _shed(self, route_class: str) -> Shed:
+        metrics.incr(f"admission.shed.{route_class}")
+        return Shed(self.retry_after(route_class))
+
+    async def acquire(self, route_class: str) -> None:
+        """Wait for a slot, or raise `Shed`"""
+        queue = self.queues[route_class]
+        if not queue and self._can_run(route_class):
+            self._start(route_class)
+            self._gauges(route_class)
+            return
+        if len(queue) >= self.max_queue:
+            raise self._shed(route_class)
+
+        waiter = _Waiter()
+        queue.append(waiter)
+        self._gauges(route_class)
+        queued_at = time.monotonic()
+        try:
+            with anyio.move_on_after(self.max_wait[route_class]):
+                await waiter.event.wait()
+        except BaseException:
+            # Cancelled from outside (deadline, disconnect): give back a slot granted meanwhile
+            waiter.cancelled = True
+            if waiter.granted:
+                self.release(route_class)
+            raise
+        finally:
+            self._record_wait(route_class, time.monotonic() - queued_at)
+            self._gauges(route_class)
+        if not waiter.granted:
+            waiter.cancelled = True
+            raise self._shed(route_class)
+
+    def release(self, route_class: str) -> None:
+        self.running -= 1
+        self.in_flight[route_class] -= 1
+        self._dispatch()
+        self._gauges(route_class)
+
+    def _dispatch(self) -> None:
+        for route_class in ROUTE_CLASSES:
+            queue = self.queues[route_class]
+            while queue and self._can_run(route_class):
+                waiter = queue.popleft()
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._start(route_class)
+                waiter.event.set()
+            # Drop abandoned waiters left at the head so queue depth stays honest
+            while queue and queue[0].cancelled:
+                queue.popleft()
+            self._gauges(route_class)
+
+
+class AdmissionMiddleware:
+    """Admit requests by route class and shed overload with 503 + Retry-After.
+
+    Classes, highest priority first: `auth` (/auth/*), `point` (one entity:
+    /{resource}/{id} and single-entity writes), `list` (collections and
+    search) and `bulk` (`bulk_paths` prefixes, and lists asking for more
+    than `bulk_limit` rows).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        capacity: int = 40,
+        limits: Optional[Mapping[str, int]] = None,
+        max_wait: Optional[Mapping[str, float]] = None,
+        max_queue: int = 200,
+        bulk_paths: Sequence[str] = (),
+        bulk_limit: int = 500,
+    ):
+        self.app = app
+        self.controller = AdmissionController(capacity, limits or {}, max_wait or {}, max_queue)
+        self.bulk_paths = tuple(bulk_paths)
+        self.bulk_limit = bulk_limit
+
+    def classify(self, scope: Scope) -> Optional[str]:
+        """Route class of a request, or None when it bypasses admission"""
+        path = scope["path"]
+        if path in EXEMPT_PATHS or path.rstrip("/").endswith("/changes"):
+            return None
+        if path.startswith("/auth/"):
+            return "auth"
+        if path.startswith(self.bulk_paths):
+            return "bulk"
+        if path.rstrip("/").rsplit("/", 1)[-1].isdigit() or scope["method"] != "GET":
+            return "point"
+        limit = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("limit")
+        if limit and limit[-1].isdigit() and int(limit[-1]) > self.bulk_limit:
+            return "bulk"
+        return "list"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route_class = self.classify(scope) if scope["type"] == "http" else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire(route_class)
+        except Shed as shed:
+            response = JSONResponse(
+                {"detail": "Server is overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(shed.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
@@ -0,0 +1,26 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from api.dependencies import get_db, require_permissions
+from services.audit import audit_writer
+from schemas.schemas import AuditLogPage
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+@router.get("/", response_model=AuditLogPage)
+def read_audit_log(
+    resource: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    actor_id: Optional[int] = None,
+    before_id: Optional[int] = Query(None, ge=1, description="`next` from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user=Depends(require_permissions(["audit:read"])),
+):
+    """List audit entries, newest first, one keyset page at a time"""
+    # One extra row tells whether another page exists
+    items = audit_writer.page(
+        db, limit + 1, before_id=before_id, resource=resource, entity_id=entity_id, actor_id=actor_id
+    )
+    next_id = items[limit - 1].id if len(items) > limit else None
+    return {"items": items[:limit], "next": next_id}
@@ -1,16 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from datetime import timedelta
-from api.dependencies import get_db, get_current_user
+from api.dependencies import get_db, get_current_user, security
 from services.user_service import user_service
-from services.auth_service import auth_service
-from schemas.schemas import UserLogin, Token, UserResponse
+from services.auth_service import auth_service, REFRESH_TOKEN
+from services.rate_limiter import login_rate_limiter
+from services.permission_graph import permission_graph
+from models.models import User
+from schemas.schemas import UserLogin, Token, UserResponse, RefreshRequest
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
-    """Authenticate user and return access token"""
+def login(user_credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
+    """Authenticate user and return access and refresh tokens"""
+    client_ip = request.client.host if request.client else None
+    login_rate_limiter.check(user_credentials.username, client_ip)
     user = user_service.authenticate(db, user_credentials.username, user_credentials.password)
     
     if not user:
@@ -25,14 +31,35 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Inactive user"
         )
     
-    access_token_expires = timedelta(minutes=auth_service.access_token_expire_minutes)
-    access_token = auth_service.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer"}
+    return auth_service.create_token_pair(user.username)
+
+@router.post("/refresh", response_model=Token)
+def refresh(body: RefreshRequest, db: Session = Depends(get_db)):
+    """Rotate a refresh token into a new access and refresh token pair"""
+    username, family = auth_service.rotate_refresh_token(body.refresh_token)
+    user = user_service.get_by_username(db, username)
+
+    if user is None or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+
+    return auth_service.create_token_pair(user.username, family)
+
+@router.post("/logout")
+async def logout(
+    body: Optional[RefreshRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Revoke the current access token and, if given, its refresh token"""
+    auth_service.revoke_token(credentials.credentials)
+    if body is not None:
+        auth_service.revoke_token(body.refresh_token, REFRESH_TOKEN)
+    return {"message": "Logged out successfully"}
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: UserResponse = Depends(get_current_user)):
-    """Get current user information"""
-    return current_user
\ No newline at end of file
+def read_users_me(current_user: User = Depends(get_current_user)):
+    """Get current user information, with roles taken from the permission graph"""
+    roles = permission_graph.snapshot().roles_for(current_user.role_ids)
+    return {**current_user.to_dict(), "roles": roles}
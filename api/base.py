@@ -1,11 +1,21 @@
+import functools
 import json
+import time
 
+import anyio
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic, List, Type
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from typing import Any, Callable, TypeVar, Generic, List, Optional, Type, Union
+from pydantic import TypeAdapter, create_model
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status, Body
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from api.dependencies import get_db, require_permissions
-from services.base import BaseService
+from database.connection import db_manager
+from services.base import BaseService, ExpandMode
+from services import deadline as deadlines, rows
+from services.changes import change_feed
+from services.idempotency import StoredResponse, idempotency
 from schemas.base import (
     BaseCreateSchema,
     BaseUpdateSchema,
@@ -14,6 +24,7 @@ from schemas.base import (
 )
 from models.base import BaseModel
 from starlette import status
+from config import settings
 
 
 ModelType = TypeVar("ModelType", bound=BaseModel)
@@ -21,6 +32,25 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseCreateSchema)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseUpdateSchema)
 ResponseSchemaType = TypeVar("ResponseSchemaType", bound=BaseResponseSchema)
 
+# "sync": plain def handlers, run by FastAPI on anyio's default threadpool
+# "async": coroutine handlers that await the blocking work on the router's
+#          own CapacityLimiter, so one resource cannot exhaust the shared pool
+ROUTE_MODES = ("sync", "async")
+
+_JSON = TypeAdapter(dict[str, Any])
+_ANY = TypeAdapter(Any)
+
+
+async def _keep_deadline() -> None:
+    pass
+
+
+def _walk(objects: list, path: str) -> list:
+    """Follow a dotted relationship path from each object, flattening collections"""
+    for name in path.split("."):
+        objects = [child for obj in objects for child in getattr(obj, name)]
+    return objects
+
 
 class BaseCRUDRouter(
     ABC, Generic[ModelType, CreateSchemaType, UpdateSchemaType, ResponseSchemaType]
@@ -35,15 +65,263 @@ class BaseCRUDRouter(
         create_schema: Type[CreateSchemaType],
         update_schema: Type[UpdateSchemaType],
         response_schema: Type[ResponseSchemaType],
+        name: Optional[str] = None,
+        mode: Optional[str] = None,
+        ids_schema: Optional[type] = None,
+        summary_schema: Optional[type] = None,
+        side_tables: Optional[dict[str, tuple[str, type]]] = None,
+        deadlines: Optional[dict[str, Optional[float]]] = None,
     ):
         self.service = service
         self.create_schema = create_schema
         self.update_schema = update_schema
         self.response_schema = response_schema
+        # Response shape per `expand` mode; resources without relationships
+        # serve the same schema for every mode
+        self.expand_schemas = {
+            "full": response_schema,
+            "ids": ids_schema or response_schema,
+            "none": summary_schema or response_schema,
+            "normalized": ids_schema or response_schema,
+        }
+        self._adapters = {
+            (expand, many): TypeAdapter(List[schema] if many else schema)
+            for expand, schema in self.expand_schemas.items()
+            for many in (True, False)
+        }
+        # expand=normalized: items use the ids schema and each related row is
+        # emitted once per table, e.g. {"roles": ("roles", RoleWithIds)}
+        self.side_tables = {
+            table: (path, TypeAdapter(List[schema]))
+            for table, (path, schema) in (side_tables or {}).items()
+        }
+        # The same shapes for row structs, which skip validation
+        self._row_dumpers = {
+            expand: rows.dumper(schema) for expand, schema in self.expand_schemas.items()
+        }
+        self._side_dumpers = {
+            table: rows.dumper(schema) for table, (_path, schema) in (side_tables or {}).items()
+        }
+        # Seconds each endpoint (by handler name) may take; None for no limit.
+        # Unlisted endpoints keep the app-wide REQUEST_DEADLINE_SECONDS
+        self.deadlines = {
+            "read_items": settings.list_deadline_seconds,
+            "search_items": settings.list_deadline_seconds,
+            # Long polls and event streams outlive any request budget
+            "read_changes": None,
+            **(deadlines or {}),
+        }
         self.resource = resource
+        self.name = name or resource.title()
+        # Documented response of the read endpoints: every expand shape. Reads
+        # are serialized by `_render`, so this only feeds OpenAPI
+        self.read_models = {
+            many: self._read_model(many, side_tables or {}) for many in (True, False)
+        }
+        self.mode = mode or settings.crud_route_mode
+        if self.mode not in ROUTE_MODES:
+            raise ValueError(f"Unknown route mode {self.mode!r}, expected one of {ROUTE_MODES}")
+        self.limiter = (
+            anyio.CapacityLimiter(settings.async_route_threads)
+            if self.mode == "async"
+            else None
+        )
         self.router = APIRouter(prefix=prefix, tags=[resource])
         self._setup_routes()
 
+    def _endpoint(self, func: Callable) -> Callable:
+        """Adapt a blocking handler to the router's execution mode"""
+        if self.mode == "sync":
+            return func
+
+        @functools.wraps(func)
+        async def endpoint(*args, **kwargs):
+            return await anyio.to_thread.run_sync(
+                functools.partial(func, *args, **kwargs), limiter=self.limiter
+            )
+
+        return endpoint
+
+    def _deadline(self, endpoint: str):
+        """Dependency applying an endpoint's budget to the request deadline"""
+        if endpoint not in self.deadlines:
+            return Depends(_keep_deadline)
+        budget = self.deadlines[endpoint]
+
+        async def set_deadline() -> None:
+            deadline = deadlines.current()
+            if deadline is not None:
+                deadline.set_budget(budget)
+
+        return Depends(set_deadline)
+
+    def _read_model(self, many: bool, side_tables: dict[str, tuple[str, type]]) -> Any:
+        """Union of the shapes one or many items take across expand modes"""
+        ids_schema = self.expand_schemas["ids"]
+        key = "items" if many else "item"
+        normalized = create_model(
+            f"{self.name}{'Page' if many else 'Item'}Normalized",
+            **{key: (List[ids_schema] if many else Optional[ids_schema], ...)},
+            **{table: (List[schema], ...) for table, (_path, schema) in side_tables.items()},
+        )
+        shapes = tuple(dict.fromkeys(self.expand_schemas.values()))
+        if many:
+            return Union[tuple(List[shape] for shape in shapes) + (normalized,)]
+        return Union[shapes + (normalized,)]
+
+    def _render(self, data, expand: ExpandMode, response: Optional[Response] = None):
+        """Serialize reads in any expand mode, bypassing `response_model`.
+
+        Headers already set on the injected `response` are carried over.
+        """
+        many = isinstance(data, list)
+        if expand == "normalized":
+            body = _JSON.dump_json(self._normalize(data if many else [data], many))
+        else:
+            adapter = self._adapters[expand, many]
+            body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+        return Response(
+            body,
+            media_type="application/json",
+            headers=dict(response.headers) if response is not None else None,
+        )
+
+    def _render_rows(self, items: list, expand: ExpandMode, response: Response) -> Response:
+        """Serialize row structs from `get_rows` straight to JSON, any expand mode"""
+        dump = self._row_dumpers["ids" if expand == "normalized" else expand]
+        payload: Any = [dump(item) for item in items]
+        if expand == "normalized":
+            payload = {"items": payload}
+            for table, (path, _adapter) in self.side_tables.items():
+                related = {obj.id: obj for obj in _walk(items, path)}
+                dump_related = self._side_dumpers[table]
+                payload[table] = [dump_related(related[id]) for id in sorted(related)]
+        return Response(
+            _ANY.dump_json(payload), media_type="application/json", headers=dict(response.headers)
+        )
+
+    def _normalize(self, items: list, many: bool) -> dict[str, Any]:
+        """Items with relationship ids plus one side table per related resource"""
+        adapter = self._adapters["ids", True]
+        rows = adapter.validate_python(items, from_attributes=True)
+        payload: dict[str, Any] = {"items": rows} if many else {"item": rows[0] if rows else None}
+        for table, (path, table_adapter) in self.side_tables.items():
+            related = {obj.id: obj for obj in _walk(items, path)}
+            payload[table] = table_adapter.validate_python(
+                [related[id] for id in sorted(related)], from_attributes=True
+            )
+        return payload
+
+    @staticmethod
+    def _parse_ids(ids: str) -> list[int]:
+        """Parse a comma-separated id list, rejecting junk and oversized batches"""
+        try:
+            parsed = [int(part) for part in ids.split(",") if part.strip()]
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="ids must be a comma-separated list of integers",
+            )
+        if len(parsed) > settings.batch_get_max_ids:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"At most {settings.batch_get_max_ids} ids per request",
+            )
+        return parsed
+
+    def _write(
+        self,
+        request: Request,
+        idempotency_key: Optional[str],
+        current_user,
+        payload: bytes,
+        status_code: int,
+        action: Callable[[], Any],
+    ) -> Response:
+        """Run a write once per Idempotency-Key, replaying the stored response on retries"""
+
+        def handler() -> StoredResponse:
+            result = action()
+            if isinstance(result, dict):
+                return StoredResponse(status_code, _JSON.dump_json(result))
+            adapter = self._adapters["full", False]
+            return StoredResponse(
+                status_code, adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+            )
+
+        scope = (
+            idempotency.scope(current_user.id, request.method, request.url.path, idempotency_key)
+            if idempotency_key is not None
+            else ""
+        )
+        return idempotency.run(idempotency_key, scope, payload, handler)
+
+    def _log_payload(self, action: str, item) -> None:
+        """Print a write payload for debugging"""
+        print(f"The {self.resource} {action} payload")
+        print(json.dumps(item.model_dump(), indent=2, ensure_ascii=False))
+
+    def _read_changes(self, since: int, limit: int) -> tuple[list[dict], int]:
+        """Load changes after `since` in a short-lived session.
+
+        Returns the changes and the version the subscriber has caught up to.
+        Raises 410 when entries after `since` have been trimmed from the log,
+        so the subscriber knows to resync from the list endpoint.
+        """
+        db = db_manager.SessionLocal()
+        try:
+            oldest = change_feed.oldest(db)
+            if oldest and since < oldest - 1:
+                raise HTTPException(
+                    status_code=status.HTTP_410_GONE,
+                    detail="Changes since this version are no longer retained; resync from the list endpoint",
+                )
+            # Versions up to the resource's head are settled, later ones may still commit
+            head = change_feed.latest(db, self.resource)
+            changes = change_feed.since(db, self.resource, since, limit, until=head)
+            version = changes[-1]["version"] if len(changes) == limit else head
+            return changes, max(since, version)
+        finally:
+            db.close()
+
+    async def _poll_changes(
+        self, since: int, limit: int, wait: float
+    ) -> tuple[list[dict], int]:
+        """Long-poll: return as soon as changes exist or `wait` elapses"""
+        deadline = time.monotonic() + wait
+        while True:
+            changes, version = await anyio.to_thread.run_sync(
+                self._read_changes, since, limit
+            )
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                return changes, version
+            since = version
+            # Commits in this process wake us at once; the interval bounds the
+            # delay for changes committed by other workers
+            await change_feed.wait(
+                min(remaining, settings.change_feed_poll_interval_seconds)
+            )
+
+    async def _stream_changes(self, request: Request, since: int, limit: int):
+        """Server-sent events: one event per change, `id` is the version"""
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            changes, version = await anyio.to_thread.run_sync(
+                self._read_changes, since, limit
+            )
+            since = version
+            for change in changes:
+                data = json.dumps(jsonable_encoder(change), ensure_ascii=False)
+                yield f"id: {change['version']}\nevent: {change['action']}\ndata: {data}\n\n"
+                last_sent = time.monotonic()
+            if len(changes) == limit:
+                continue
+            if time.monotonic() - last_sent >= settings.change_feed_keepalive_seconds:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await change_feed.wait(settings.change_feed_poll_interval_seconds)
+
     def _setup_routes(self):
         """Setup common CRUD routes"""
         # resource = self.get_resource_name()
@@ -52,63 +330,210 @@ class BaseCRUDRouter(
             "/",
             response_model=self.response_schema,
             status_code=status.HTTP_201_CREATED,
+            dependencies=[self._deadline("create_item")],
         )
-        async def create_item(
+        @self._endpoint
+        def create_item(
+            request: Request,
             item: self.create_schema,
+            idempotency_key: Optional[str] = Header(None, max_length=255),
             db: Session = Depends(get_db),
             current_user=Depends(require_permissions([f"{self.resource}:create"])),
         ):
-            print(f"The {self.resource} create payload")
-            print(json.dumps(item.model_dump(), indent=2, ensure_ascii=False))
-            return self.service.create(db, item)
+            def create():
+                self._log_payload("create", item)
+                return self.service.create(db, item)
+
+            return self._write(
+                request,
+                idempotency_key,
+                current_user,
+                item.model_dump_json().encode(),
+                status.HTTP_201_CREATED,
+                create,
+            )
 
-        @self.router.get("/", response_model=List[self.response_schema])
-        async def read_items(
+        @self.router.get(
+            "/",
+            response_model=self.read_models[True],
+            dependencies=[self._deadline("read_items")],
+        )
+        @self._endpoint
+        def read_items(
+            response: Response,
             skip: int = 0,
             limit: int = 100,
+            ids: Optional[str] = Query(None, description="Comma-separated ids, e.g. 1,2,3"),
+            expand: ExpandMode = "full",
             db: Session = Depends(get_db),
             current_user=Depends(require_permissions([f"{self.resource}:read"])),
         ):
-            return self.service.get_multi(db, skip=skip, limit=limit)
+            if ids is not None:
+                items = self.service.get_many(
+                    db, self._parse_ids(ids), options=self.service.load_options(expand)
+                )
+                return self._render(items, expand)
+            # Read before listing, so following the feed from here misses nothing
+            version, items = self.service.get_page(
+                db, skip=skip, limit=limit, expand=expand, shared=settings.single_flight_reads
+            )
+            response.headers["X-Change-Version"] = str(version)
+            return self._render_rows(items, expand, response)
 
-        @self.router.get("/{item_id}", response_model=self.response_schema)
-        async def read_item(
+        # Registered before /{item_id} so "search" is not parsed as an id
+        @self.router.get(
+            "/search",
+            response_model=self.read_models[True],
+            dependencies=[self._deadline("search_items")],
+        )
+        @self._endpoint
+        def search_items(
+            q: str = Query(..., min_length=1, max_length=100),
+            limit: int = Query(20, ge=1, le=settings.search_max_limit),
+            expand: ExpandMode = "full",
+            db: Session = Depends(get_db),
+            current_user=Depends(require_permissions([f"{self.resource}:read"])),
+        ):
+            """Best matches for a partial name, prefix matches first"""
+            items = self.service.search(
+                db, q, limit=limit, options=self.service.load_options(expand)
+            )
+            return self._render(items, expand)
+
+        # Registered before /{item_id} so "changes" is not parsed as an id
+        @self.router.get(
+            "/changes",
+            dependencies=[self._deadline("read_changes")],
+        )
+        async def read_changes(
+            request: Request,
+            since: int = Query(0, ge=0),
+            limit: int = Query(100, ge=1, le=1000),
+            wait: float = Query(0, ge=0, le=settings.change_feed_max_wait_seconds),
+            current_user=Depends(require_permissions([f"{self.resource}:read"])),
+        ):
+            """Changes after version `since`, as SSE or a long-poll JSON batch"""
+            if "text/event-stream" in request.headers.get("accept", ""):
+                last_event_id = request.headers.get("last-event-id", "")
+                if last_event_id.isdigit():
+                    since = int(last_event_id)
+                # Surface a trimmed log as 410 before the stream starts
+                await anyio.to_thread.run_sync(self._read_changes, since, 1)
+                return StreamingResponse(
+                    self._stream_changes(request, since, limit),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                )
+
+            changes, version = await self._poll_changes(since, limit, wait)
+            return {"version": version, "changes": changes}
+
+        @self.router.get(
+            "/{item_id}",
+            response_model=self.read_models[False],
+            dependencies=[self._deadline("read_item")],
+        )
+        @self._endpoint
+        def read_item(
             item_id: int,
+            expand: ExpandMode = "full",
             db: Session = Depends(get_db),
             current_user=Depends(require_permissions([f"{self.resource}:read"])),
         ):
-            db_item = self.service.get(db, item_id)
+            db_item = self.service.get(
+                db, item_id, options=self.service.load_options(expand),
+                shared=settings.single_flight_reads,
+            )
             if db_item is None:
                 raise HTTPException(
-                    status_code=404, detail=f"{self.resource.title()} not found"
+                    status_code=404, detail=f"{self.name} not found"
                 )
-            return db_item
+            return self._render(db_item, expand)
+
+        @self.router.put(
+            "/{item_id}",
+            response_model=self.response_schema,
+            dependencies=[self._deadline("update_item")],
+        )
+        @self._endpoint
+        def update_item(
+            request: Request,
+            item_id: int,
+            item: self.update_schema,
+            idempotency_key: Optional[str] = Header(None, max_length=255),
+            db: Session = Depends(get_db),
+            current_user=Depends(require_permissions([f"{self.resource}:update"])),
+        ):
+            def update():
+                self._log_payload("update", item)
+                db_item = self.service.get(db, item_id)
+                if db_item is None:
+                    raise HTTPException(
+                        status_code=404, detail=f"{self.name} not found"
+                    )
+                return self.service.update(db, db_item, item)
+
+            return self._write(
+                request,
+                idempotency_key,
+                current_user,
+                item.model_dump_json(exclude_unset=True).encode(),
+                status.HTTP_200_OK,
+                update,
+            )
 
-        @self.router.put("/{item_id}", response_model=self.response_schema)
-        async def update_item(
+        @self.router.patch(
+            "/{item_id}",
+            response_model=self.response_schema,
+            dependencies=[self._deadline("patch_item")],
+        )
+        @self._endpoint
+        def patch_item(
+            request: Request,
             item_id: int,
             item: self.update_schema,
+            idempotency_key: Optional[str] = Header(None, max_length=255),
             db: Session = Depends(get_db),
             current_user=Depends(require_permissions([f"{self.resource}:update"])),
         ):
-            print(f"The {self.resource} update payload")
-            print(json.dumps(item.model_dump(), indent=2, ensure_ascii=False))
-            db_item = self.service.get(db, item_id)
-            if db_item is None:
-                raise HTTPException(
-                    status_code=404, detail=f"{self.resource.title()} not found"
-                )
-            return self.service.update(db, db_item, item)
+            def patch():
+                self._log_payload("patch", item)
+                db_item = self.service.patch(db, item_id, item)
+                if db_item is None:
+                    raise HTTPException(
+                        status_code=404, detail=f"{self.name} not found"
+                    )
+                return db_item
+
+            return self._write(
+                request,
+                idempotency_key,
+                current_user,
+                item.model_dump_json(exclude_unset=True).encode(),
+                status.HTTP_200_OK,
+                patch,
+            )
 
-        @self.router.delete("/{item_id}")
-        async def delete_item(
+        @self.router.delete(
+            "/{item_id}",
+            dependencies=[self._deadline("delete_item")],
+        )
+        @self._endpoint
+        def delete_item(
+            request: Request,
             item_id: int,
+            idempotency_key: Optional[str] = Header(None, max_length=255),
             db: Session = Depends(get_db),
             current_user=Depends(require_permissions([f"{self.resource}:delete"])),
         ):
-            success = self.service.delete(db, item_id)
-            if not success:
-                raise HTTPException(
-                    status_code=404, detail=f"{self.resource.title()} not found"
-                )
-            return {"message": f"{self.resource.title()} deleted successfully"}
+            def delete():
+                success = self.service.delete(db, item_id)
+                if not success:
+                    raise HTTPException(
+                        status_code=404, detail=f"{self.name} not found"
+                    )
+                return {"message": f"{self.name} deleted successfully"}
+
+            return self._write(
+                request, idempotency_key, current_user, b"", status.HTTP_200_OK, delete
+            )
@@ -0,0 +1,139 @@
+import gzip
+from typing import Callable, Optional, Sequence
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from services.metrics import metrics
+
+# Media types worth compressing
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+# Never compressed, even though `text/` matches: compressing SSE would buffer the stream
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+def _gzip(level: int) -> Callable[[bytes], bytes]:
+    return lambda body: gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _brotli(quality: int) -> Optional[Callable[[bytes], bytes]]:
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return lambda body: brotli.compress(body, quality=quality)
+
+
+def _zstd(level: int) -> Optional[Callable[[bytes], bytes]]:
+    try:
+        from compression import zstd  # Python 3.14+
+
+        return lambda body: zstd.compress(body, level=level)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    compressor = zstandard.ZstdCompressor(level=level)
+    return compressor.compress
+
+
+class CompressionMiddleware:
+    """Compress complete responses with the best encoding the client accepts.
+
+    `algorithms` lists encodings in server preference order; "br" and "zstd"
+    are skipped when their optional packages are not installed. Streaming
+    responses and bodies below `minimum_size` are sent as is.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        algorithms: Sequence[str] = ("zstd", "br", "gzip"),
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        factories = {
+            "gzip": lambda: _gzip(gzip_level),
+            "br": lambda: _brotli(brotli_quality),
+            "zstd": lambda: _zstd(zstd_level),
+        }
+        self.encoders: dict[str, Callable[[bytes], bytes]] = {}
+        for name in algorithms:
+            if name not in factories:
+                raise ValueError(f"Unknown compression algorithm {name!r}")
+            encoder = factories[name]()
+            if encoder is not None:
+                self.encoders[name] = encoder
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        """Pick the preferred encoding allowed by an Accept-Encoding header"""
+        accepted: dict[str, float] = {}
+        for part in accept_encoding.split(","):
+            coding, _, params = part.strip().partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if coding:
+                accepted[coding.strip().lower()] = quality
+        for name in self.encoders:
+            if accepted.get(name, accepted.get("*", 0.0)) > 0:
+                return name
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.encoders:
+            await self.app(scope, receive, send)
+            return
+        encoding = self.negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or content_type.startswith(EXCLUDED_TYPES)
+                or len(body) < self.minimum_size
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = self.encoders[encoding](body)
+            metrics.incr("compression.bytes_in", len(body))
+            metrics.incr("compression.bytes_out", len(compressed))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,92 @@
+from typing import Optional
+import anyio
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from services import deadline as deadlines
+from services.metrics import metrics
+
+# How often the deadline is re-read, as routes may shorten it after the request started
+CHECK_INTERVAL_SECONDS = 0.1
+
+
+class DeadlineMiddleware:
+    """Give every request a deadline and stop its work when it passes.
+
+    The deadline starts at `default_budget` seconds; routes may change it
+    (see `BaseCRUDRouter`'s `deadlines`). Database work checks it: expired
+    requests skip further statements, Postgres transactions run with
+    `statement_timeout` set to the remaining budget and SQLite statements are
+    interrupted. If no response has started when the deadline passes, the
+    handler is cancelled and a 504 is sent. A client disconnect cancels the
+    deadline too, so abandoned requests stop querying.
+    """
+
+    def __init__(self, app: ASGIApp, default_budget: Optional[float] = 30.0):
+        self.app = app
+        self.default_budget = default_budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = deadlines.start(self.default_budget)
+        started = disconnected = False
+        error: Optional[BaseException] = None
+        send_messages, receive_messages = anyio.create_memory_object_stream[Message](16)
+
+        async def send_tracked(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        async def pump() -> None:
+            # Forward client messages to the app while watching for a disconnect
+            nonlocal disconnected
+            async with send_messages:
+                while True:
+                    message = await receive()
+                    if message["type"] == "http.disconnect":
+                        disconnected = True
+                        if not started:
+                            metrics.incr("deadline.disconnects")
+                        deadline.cancel()
+                        await send_messages.send(message)
+                        scope_group.cancel_scope.cancel()
+                        return
+                    await send_messages.send(message)
+
+        async def watch() -> None:
+            while True:
+                remaining = deadline.remaining()
+                if remaining is None or remaining > 0:
+                    interval = CHECK_INTERVAL_SECONDS if remaining is None else remaining
+                    await anyio.sleep(min(interval, CHECK_INTERVAL_SECONDS))
+                elif started:
+                    return
+                else:
+                    metrics.incr("deadline.expired")
+                    deadline.cancel()
+                    scope_group.cancel_scope.cancel()
+                    return
+
+        async def run_app() -> None:
+            nonlocal error
+            try:
+                await self.app(scope, receive_messages.receive, send_tracked)
+            except Exception as e:
+                # Re-raised below as is, not wrapped in an ExceptionGroup
+                error = e
+            scope_group.cancel_scope.cancel()
+
+        async with anyio.create_task_group() as scope_group:
+            scope_group.start_soon(pump)
+            scope_group.start_soon(watch)
+            scope_group.start_soon(run_app)
+
+        if error is not None:
+            raise error
+        if deadline.expired and not started and not disconnected:
+            response = JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+            await response(scope, receive, send)
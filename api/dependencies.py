@@ -4,23 +4,48 @@ from sqlalchemy.orm import Session
 from database.connection import db_manager
 from services.auth_service import auth_service
 from services.user_service import user_service
+from services.token_cache import token_cache
+from services.permission_graph import permission_graph
 from models.models import User
-from typing import List
+from typing import Iterator, List
 
 security = HTTPBearer()
 
-def get_db() -> Session:
-    """Dependency to get database session"""
-    return next(db_manager.get_db())
+def get_db() -> Iterator[Session]:
+    """Dependency to get database session, closed once the request is done"""
+    yield from db_manager.get_db()
+
+def load_auth_user(username: str) -> User | None:
+    """Load a user with its role ids, detached so it can be cached.
+
+    Role contents come from the permission graph, so cached users stay valid
+    when roles or permissions change.
+    """
+    db = db_manager.SessionLocal()
+    try:
+        user = user_service.get_with_role_ids(db, username)
+        db.expunge_all()
+        return user
+    finally:
+        db.close()
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
 ) -> User:
-    """Dependency to get current authenticated user"""
+    """Dependency to get current authenticated user.
+
+    The user is served from the token cache (or loaded once) and merged into
+    the request's session without a query, so the handler shares the same
+    identity map and never reloads the user or its role links.
+    """
     token = credentials.credentials
     username = auth_service.verify_token(token)
-    user = user_service.get_by_username(db, username=username)
+    user = token_cache.get_user(token)
+    if user is None:
+        user = load_auth_user(username)
+        if user is not None:
+            token_cache.set_user(token, user)
     
     if user is None:
         raise HTTPException(
@@ -34,7 +59,9 @@ def get_current_user(
             detail="Inactive user"
         )
     
-    return user
+    # Attributed to this user in the audit log
+    db.info["actor_id"] = user.id
+    return db.merge(user, load=False)
 
 class PermissionChecker:
     """Class-based permission checker for cleaner dependency injection"""
@@ -43,10 +70,11 @@ class PermissionChecker:
         self.required_permissions = required_permissions
     
     def __call__(self, current_user: User = Depends(get_current_user)) -> User:
-        user_permissions = current_user.get_permissions()
+        # Grants may use wildcards (`users:*`, `*:read`); see services/permission_matcher.py
+        user_permissions = permission_graph.matcher(current_user.role_ids)
         
         for required_permission in self.required_permissions:
-            if required_permission not in user_permissions:
+            if not user_permissions.allows(required_permission):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail=f"Insufficient permissions. Required: {required_permission}"
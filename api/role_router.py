@@ -1,7 +1,18 @@
+from typing import List
+from fastapi import Depends, HTTPException
+from sqlalchemy.orm import Session
 from api.base import BaseCRUDRouter
+from api.dependencies import get_db, require_permissions
 from services.role_service import role_service
 from models.models import Role
-from schemas.schemas import RoleCreate, RoleUpdate, RoleResponse
+from schemas.schemas import (
+    PermissionResponse,
+    RoleCreate,
+    RoleResponse,
+    RoleSummary,
+    RoleUpdate,
+    RoleWithIds,
+)
 
 
 class RoleRouter(BaseCRUDRouter[Role, RoleCreate, RoleUpdate, RoleResponse]):
@@ -15,8 +26,30 @@ class RoleRouter(BaseCRUDRouter[Role, RoleCreate, RoleUpdate, RoleResponse]):
             create_schema=RoleCreate,
             update_schema=RoleUpdate,
             response_schema=RoleResponse,
+            ids_schema=RoleWithIds,
+            summary_schema=RoleSummary,
+            side_tables={"permissions": ("permissions", PermissionResponse)},
         )
 
+    def _setup_routes(self):
+        super()._setup_routes()
+
+        @self.router.get(
+            "/{item_id}/permissions",
+            response_model=List[PermissionResponse],
+            dependencies=[self._deadline("read_effective_permissions")],
+        )
+        @self._endpoint
+        def read_effective_permissions(
+            item_id: int,
+            db: Session = Depends(get_db),
+            current_user=Depends(require_permissions(["roles:read"])),
+        ):
+            """Permissions of a role, including those inherited from its ancestors"""
+            if self.service.get(db, item_id) is None:
+                raise HTTPException(status_code=404, detail=f"{self.name} not found")
+            return self.service.effective_permissions(db, [item_id])
+
 
 # Create role router instance
 role_router = RoleRouter().router
@@ -0,0 +1,50 @@
+"""Benchmark the auth dependency chain alone.
+
+Runs get_current_user followed by a PermissionChecker for one bearer token,
+first with the token cache cleared before every call (full jwt.decode and a
+user lookup each time) and then warm.
+
+    python benchmarks/bench_auth.py [iterations]
+"""
+import sys
+
+from common import seed_user, timeit, report
+
+from fastapi.security import HTTPAuthorizationCredentials
+from api.dependencies import get_current_user, require_permissions
+from database.connection import db_manager
+from services.auth_service import auth_service
+from services.token_cache import token_cache
+
+
+def main(iterations: int = 2000) -> None:
+    seed_user()
+    token = auth_service.create_access_token({"sub": "bench"})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    checker = require_permissions(["resource0:action0"])
+
+    def chain():
+        db = db_manager.SessionLocal()
+        try:
+            checker(get_current_user(credentials, db))
+        finally:
+            db.close()
+
+    def cold_chain():
+        token_cache.clear()
+        chain()
+
+    def decode_only():
+        token_cache.clear()
+        auth_service.verify_token(token)
+
+    chain()
+    cold = timeit(cold_chain, iterations)
+    warm = timeit(chain, iterations)
+    report("verify_token (cold)", timeit(decode_only, iterations))
+    report("auth chain (cold cache)", cold)
+    report("auth chain (warm cache)", warm, baseline=cold)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
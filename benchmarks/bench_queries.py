@@ -0,0 +1,72 @@
+"""Benchmark per-call overhead of the BaseService hot-path reads.
+
+Each read is timed through the service (statements built once per model and
+reused) and through an equivalent `db.query(...)` rebuilt on every call, as
+the service did before. One session is reused so the numbers are statement
+construction, compilation cache lookup and execution, not connection setup.
+
+    python benchmarks/bench_queries.py [iterations]
+"""
+import sys
+
+from common import seed_user, timeit, report
+
+from sqlalchemy.orm import joinedload
+from database.connection import db_manager
+from models.models import User, Role
+from services.user_service import user_service
+
+
+def main(iterations: int = 5000) -> None:
+    user_id = seed_user()
+    db = db_manager.SessionLocal()
+    live = User.deleted_at.is_(None)
+
+    cases = [
+        (
+            "get",
+            lambda: db.query(User).filter(live).filter(User.id == user_id).first(),
+            lambda: user_service.get(db, user_id),
+        ),
+        (
+            "get_by_username",
+            lambda: db.query(User).filter(live).filter(User.username == "bench").first(),
+            lambda: user_service.get_by_username(db, "bench"),
+        ),
+        (
+            "get_with_role_ids",
+            lambda: db.query(User)
+            .filter(live)
+            .options(joinedload(User.roles).load_only(Role.id))
+            .filter(User.username == "bench")
+            .first(),
+            lambda: user_service.get_with_role_ids(db, "bench"),
+        ),
+        (
+            "get_many",
+            lambda: db.query(User).filter(live).filter(User.id.in_([user_id])).all(),
+            lambda: user_service.get_many(db, [user_id]),
+        ),
+        (
+            "get_multi",
+            lambda: db.query(User).filter(live).offset(0).limit(20).all(),
+            lambda: user_service.get_multi(db, 0, 20),
+        ),
+        (
+            "count",
+            lambda: db.query(User).filter(live).count(),
+            lambda: user_service.count(db),
+        ),
+    ]
+    try:
+        for name, rebuilt, cached in cases:
+            rebuilt(), cached()
+            before = timeit(rebuilt, iterations)
+            report(f"{name} (query per call)", before)
+            report(f"{name} (cached statement)", timeit(cached, iterations), baseline=before)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
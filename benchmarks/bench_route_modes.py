@@ -0,0 +1,97 @@
+"""Benchmark concurrent throughput of BaseCRUDRouter execution modes.
+
+Serves a permissions router in each mode over a file-backed SQLite database
+and fires concurrent point reads and list requests through httpx's ASGI
+transport. Auth is stubbed out so only the route path is measured.
+
+    python benchmarks/bench_route_modes.py [requests] [concurrency]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+import common  # noqa: E402,F401 - puts the project root on sys.path
+
+import httpx
+from fastapi import FastAPI
+from api.base import BaseCRUDRouter
+from api.dependencies import get_current_user
+from database.connection import db_manager
+from models.models import Permission, Role
+from schemas.schemas import PermissionCreate, PermissionUpdate, PermissionResponse
+from services.permission_service import permission_service
+
+
+class BenchUser:
+    # Set by seed(): a role granting permissions:read
+    role_ids: list[int] = []
+
+
+def seed(rows: int = 200) -> None:
+    db_manager.create_tables()
+    db = db_manager.SessionLocal()
+    try:
+        if db.query(Permission).count() == 0:
+            db.add_all(
+                Permission(name=f"bench {i}", resource="bench", action=f"a{i}")
+                for i in range(rows)
+            )
+            read = Permission(name="bench read", resource="permissions", action="read")
+            db.add(Role(name="bench reader", permissions=[read]))
+            db.commit()
+        BenchUser.role_ids = [db.query(Role).filter(Role.name == "bench reader").one().id]
+    finally:
+        db.close()
+
+
+def build_app(mode: str) -> FastAPI:
+    app = FastAPI()
+    router = BaseCRUDRouter(
+        service=permission_service,
+        prefix="/permissions",
+        resource="permissions",
+        create_schema=PermissionCreate,
+        update_schema=PermissionUpdate,
+        response_schema=PermissionResponse,
+        mode=mode,
+    )
+    app.include_router(router.router)
+    app.dependency_overrides[get_current_user] = BenchUser
+    return app
+
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    """Return requests per second"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                res = await client.get(path.format(id=i % 200 + 1))
+                assert res.status_code == 200, res.text
+
+        await one(0)
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+def main(requests: int = 2000, concurrency: int = 50) -> None:
+    seed()
+    for mode in ("sync", "async"):
+        app = build_app(mode)
+        for label, path in (("point read", "/permissions/{id}"), ("list", "/permissions/?limit=50")):
+            rps = asyncio.run(run(app, path, requests, concurrency))
+            print(f"{mode + ' ' + label:<40} {rps:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
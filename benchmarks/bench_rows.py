@@ -0,0 +1,96 @@
+"""Benchmark list reads: ORM objects vs Core row structs.
+
+Seeds `rows` users (default 1000) sharing 10 roles of 5 permissions, each
+user holding 3 roles, then serializes one page of every user per expand
+mode through `get_multi` (ORM objects validated into the response schema)
+and `get_rows` (structs dumped without validation). Reports time per
+page and the peak memory traced while building and serializing it.
+
+    python benchmarks/bench_rows.py [rows] [iterations]
+"""
+import sys
+import tracemalloc
+
+from common import timeit
+
+from fastapi import Response
+from sqlalchemy import func, insert, select
+from api.user_router import UserRouter
+from database.connection import db_manager
+from models.models import User, Role, Permission, user_roles, role_permissions
+from services.user_service import user_service
+
+
+def seed(rows: int) -> None:
+    db_manager.create_tables()
+    with db_manager.engine.begin() as conn:
+        if conn.scalar(select(func.count()).select_from(User)):
+            return
+        conn.execute(
+            insert(Permission),
+            [{"name": f"perm {i}", "resource": f"resource{i // 5}", "action": f"action{i % 5}"} for i in range(50)],
+        )
+        conn.execute(insert(Role), [{"name": f"role {i}"} for i in range(10)])
+        conn.execute(
+            insert(role_permissions),
+            [{"role_id": r + 1, "permission_id": r * 5 + p + 1} for r in range(10) for p in range(5)],
+        )
+        conn.execute(
+            insert(User),
+            [
+                {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+                for i in range(rows)
+            ],
+        )
+        conn.execute(
+            insert(user_roles),
+            [{"user_id": u + 1, "role_id": (u + k) % 10 + 1} for u in range(rows) for k in range(3)],
+        )
+
+
+def peak_kib(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main(rows: int = 1000, iterations: int = 20) -> None:
+    seed(rows)
+    router = UserRouter()
+    for expand in ("full", "ids", "none"):
+
+        def orm_page():
+            db = db_manager.SessionLocal()
+            try:
+                items = user_service.get_multi(db, 0, rows, options=user_service.load_options(expand))
+                if expand == "full":
+                    adapter = router._adapters["full", True]
+                    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+                return router._render(items, expand).body
+            finally:
+                db.close()
+
+        def rows_page():
+            db = db_manager.SessionLocal()
+            try:
+                items = user_service.get_rows(db, 0, rows, expand)
+                return router._render_rows(items, expand, Response()).body
+            finally:
+                db.close()
+
+        assert orm_page() == rows_page()
+        before = timeit(orm_page, iterations) / 1000
+        after = timeit(rows_page, iterations) / 1000
+        print(f"{rows} users, expand={expand}")
+        print(f"  {'ORM get_multi':<38} {before:>10.1f} ms/page  {peak_kib(orm_page):>8.0f} KiB peak")
+        print(
+            f"  {'Core get_rows':<38} {after:>10.1f} ms/page  {peak_kib(rows_page):>8.0f} KiB peak"
+            f"  ({before / after:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,60 @@
+"""Benchmark /{resource}/search lookups against a large users table.
+
+Seeds `rows` users (default 200k) into a throwaway SQLite file and compares
+the indexed search with an unindexed LIKE '%q%' scan.
+
+    python benchmarks/bench_search.py [rows] [iterations]
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}"
+)
+
+from common import timeit, report
+
+from sqlalchemy import func, insert, select
+from database.connection import db_manager
+from database.search import get_index
+from models.models import User
+
+
+def seed(rows: int) -> None:
+    db_manager.create_tables()
+    with db_manager.engine.begin() as conn:
+        existing = conn.scalar(select(func.count()).select_from(User))
+        batch = []
+        for i in range(existing, rows):
+            batch.append(
+                {"username": f"user{i:07d}", "email": f"person{i:07d}@example.com", "hashed_password": "x"}
+            )
+            if len(batch) == 10000:
+                conn.execute(insert(User), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(User), batch)
+
+
+def main(rows: int = 200_000, iterations: int = 200) -> None:
+    seed(rows)
+    index = get_index(User.__table__)
+    db = db_manager.SessionLocal()
+    try:
+        needle = f"{rows // 2 + 1234:07d}"[-6:]
+        report("search substring", timeit(lambda: index.search_ids(db, needle, 20), iterations))
+        report("search common term", timeit(lambda: index.search_ids(db, "example", 20), iterations))
+        report("search prefix (2 chars)", timeit(lambda: index.search_ids(db, "us", 20), iterations))
+        scan = (
+            select(User.id)
+            .where(User.username.like(f"%{needle}%") | User.email.like(f"%{needle}%"))
+            .limit(20)
+        )
+        report("LIKE '%q%' scan", timeit(lambda: db.scalars(scan).all(), max(iterations // 20, 1)))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
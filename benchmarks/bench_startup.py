@@ -0,0 +1,47 @@
+"""Benchmark cold application startup.
+
+Each run is a fresh interpreter that imports main and calls create_app(),
+so the numbers include every import the app needs but not interpreter boot.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.create_app()
+print(imported - start, time.perf_counter() - start)
+"""
+
+
+def measure_startup() -> tuple[float, float]:
+    """Return (import seconds, import + create_app seconds) for one cold start"""
+    env = dict(os.environ, DATABASE_URL=os.environ.get("DATABASE_URL", "sqlite://"))
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+        env=env,
+    ).stdout
+    imported, created = output.split()
+    return float(imported), float(created)
+
+
+def main(runs: int = 5) -> None:
+    samples = [measure_startup() for _ in range(runs)]
+    print(f"{'import main':<40} {statistics.median(s[0] for s in samples) * 1000:>10.1f} ms")
+    print(f"{'import main + create_app()':<40} {statistics.median(s[1] for s in samples) * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
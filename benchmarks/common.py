@@ -0,0 +1,62 @@
+"""Shared setup for the benchmark scripts.
+
+Benchmarks run against an in-memory SQLite database unless DATABASE_URL is
+set, so they never touch a development database.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+def seed_user(username: str = "bench", roles: int = 3, permissions_per_role: int = 4):
+    """Create tables and a user holding a few roles and permissions"""
+    from database.connection import db_manager
+    from models.models import User, Role, Permission
+    from services.auth_service import auth_service
+
+    db_manager.create_tables()
+    db = db_manager.SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == username).first()
+        if user is not None:
+            return user.id
+        role_objs = []
+        for r in range(roles):
+            perms = [
+                Permission(
+                    name=f"{username} perm {r}.{p}",
+                    resource=f"resource{r}",
+                    action=f"action{p}",
+                )
+                for p in range(permissions_per_role)
+            ]
+            role_objs.append(Role(name=f"{username} role {r}", permissions=perms))
+        user = User(
+            username=username,
+            email=f"{username}@example.com",
+            hashed_password=auth_service.get_password_hash("bench123"),
+            roles=role_objs,
+        )
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def timeit(func, iterations: int) -> float:
+    """Return the mean wall time of func in microseconds"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def report(label: str, micros: float, baseline: float | None = None) -> None:
+    line = f"{label:<40} {micros:>10.1f} us/call"
+    if baseline:
+        line += f"  ({baseline / micros:.1f}x)"
+    print(line)
@@ -0,0 +1,70 @@
+"""Measure password hash time on this host and recommend a cost setting.
+
+    python calibrate_hash.py --target-ms 250
+    python calibrate_hash.py --scheme argon2 --target-ms 100 --memory-cost 19456
+"""
+import argparse
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+
+def measure(context: CryptContext, samples: int) -> float:
+    """Median milliseconds to hash and verify one password"""
+    context.hash("warm-up")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify("calibration-password", context.hash("calibration-password"))
+        timings.append((time.perf_counter() - start) * 1000 / 2)
+    return statistics.median(timings)
+
+
+def calibrate_bcrypt(target_ms: float, samples: int) -> int:
+    best = 4
+    for rounds in range(4, 32):
+        elapsed = measure(CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds), samples)
+        print(f"bcrypt rounds={rounds:<3} {elapsed:8.1f} ms")
+        if elapsed > target_ms:
+            break
+        best = rounds
+    print(f"\nRecommended: BCRYPT_ROUNDS={best}")
+    return best
+
+
+def calibrate_argon2(target_ms: float, samples: int, memory_cost: int, parallelism: int) -> int:
+    best = 1
+    for time_cost in range(1, 33):
+        context = CryptContext(
+            schemes=["argon2"],
+            argon2__rounds=time_cost,
+            argon2__memory_cost=memory_cost,
+            argon2__parallelism=parallelism,
+        )
+        elapsed = measure(context, samples)
+        print(f"argon2 time_cost={time_cost:<3} memory_cost={memory_cost} {elapsed:8.1f} ms")
+        if elapsed > target_ms:
+            break
+        best = time_cost
+    print(
+        f"\nRecommended: PASSWORD_SCHEMES='[\"argon2\", \"bcrypt\"]' "
+        f"ARGON2_TIME_COST={best} ARGON2_MEMORY_COST={memory_cost} "
+        f"ARGON2_PARALLELISM={parallelism}"
+    )
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--memory-cost", type=int, default=19456, help="argon2 KiB")
+    parser.add_argument("--parallelism", type=int, default=1, help="argon2 lanes")
+    args = parser.parse_args()
+
+    if args.scheme == "bcrypt":
+        calibrate_bcrypt(args.target_ms, args.samples)
+    else:
+        calibrate_argon2(args.target_ms, args.samples, args.memory_cost, args.parallelism)
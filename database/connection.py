@@ -1,26 +1,71 @@
+from typing import Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from config import settings
 
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 class DatabaseManager:
-    def __init__(self):
-        self.engine = engine
-        self.SessionLocal = SessionLocal
-        
+    """Owns the engine and session factory, created on first use"""
+
+    def __init__(self, database_url: Optional[str] = None):
+        self.database_url = database_url or settings.database_url
+        self._engine: Optional[Engine] = None
+        self._session_factory: Optional[sessionmaker] = None
+
+    def configure(self, database_url: str) -> None:
+        """Point the manager at another database, dropping any existing engine"""
+        if database_url == self.database_url:
+            return
+        if self._engine is not None:
+            self._engine.dispose()
+        self.database_url = database_url
+        self._engine = None
+        self._session_factory = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            self._engine = create_engine(
+                self.database_url, query_cache_size=settings.query_cache_size
+            )
+        return self._engine
+
+    @property
+    def SessionLocal(self) -> sessionmaker:
+        if self._session_factory is None:
+            self._session_factory = sessionmaker(
+                autocommit=False, autoflush=False, bind=self.engine
+            )
+        return self._session_factory
+
     def get_db(self) -> Session: # type: ignore
         db = self.SessionLocal()
         try:
             yield db
         finally:
             db.close()
-    
+
     def create_tables(self):
+        import models.models  # noqa: F401 - register every table on Base.metadata
+        from database.role_closure import rebuild_role_closure
+        from database.search import create_search_indexes
+
         Base.metadata.create_all(bind=self.engine)
+        with self.engine.begin() as connection:
+            create_search_indexes(connection)
+            rebuild_role_closure(connection)
 
 # Initialize database manager
-db_manager = DatabaseManager()
\ No newline at end of file
+db_manager = DatabaseManager()
+
+def __getattr__(name: str):
+    # `engine` and `SessionLocal` used to be module globals; keep them importable
+    # without creating the engine at import time.
+    if name == "engine":
+        return db_manager.engine
+    if name == "SessionLocal":
+        return db_manager.SessionLocal
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
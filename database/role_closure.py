@@ -0,0 +1,113 @@
+"""Closure table for role inheritance.
+
+``role_closure`` holds one row per (role, role it inherits from) at any
+depth, plus a depth-0 row for every role, so the effective permissions of
+any set of roles are a single join through it whatever the hierarchy depth.
+Rows are recomputed from ``role_inheritance`` edges for the roles an edge
+change affects: the changed role and every role inheriting from it. Edges
+never form a cycle: `RoleService` rejects those at write time, holding
+`lock` so concurrent changes can't each pass the check. Recursion stops at
+`MAX_DEPTH` regardless, so even edges written around it can't make a
+rebuild run forever.
+"""
+from typing import Collection, Optional, Union
+from sqlalchemy import Table, delete, event, false, func, insert, literal, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+# Longest inheritance chain followed
+MAX_DEPTH = 32
+# Arbitrary key for the Postgres advisory lock serializing inheritance changes
+_INHERITANCE_LOCK = 0x726F6C65
+
+_closure: Optional[Table] = None
+
+
+def register(role_model: type, closure: Table) -> None:
+    """Use `closure` for `role_model` and give every new role its depth-0 row"""
+    global _closure
+    _closure = closure
+
+    @event.listens_for(role_model, "after_insert")
+    def _insert_self_row(mapper, connection, target):
+        connection.execute(
+            insert(closure).values(role_id=target.id, inherited_id=target.id, depth=0)
+        )
+
+
+def lock(db: Session) -> None:
+    """Serialize inheritance changes until the transaction ends.
+
+    Postgres takes a transaction-scoped advisory lock; SQLite takes the
+    database write lock with an empty update. Checks made afterwards see
+    every edge committed by other writers.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _INHERITANCE_LOCK})
+    else:
+        db.execute(update(_closure).where(false()).values(depth=_closure.c.depth))
+
+
+def chain_depth(db: Union[Session, Connection], role_id: int, parent_ids: Collection[int]) -> int:
+    """Longest chain through `role_id` if it inherited from `parent_ids`"""
+    above = db.scalar(select(func.max(_closure.c.depth)).where(_closure.c.role_id.in_(parent_ids)))
+    below = db.scalar(select(func.max(_closure.c.depth)).where(_closure.c.inherited_id == role_id))
+    return (above or 0) + 1 + (below or 0)
+
+
+def inheriting(db: Union[Session, Connection], role_id: int) -> list[int]:
+    """Roles inheriting from `role_id`, directly or not, excluding itself"""
+    return list(
+        db.scalars(
+            select(_closure.c.role_id).where(
+                _closure.c.inherited_id == role_id, _closure.c.role_id != role_id
+            )
+        )
+    )
+
+
+def inherits(db: Union[Session, Connection], role_id: int, ancestor_ids: Collection[int]) -> bool:
+    """Whether `role_id` already inherits from any of `ancestor_ids` (or is one)"""
+    return role_id in ancestor_ids or db.scalar(
+        select(_closure.c.role_id)
+        .where(_closure.c.role_id == role_id, _closure.c.inherited_id.in_(ancestor_ids))
+        .limit(1)
+    ) is not None
+
+
+def refresh(db: Union[Session, Connection], role_ids: Optional[Collection[int]] = None) -> None:
+    """Recompute the closure rows of `role_ids` (every role when None)"""
+    from models.models import Role, role_inheritance
+
+    if role_ids is not None and not role_ids:
+        return
+    roles = select(Role.id)
+    clear = delete(_closure)
+    if role_ids is not None:
+        roles = roles.where(Role.id.in_(role_ids))
+        clear = clear.where(_closure.c.role_id.in_(role_ids))
+
+    base = roles.subquery()
+    ancestors = select(
+        base.c.id.label("role_id"), base.c.id.label("inherited_id"), literal(0).label("depth")
+    ).cte("ancestors", recursive=True)
+    ancestors = ancestors.union(
+        select(ancestors.c.role_id, role_inheritance.c.parent_id, ancestors.c.depth + 1).join_from(
+            ancestors, role_inheritance, role_inheritance.c.role_id == ancestors.c.inherited_id
+        ).where(ancestors.c.depth < MAX_DEPTH)
+    )
+    db.execute(clear)
+    db.execute(
+        insert(_closure).from_select(
+            ["role_id", "inherited_id", "depth"],
+            select(ancestors.c.role_id, ancestors.c.inherited_id, func.min(ancestors.c.depth)).group_by(
+                ancestors.c.role_id, ancestors.c.inherited_id
+            ),
+        )
+    )
+
+
+def rebuild_role_closure(connection: Connection) -> None:
+    """Recompute the whole table; safe to run on every start"""
+    if _closure is not None:
+        refresh(connection)
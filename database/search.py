@@ -0,0 +1,193 @@
+"""Text search indexes, per dialect.
+
+SQLite gets an external-content FTS5 table with the trigram tokenizer, kept
+in sync by triggers, so any substring of three or more characters is an
+index lookup ranked by bm25. Postgres gets pg_trgm GIN indexes for
+substring/similarity matches and ``text_pattern_ops`` indexes for prefixes.
+Queries shorter than three characters are prefix lookups on ``lower()``
+expression indexes, case-insensitive like the longer ones. Other databases
+fall back to LIKE scans. Ranking only considers the first ``MAX_CANDIDATES``
+live matches, so a very common term stays cheap.
+"""
+from typing import Optional, Sequence
+from sqlalchemy import Table, case, func, literal, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+# Shortest query the trigram indexes can serve
+MIN_TRIGRAM_LENGTH = 3
+# Matches ranked per query; very common terms rank an arbitrary subset of this size
+MAX_CANDIDATES = 1000
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchIndex:
+    """Search over a few text columns of one table"""
+
+    def __init__(self, table: Table, fields: Sequence[str]):
+        self.table = table
+        self.fields = tuple(fields)
+        self.name = table.name
+        self.fts = f"{table.name}_fts"
+        self.live_only = "deleted_at" in table.c
+
+    def create(self, connection: Connection) -> None:
+        """Create the index if missing; safe to run on every start"""
+        dialect = connection.dialect.name
+        if dialect == "sqlite":
+            self._create_sqlite(connection)
+        elif dialect == "postgresql":
+            self._create_postgresql(connection)
+
+    def _create_sqlite(self, connection: Connection) -> None:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": self.fts},
+        ).first()
+        columns = ", ".join(self.fields)
+        new = ", ".join(f"new.{field}" for field in self.fields)
+        old = ", ".join(f"old.{field}" for field in self.fields)
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts} USING fts5("
+            f"{columns}, content='{self.name}', content_rowid='id', tokenize='trigram')"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts}_ai AFTER INSERT ON {self.name} BEGIN "
+            f"INSERT INTO {self.fts}(rowid, {columns}) VALUES (new.id, {new}); END"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts}_ad AFTER DELETE ON {self.name} BEGIN "
+            f"INSERT INTO {self.fts}({self.fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); END"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts}_au AFTER UPDATE OF {columns} ON {self.name} BEGIN "
+            f"INSERT INTO {self.fts}({self.fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {self.fts}(rowid, {columns}) VALUES (new.id, {new}); END"
+        )
+        for field in self.fields:
+            # Short queries: prefix ranges, case-insensitive like the trigram tokenizer
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.name}_{field}_lower "
+                f"ON {self.name} (lower({field}))"
+            )
+        if not exists:
+            # Index rows written before the FTS table existed
+            connection.exec_driver_sql(f"INSERT INTO {self.fts}({self.fts}) VALUES ('rebuild')")
+
+    def _create_postgresql(self, connection: Connection) -> None:
+        connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for field in self.fields:
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.name}_{field}_trgm "
+                f"ON {self.name} USING gin (lower({field}) gin_trgm_ops)"
+            )
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.name}_{field}_prefix "
+                f"ON {self.name} (lower({field}) text_pattern_ops)"
+            )
+
+    def search_ids(self, db: Session, q: str, limit: int) -> list[int]:
+        """Ids of the best matches, best first: prefix matches, then by rank"""
+        q = q.strip()
+        if not q:
+            return []
+        dialect = db.get_bind().dialect.name
+        if len(q) < MIN_TRIGRAM_LENGTH:
+            return self._search_prefix(db, q, limit, dialect)
+        if dialect == "sqlite":
+            return self._search_sqlite(db, q, limit)
+        return self._search_substring(db, q, limit, trigram=dialect == "postgresql")
+
+    def _live(self, stmt):
+        if self.live_only:
+            stmt = stmt.where(self.table.c.deleted_at.is_(None))
+        return stmt
+
+    def _search_prefix(self, db: Session, q: str, limit: int, dialect: str) -> list[int]:
+        """Prefix lookup per field, each an ordered index range scan"""
+        ids: dict[int, None] = {}
+        for field in self.fields:
+            key = func.lower(self.table.c[field])
+            if dialect == "sqlite":
+                # Range over the lower() index, lowered by SQLite itself so both
+                # sides agree; LIKE would scan
+                lowered = func.lower(literal(q))
+                where = (key >= lowered) & (key < lowered.concat("\U0010ffff"))
+            else:
+                where = key.like(_escape_like(q.lower()) + "%", escape="\\")
+            stmt = self._live(select(self.table.c.id).where(where)).order_by(key).limit(limit)
+            ids.update(dict.fromkeys(db.scalars(stmt)))
+            if len(ids) >= limit:
+                break
+        return list(ids)[:limit]
+
+    def _search_sqlite(self, db: Session, q: str, limit: int) -> list[int]:
+        prefix = " OR ".join(f"t.{field} LIKE :prefix ESCAPE '\\'" for field in self.fields)
+        # Soft-deleted rows are dropped before the candidate limit, not after
+        live = "AND c.deleted_at IS NULL" if self.live_only else ""
+        rows = db.execute(
+            text(
+                f"SELECT t.id FROM ("
+                f"SELECT {self.fts}.rowid AS rowid, {self.fts}.rank AS rank FROM {self.fts} "
+                f"JOIN {self.name} c ON c.id = {self.fts}.rowid "
+                f"WHERE {self.fts} MATCH :match {live} LIMIT :candidates"
+                f") AS m JOIN {self.name} t ON t.id = m.rowid "
+                f"ORDER BY ({prefix}) DESC, m.rank, t.id LIMIT :limit"
+            ),
+            {
+                # A quoted string is a substring match under the trigram tokenizer
+                "match": '"' + q.replace('"', '""') + '"',
+                "prefix": _escape_like(q) + "%",
+                "candidates": MAX_CANDIDATES,
+                "limit": limit,
+            },
+        )
+        return [row[0] for row in rows]
+
+    def _search_substring(self, db: Session, q: str, limit: int, trigram: bool) -> list[int]:
+        needle = q.lower()
+        columns = [func.lower(self.table.c[field]) for field in self.fields]
+        contains = "%" + _escape_like(needle) + "%"
+        matches = [column.like(contains, escape="\\") for column in columns]
+        if trigram:
+            matches += [column.op("%")(needle) for column in columns]
+        candidates = (
+            self._live(select(self.table.c.id).where(or_(*matches)))
+            .limit(MAX_CANDIDATES)
+            .subquery()
+        )
+        prefix = _escape_like(needle) + "%"
+        order = [case((or_(*(column.like(prefix, escape="\\") for column in columns)), 0), else_=1)]
+        if trigram:
+            similarities = [func.similarity(column, needle) for column in columns]
+            order.append(
+                (func.greatest(*similarities) if len(similarities) > 1 else similarities[0]).desc()
+            )
+        stmt = (
+            select(self.table.c.id)
+            .join(candidates, candidates.c.id == self.table.c.id)
+            .order_by(*order, self.table.c.id)
+            .limit(limit)
+        )
+        return list(db.scalars(stmt))
+
+
+_indexes: dict[str, SearchIndex] = {}
+
+
+def register(table: Table, fields: Sequence[str]) -> SearchIndex:
+    """Declare a search index over `fields` of `table`"""
+    index = _indexes[table.name] = SearchIndex(table, fields)
+    return index
+
+
+def get_index(table: Table) -> Optional[SearchIndex]:
+    return _indexes.get(table.name)
+
+
+def create_search_indexes(connection: Connection) -> None:
+    for index in _indexes.values():
+        index.create(connection)
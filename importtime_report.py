@@ -0,0 +1,54 @@
+"""Summarize `python -X importtime` for a module.
+
+    python importtime_report.py            # import main
+    python importtime_report.py api.user_router --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def collect(module: str) -> list[tuple[int, int, str]]:
+    """Return (self_us, cumulative_us, module) for every import of `module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def report(module: str, top: int) -> None:
+    rows = collect(module)
+    total = next((cum for _, cum, name in rows if name == module), 0)
+    print(f"import {module}: {total / 1000:.1f} ms, {len(rows)} modules\n")
+
+    print(f"Top {top} by cumulative time")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: -r[1])[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    packages: dict[str, int] = defaultdict(int)
+    for self_us, _, name in rows:
+        packages[name.split(".")[0]] += self_us
+    print(f"\nTop {top} packages by self time")
+    for name, self_us in sorted(packages.items(), key=lambda r: -r[1])[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    report(args.module, args.top)
@@ -1,34 +1,143 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Optional
+import anyio.to_thread
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import OperationalError
+from config import Settings, settings
 from database.connection import db_manager
-from api.auth_router import router as auth_router
-from api.user_router import user_router
-from api.role_router import role_router
-from api.permission_router import permission_router
-
-# Create database tables
-db_manager.create_tables()
-
-# Initialize FastAPI app
-app = FastAPI(
-    title="FastAPI CRUD with OOP Base Implementation",
-    description="A comprehensive CRUD API with user, role, and permission management using OOP principles",
-    version="1.0.0"
-)
-
-# Include routers
-app.include_router(auth_router)
-app.include_router(user_router)
-app.include_router(role_router)
-app.include_router(permission_router)
-
-@app.get("/")
-async def root():
-    return {"message": "FastAPI CRUD with OOP Base Implementation"}
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+from services.revocation import revocation_list
+from services.purge import purge_job
+from services.jobs import job_queue
+from services.invalidation import invalidation_bus
+from services.audit import audit_writer
+from services.metrics import metrics
+from services import deadline as deadlines
+
+
+def create_app(app_settings: Optional[Settings] = None) -> FastAPI:
+    """Build the FastAPI application.
+
+    Nothing here touches the database; tables are created (when
+    ``db_create_tables`` is set) and background tasks started by the
+    lifespan handler.
+
+    ``app_settings`` (default: the global ``settings``) only covers what this
+    function builds: middleware, the lifespan options and the database URL,
+    which is applied to the process-wide ``db_manager``. Routers and
+    services are module-level instances configured from the global
+    ``settings`` when first imported (route mode, deadlines, limits, caches),
+    so set those through the environment before importing. One app per
+    process is assumed.
+    """
+    app_settings = app_settings or settings
+    db_manager.configure(app_settings.database_url)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        """Create tables and start and stop background tasks"""
+        # Sync handlers and dependencies share anyio's default threadpool
+        anyio.to_thread.current_default_thread_limiter().total_tokens = (
+            app_settings.threadpool_size
+        )
+        if app_settings.db_create_tables:
+            db_manager.create_tables()
+        revocation_list.start()
+        invalidation_bus.start()
+        purge_job.start()
+        audit_writer.start()
+        await job_queue.start()
+        yield
+        await job_queue.stop()
+        audit_writer.stop()
+        purge_job.stop()
+        invalidation_bus.stop()
+        revocation_list.stop()
+
+    # Initialize FastAPI app
+    app = FastAPI(
+        title="FastAPI CRUD with OOP Base Implementation",
+        description="A comprehensive CRUD API with user, role, and permission management using OOP principles",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+
+    if app_settings.compression_enabled:
+        from api.compression import CompressionMiddleware
+
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=app_settings.compression_min_size,
+            algorithms=app_settings.compression_algorithms,
+            gzip_level=app_settings.gzip_level,
+            brotli_quality=app_settings.brotli_quality,
+            zstd_level=app_settings.zstd_level,
+        )
+
+    if app_settings.admission_enabled:
+        from api.admission import AdmissionMiddleware
+
+        app.add_middleware(
+            AdmissionMiddleware,
+            capacity=app_settings.admission_max_concurrency,
+            limits=app_settings.admission_limits,
+            max_wait=app_settings.admission_max_wait_seconds,
+            max_queue=app_settings.admission_max_queue,
+            bulk_paths=app_settings.admission_bulk_paths,
+            bulk_limit=app_settings.admission_bulk_limit,
+        )
+
+    from api.deadline import DeadlineMiddleware
+
+    # Outermost, so the deadline covers the whole request, queueing included
+    app.add_middleware(DeadlineMiddleware, default_budget=app_settings.request_deadline_seconds)
+
+    @app.exception_handler(OperationalError)
+    async def interrupted_query(request: Request, exc: OperationalError):
+        # Statements cancelled by the deadline surface as driver errors
+        if deadlines.expired():
+            metrics.incr("deadline.interrupted")
+            return JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+        raise exc
+
+    # Include routers
+    from api.auth_router import router as auth_router
+    from api.user_router import user_router
+    from api.role_router import role_router
+    from api.permission_router import permission_router
+    from api.audit_router import router as audit_router
+    from api.dependencies import require_permissions
+
+    app.include_router(auth_router)
+    app.include_router(user_router)
+    app.include_router(role_router)
+    app.include_router(permission_router)
+    app.include_router(audit_router)
+
+    @app.get("/")
+    async def root():
+        return {"message": "FastAPI CRUD with OOP Base Implementation"}
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy"}
+
+    @app.get("/metrics", dependencies=[Depends(require_permissions(["metrics:read"]))])
+    async def read_metrics():
+        return metrics.snapshot()
+
+    return app
+
+
+def __getattr__(name: str):
+    # `uvicorn main:app` and `from main import app` build the default app on
+    # first access, so importing this module stays cheap.
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(create_app(), host="0.0.0.0", port=8000)
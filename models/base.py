@@ -1,7 +1,11 @@
-from sqlalchemy import Column, Integer, DateTime
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, DateTime, Index
+from sqlalchemy.orm import declared_attr
+from sqlalchemy.sql import func, text
 from database.connection import Base
-from typing import Any
+from typing import Any, Iterable, Optional
+
+# Columns managed by the database or the service layer, never by client data
+PROTECTED_COLUMNS = frozenset({"id", "created_at", "updated_at", "deleted_at"})
 
 class BaseModel(Base):
     """Abstract base model with common fields and methods"""
@@ -18,12 +22,67 @@ class BaseModel(Base):
             for column in self.__table__.columns
         }
     
-    def update_from_dict(self, data: dict[str, Any]) -> None:
-        """Update model instance from dictionary"""
-        for key, value in data.items():
-            if hasattr(self, key):
-                setattr(self, key, value)
+    @classmethod
+    def writable_columns(cls) -> frozenset[str]:
+        """Column names that may be written from client data"""
+        return frozenset(
+            column.key for column in cls.__table__.columns
+        ) - PROTECTED_COLUMNS
+
+    @classmethod
+    def column_values(
+        cls, data: dict[str, Any], columns: Optional[Iterable[str]] = None
+    ) -> dict[str, Any]:
+        """Subset of data whose keys are whitelisted columns"""
+        allowed = cls.writable_columns() if columns is None else frozenset(columns)
+        return {key: value for key, value in data.items() if key in allowed}
+
+    def update_from_dict(
+        self, data: dict[str, Any], columns: Optional[Iterable[str]] = None
+    ) -> None:
+        """Update model instance from dictionary.
+
+        Only keys in `columns` (default: `writable_columns()`) are applied.
+        """
+        for key, value in self.column_values(data, columns).items():
+            setattr(self, key, value)
     
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__}(id={self.id})>"
 
+class SoftDeleteMixin:
+    """Opt-in soft delete for a BaseModel subclass.
+
+    Deleting sets ``deleted_at`` instead of removing the row. Columns in
+    ``__live_unique__`` are unique among live rows only, through partial
+    unique indexes that also serve live lookups by those columns, so a
+    soft-deleted row doesn't hold on to its name. Another partial index
+    covers deleted rows for the purge job.
+    """
+
+    __live_unique__: tuple[str, ...] = ()
+
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    @declared_attr
+    def __table_args__(cls):
+        live = text("deleted_at IS NULL")
+        deleted = text("deleted_at IS NOT NULL")
+        return (
+            *(
+                Index(
+                    f"ux_{cls.__tablename__}_live_{column}",
+                    column,
+                    unique=True,
+                    postgresql_where=live,
+                    sqlite_where=live,
+                )
+                for column in cls.__live_unique__
+            ),
+            Index(
+                f"ix_{cls.__tablename__}_deleted_at",
+                "deleted_at",
+                postgresql_where=deleted,
+                sqlite_where=deleted,
+            ),
+        )
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, Table
+from sqlalchemy import JSON, Column, Integer, LargeBinary, String, Boolean, DateTime, ForeignKey, Index, Table
 from sqlalchemy.orm import relationship
-from models.base import BaseModel
+from models.base import BaseModel, SoftDeleteMixin
+from database import role_closure as role_closure_maintenance, search
 
 # Association tables for many-to-many relationships
 user_roles = Table(
@@ -17,33 +18,52 @@ role_permissions = Table(
     Column('permission_id', ForeignKey('permissions.id'))
 )
 
-class User(BaseModel):
+# Role hierarchy: `role_id` inherits every permission of `parent_id`
+role_inheritance = Table(
+    'role_inheritance',
+    BaseModel.metadata,
+    Column('role_id', ForeignKey('roles.id'), primary_key=True),
+    Column('parent_id', ForeignKey('roles.id'), primary_key=True),
+    Index('ix_role_inheritance_parent_id', 'parent_id'),
+)
+
+# Transitive closure of role_inheritance, one row per (role, role it inherits
+# from at any depth), including (role, role, 0); see database/role_closure.py
+role_closure = Table(
+    'role_closure',
+    BaseModel.metadata,
+    Column('role_id', ForeignKey('roles.id'), primary_key=True),
+    Column('inherited_id', ForeignKey('roles.id'), primary_key=True),
+    Column('depth', Integer, nullable=False),
+    Index('ix_role_closure_inherited_id', 'inherited_id'),
+)
+
+class User(SoftDeleteMixin, BaseModel):
     __tablename__ = "users"
+    __live_unique__ = ("username", "email")
     
-    username = Column(String, unique=True, index=True, nullable=False)
-    email = Column(String, unique=True, index=True, nullable=False)
+    username = Column(String, nullable=False)
+    email = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     
     roles = relationship("Role", secondary=user_roles, back_populates="users")
+
+    @property
+    def role_ids(self) -> list[int]:
+        return [role.id for role in self.roles]
     
     def has_permission(self, resource: str, action: str) -> bool:
-        """Check if user has specific permission"""
-        for role in self.roles:
-            for permission in role.permissions:
-                if permission.resource == resource and permission.action == action:
-                    return True
-        return False
+        """Check if user has specific permission, wildcard and inherited grants included"""
+        from services.permission_graph import permission_graph
+
+        return permission_graph.matcher(self.role_ids).allows(f"{resource}:{action}")
     
     def get_permissions(self) -> list[str]:
-        """Get all user permissions as resource:action format"""
-        permissions = []
-        for role in self.roles:
-            for permission in role.permissions:
-                perm_string = f"{permission.resource}:{permission.action}"
-                if perm_string not in permissions:
-                    permissions.append(perm_string)
-        return permissions
+        """Get all user grants in resource:action format, as held (wildcards unexpanded)"""
+        from services.permission_graph import permission_graph
+
+        return sorted(permission_graph.resolve(self.role_ids))
 
 class Role(BaseModel):
     __tablename__ = "roles"
@@ -53,6 +73,21 @@ class Role(BaseModel):
     
     users = relationship("User", secondary=user_roles, back_populates="roles")
     permissions = relationship("Permission", secondary=role_permissions, back_populates="roles")
+    # Roles whose permissions this role inherits
+    parents = relationship(
+        "Role",
+        secondary=role_inheritance,
+        primaryjoin=lambda: Role.id == role_inheritance.c.role_id,
+        secondaryjoin=lambda: Role.id == role_inheritance.c.parent_id,
+    )
+
+    @property
+    def permission_ids(self) -> list[int]:
+        return [permission.id for permission in self.permissions]
+
+    @property
+    def parent_ids(self) -> list[int]:
+        return [parent.id for parent in self.parents]
 
 class Permission(BaseModel):
     __tablename__ = "permissions"
@@ -62,4 +97,65 @@ class Permission(BaseModel):
     resource = Column(String, nullable=False)
     action = Column(String, nullable=False)
     
-    roles = relationship("Role", secondary=role_permissions, back_populates="permissions")
\ No newline at end of file
+    roles = relationship("Role", secondary=role_permissions, back_populates="permissions")
+
+role_closure_maintenance.register(Role, role_closure)
+
+search.register(User.__table__, ["username", "email"])
+search.register(Role.__table__, ["name", "description"])
+search.register(Permission.__table__, ["name", "description"])
+
+class RevokedToken(BaseModel):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, unique=True, index=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
+
+class OutboxJob(BaseModel):
+    __tablename__ = "outbox_jobs"
+
+    name = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime(timezone=True), nullable=False)
+    locked_by = Column(String, index=True)
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(String)
+
+    __table_args__ = (Index("ix_outbox_jobs_status_available_at", "status", "available_at"),)
+
+class ChangeLog(BaseModel):
+    __tablename__ = "change_log"
+
+    # `id` doubles as the feed version
+    resource = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)
+    data = Column(JSON)
+
+    __table_args__ = (Index("ix_change_log_resource_id", "resource", "id"),)
+
+class IdempotencyRecord(BaseModel):
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of user, method, path and the client's Idempotency-Key
+    key = Column(String(64), unique=True, nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    # NULL until the first request finishes
+    status_code = Column(Integer)
+    response = Column(LargeBinary)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class AuditLog(BaseModel):
+    __tablename__ = "audit_log"
+
+    actor_id = Column(Integer, index=True)
+    resource = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)
+    # Changed fields only: `before` is NULL for creates, `after` for deletes
+    before = Column(JSON)
+    after = Column(JSON)
+
+    __table_args__ = (Index("ix_audit_log_resource_entity_id", "resource", "entity_id", "id"),)
@@ -1,11 +1,24 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, Generic, TypeVar, List
+from pydantic import AfterValidator, BaseModel, ConfigDict, WithJsonSchema
+from pydantic.networks import validate_email
+from typing import Annotated, Optional, Generic, TypeVar, List
 from datetime import datetime
 from abc import ABC, abstractmethod
 
 # Generic type for model
 ModelType = TypeVar('ModelType')
 
+def _validate_email(value: str) -> str:
+    """Validate and normalize an email, importing email_validator on first use"""
+    return validate_email(value)[1]
+
+# Same validation as pydantic.EmailStr without importing email_validator at
+# schema definition time
+EmailStr = Annotated[
+    str,
+    AfterValidator(_validate_email),
+    WithJsonSchema({"type": "string", "format": "email"}),
+]
+
 class BaseSchema(BaseModel, ABC):
     """Base schema with common configuration"""
     model_config = ConfigDict(from_attributes=True)
@@ -1,6 +1,6 @@
-from pydantic import EmailStr
-from typing import List, Optional
-from schemas.base import BaseCreateSchema, BaseUpdateSchema, BaseResponseSchema
+from typing import Annotated, Any, Dict, List, Optional
+from pydantic import Field
+from schemas.base import BaseCreateSchema, BaseUpdateSchema, BaseResponseSchema, EmailStr
 
 # Permission schemas
 class PermissionBase(BaseCreateSchema):
@@ -9,14 +9,19 @@ class PermissionBase(BaseCreateSchema):
     resource: str
     action: str
 
+# Dotted resource path and action of a grant; any segment may be the `*` wildcard
+PermissionResource = Annotated[str, Field(pattern=r"^(\*|[^.:*\s]+)(\.(\*|[^.:*\s]+))*$")]
+PermissionAction = Annotated[str, Field(pattern=r"^(\*|[^.:*\s]+)$")]
+
 class PermissionCreate(PermissionBase):
-    pass
+    resource: PermissionResource
+    action: PermissionAction
 
 class PermissionUpdate(BaseUpdateSchema):
     name: Optional[str] = None
     description: Optional[str] = None
-    resource: Optional[str] = None
-    action: Optional[str] = None
+    resource: Optional[PermissionResource] = None
+    action: Optional[PermissionAction] = None
 
 class PermissionResponse(PermissionBase, BaseResponseSchema):
     pass
@@ -28,14 +33,25 @@ class RoleBase(BaseCreateSchema):
 
 class RoleCreate(RoleBase):
     permission_ids: Optional[List[int]] = []
+    # Roles whose permissions this role inherits
+    parent_ids: Optional[List[int]] = []
 
 class RoleUpdate(BaseUpdateSchema):
     name: Optional[str] = None
     description: Optional[str] = None
     permission_ids: Optional[List[int]] = None
+    parent_ids: Optional[List[int]] = None
 
 class RoleResponse(RoleBase, BaseResponseSchema):
     permissions: List[PermissionResponse] = []
+    parent_ids: List[int] = []
+
+class RoleSummary(RoleBase, BaseResponseSchema):
+    pass
+
+class RoleWithIds(RoleSummary):
+    permission_ids: List[int] = []
+    parent_ids: List[int] = []
 
 # User schemas
 class UserBase(BaseCreateSchema):
@@ -57,10 +73,34 @@ class UserResponse(UserBase, BaseResponseSchema):
     is_active: bool
     roles: List[RoleResponse] = []
 
+class UserSummary(UserBase, BaseResponseSchema):
+    is_active: bool
+
+class UserWithIds(UserSummary):
+    role_ids: List[int] = []
+
+# Audit schemas
+class AuditLogResponse(BaseResponseSchema):
+    actor_id: Optional[int] = None
+    resource: str
+    entity_id: int
+    action: str
+    before: Optional[Dict[str, Any]] = None
+    after: Optional[Dict[str, Any]] = None
+
+class AuditLogPage(BaseCreateSchema):
+    items: List[AuditLogResponse]
+    # Pass as `before_id` for the next page; None on the last page
+    next: Optional[int] = None
+
 # Authentication schemas
 class Token(BaseCreateSchema):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseCreateSchema):
+    refresh_token: str
 
 class TokenData(BaseCreateSchema):
     username: Optional[str] = None
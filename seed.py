@@ -1,8 +1,8 @@
 from sqlalchemy.orm import Session
-from database.connection import engine, Base
+from database.connection import engine, Base, db_manager
 from models.models import User, Role, Permission
 from sqlalchemy.exc import IntegrityError
-from passlib.hash import bcrypt
+from services.auth_service import auth_service
 
 
 def make_crud(resource):
@@ -36,7 +36,7 @@ def make_crud(resource):
 
 def seed_data(refresh: bool = False):
     # create tables
-    Base.metadata.create_all(bind=engine)
+    db_manager.create_tables()
 
     session = Session(bind=engine)
 
@@ -53,6 +53,24 @@ def seed_data(refresh: bool = False):
             *make_crud("users"),
             *make_crud("roles"),
             *make_crud("permissions"),
+            {
+                "name": "View audit",
+                "description": "Can view the audit log",
+                "resource": "audit",
+                "action": "read",
+            },
+            {
+                "name": "View metrics",
+                "description": "Can read the metrics snapshot",
+                "resource": "metrics",
+                "action": "read",
+            },
+            {
+                "name": "Full access",
+                "description": "Can do anything on any resource",
+                "resource": "*",
+                "action": "*",
+            },
         ]
 
         permissions = []
@@ -80,8 +98,8 @@ def seed_data(refresh: bool = False):
 
         session.flush()  # flush to get IDs
 
-        # assign all permissions to admin
-        admin_role.permissions = permissions
+        # admin holds the wildcard grant, covering resources added later
+        admin_role.permissions = [permissions[-1]]
 
         # assign only view permission to user
         user_role.permissions = [permissions[0]]
@@ -92,7 +110,7 @@ def seed_data(refresh: bool = False):
             admin_user = User(
                 username="admin",
                 email="admin@example.com",
-                hashed_password=bcrypt.hash("admin123"),
+                hashed_password=auth_service.get_password_hash("admin123"),
                 is_active=True,
                 roles=[admin_role],
             )
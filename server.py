@@ -0,0 +1,166 @@
+"""Production server: pre-forked uvicorn workers sharing one listening socket.
+
+The application is built and the database schema is created once in the
+parent process. Workers are then forked, so each starts with the app already
+loaded and an empty connection pool. SIGTERM/SIGINT stop accepting
+connections and let in-flight requests drain for
+``settings.server_graceful_timeout`` seconds before workers are killed.
+With ``INVALIDATION_CHANNEL=pipe`` the supervisor also relays cache
+invalidation messages between workers.
+
+    python server.py
+"""
+import os
+import signal
+import sys
+import time
+from typing import Optional
+
+import uvicorn
+from config import settings
+
+
+def worker_count() -> int:
+    """Configured number of workers, defaulting to one per core"""
+    return settings.server_workers or os.cpu_count() or 1
+
+
+def prepare_database() -> None:
+    """Run schema DDL once and drop pooled connections before forking"""
+    from database.connection import db_manager
+
+    db_manager.create_tables()
+    db_manager.engine.dispose()
+
+
+def build_config(app) -> uvicorn.Config:
+    return uvicorn.Config(
+        app,
+        host=settings.server_host,
+        port=settings.server_port,
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive_timeout,
+        timeout_graceful_shutdown=settings.server_graceful_timeout,
+        proxy_headers=settings.server_proxy_headers,
+        lifespan="on",
+    )
+
+
+class Supervisor:
+    """Fork workers, restart ones that die and stop them all gracefully"""
+
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.children: dict[int, float] = {}
+        self.stopping = False
+        self.sockets = []
+        self.hub = None
+        if settings.invalidation_channel == "pipe":
+            from services.invalidation import PipeHub
+
+            self.hub = PipeHub()
+
+    def run(self) -> None:
+        self.sockets = [self.config.bind_socket()]
+        if self.hub is not None:
+            self.hub.start()
+        for _ in range(self.workers):
+            self.spawn()
+
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGINT, self.handle_exit)
+        print(f"Started {self.workers} workers on {self.config.host}:{self.config.port}")
+
+        deadline: Optional[float] = None
+        while self.children:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + settings.server_graceful_timeout + 5
+            if deadline is not None and time.monotonic() > deadline:
+                self.signal_children(signal.SIGKILL)
+            self.reap()
+            time.sleep(0.2)
+
+        for sock in self.sockets:
+            sock.close()
+
+    def spawn(self) -> None:
+        from services.invalidation import PipeChannel, invalidation_bus, load_channel
+
+        hub_end, worker_end = self.hub.pipe() if self.hub is not None else (None, None)
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            if self.hub is not None:
+                self.hub.add(pid, hub_end)
+                worker_end.close()
+            return
+        # Child: start from the default handlers and a fresh connection pool
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        from database.connection import db_manager
+
+        db_manager.engine.dispose(close=False)
+        # A fresh channel (and sender id) per worker, so workers hear each other
+        if self.hub is not None:
+            hub_end.close()
+            self.hub.close_inherited()
+            invalidation_bus.set_channel(PipeChannel(worker_end))
+        else:
+            invalidation_bus.set_channel(load_channel(settings.invalidation_channel))
+        try:
+            uvicorn.Server(self.config).run(sockets=self.sockets)
+        finally:
+            os._exit(0)
+
+    def reap(self) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            if self.hub is not None:
+                self.hub.remove(pid)
+            if started is None or self.stopping:
+                continue
+            print(f"Worker {pid} exited with status {status}, restarting")
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self.spawn()
+
+    def signal_children(self, sig: int) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+    def handle_exit(self, sig, frame) -> None:
+        if not self.stopping:
+            print("Shutting down, draining in-flight requests")
+        self.stopping = True
+        self.signal_children(signal.SIGTERM)
+
+
+def main() -> None:
+    from main import create_app
+
+    # Workers skip the lifespan DDL; it runs once here before forking
+    app = create_app(settings.model_copy(update={"db_create_tables": False}))
+    prepare_database()
+    config = build_config(app)
+    workers = worker_count()
+
+    if workers == 1 or not hasattr(os, "fork"):
+        uvicorn.Server(config).run()
+        return
+
+    Supervisor(config, workers).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
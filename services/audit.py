@@ -0,0 +1,199 @@
+import logging
+import threading
+from collections import deque
+from typing import Any, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+from database.connection import db_manager
+from models.models import AuditLog
+from services.metrics import metrics
+from services.changes import UPDATED
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# "buffered": rows are written in batches after commit; a crash can lose the
+#             last flush interval of events
+# "sync":     rows are inserted in the audited transaction itself
+DURABILITY_MODES = ("buffered", "sync")
+
+
+def diff(before: Optional[dict], after: Optional[dict]) -> tuple[Optional[dict], Optional[dict]]:
+    """Reduce two snapshots to the fields that differ"""
+    if before is None or after is None:
+        return before, after
+    changed = [key for key in after.keys() | before.keys() if before.get(key) != after.get(key)]
+    return (
+        {key: before.get(key) for key in changed},
+        {key: after.get(key) for key in changed},
+    )
+
+
+class AuditWriter:
+    """Append-only audit log with batched inserts.
+
+    Events are attached to the session and handed over only once its
+    transaction commits, so rolled-back writes are never audited. In
+    buffered mode a background thread inserts them in batches of
+    `batch_size` or every `flush_interval` seconds, whichever comes first.
+    A full buffer is flushed by the committing thread instead of growing.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        durability: str = "buffered",
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_buffer: int = 10_000,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown audit durability {durability!r}, expected one of {DURABILITY_MODES}")
+        self.enabled = enabled
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: deque[dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(
+        self,
+        db: Session,
+        resource: str,
+        entity_id: int,
+        action: str,
+        before: Optional[dict] = None,
+        after: Optional[dict] = None,
+    ) -> None:
+        """Audit a change made in the session's current transaction"""
+        before, after = diff(before, after)
+        if action == UPDATED and not after:
+            return
+        row = {
+            "actor_id": db.info.get("actor_id"),
+            "resource": resource,
+            "entity_id": entity_id,
+            "action": action,
+            "before": jsonable_encoder(before) if before is not None else None,
+            "after": jsonable_encoder(after) if after is not None else None,
+        }
+        if self.durability == "sync":
+            db.execute(insert(AuditLog), [row])
+        else:
+            db.info.setdefault("audit_events", []).append(row)
+
+    def submit(self, rows: list[dict[str, Any]]) -> None:
+        """Queue committed events for the next batch"""
+        with self._lock:
+            self._buffer.extend(rows)
+            size = len(self._buffer)
+        if size >= self.max_buffer:
+            # Backpressure: the writer pays for the flush rather than dropping events
+            metrics.incr("audit.inline_flushes")
+            self.flush()
+        elif size >= self.batch_size:
+            self._wakeup.set()
+        self._ensure_started()
+
+    def flush(self) -> int:
+        """Insert everything buffered; returns the number of rows written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    return written
+                try:
+                    with db_manager.engine.begin() as conn:
+                        conn.execute(insert(AuditLog), batch)
+                except Exception:
+                    logger.exception("Audit flush failed, %s events requeued", len(batch))
+                    with self._lock:
+                        self._buffer.extendleft(reversed(batch))
+                        overflow = len(self._buffer) - self.max_buffer
+                        for _ in range(max(overflow, 0)):
+                            self._buffer.pop()
+                    if overflow > 0:
+                        metrics.incr("audit.dropped", overflow)
+                    return written
+                written += len(batch)
+                metrics.incr("audit.written", len(batch))
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopped.clear()
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit writer failed")
+
+    def start(self) -> None:
+        self._ensure_started()
+
+    def stop(self) -> None:
+        """Stop the writer thread and flush what is left"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def page(
+        self,
+        db: Session,
+        limit: int,
+        before_id: Optional[int] = None,
+        resource: Optional[str] = None,
+        entity_id: Optional[int] = None,
+        actor_id: Optional[int] = None,
+    ) -> list[AuditLog]:
+        """Newest-first keyset page: entries with id below `before_id`"""
+        stmt = select(AuditLog)
+        if before_id is not None:
+            stmt = stmt.where(AuditLog.id < before_id)
+        if resource is not None:
+            stmt = stmt.where(AuditLog.resource == resource)
+        if entity_id is not None:
+            stmt = stmt.where(AuditLog.entity_id == entity_id)
+        if actor_id is not None:
+            stmt = stmt.where(AuditLog.actor_id == actor_id)
+        return list(db.scalars(stmt.order_by(AuditLog.id.desc()).limit(limit)))
+
+
+# Global audit writer instance
+audit_writer = AuditWriter(
+    enabled=settings.audit_enabled,
+    durability=settings.audit_durability,
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval_seconds,
+    max_buffer=settings.audit_max_buffer,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_audit_events(session: Session) -> None:
+    rows = session.info.pop("audit_events", None)
+    if rows:
+        audit_writer.submit(rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_audit_events(session: Session) -> None:
+    session.info.pop("audit_events", None)
@@ -1,23 +1,76 @@
+import uuid
 from datetime import datetime, timedelta, UTC
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import cached_property
+from typing import TYPE_CHECKING, Optional
 from fastapi import HTTPException, status
 from config import settings
+from services.metrics import metrics
+from services.token_cache import token_cache
+from services.revocation import revocation_list
+from services.rate_limiter import verification_limiter
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
 
 
 class AuthService:
-    """Service for authentication operations"""
+    """Service for authentication operations.
+
+    ``jose`` and ``passlib`` are imported on first use to keep startup fast.
+    """
 
     def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
         self.secret_key = settings.secret_key
         self.algorithm = settings.algorithm
         self.access_token_expire_minutes = settings.access_token_expire_minutes
+        self.refresh_token_expire_days = settings.refresh_token_expire_days
+
+    @cached_property
+    def pwd_context(self) -> "CryptContext":
+        return self._build_pwd_context()
+
+    @staticmethod
+    def _build_pwd_context() -> "CryptContext":
+        """Build the password context from settings.
+
+        The first scheme hashes new passwords; the others only verify. Hashes
+        made with another scheme or cost report ``needs_update``.
+        """
+        from passlib.context import CryptContext
+
+        options = {}
+        if "bcrypt" in settings.password_schemes:
+            options.update(
+                bcrypt__rounds=settings.bcrypt_rounds,
+                bcrypt__min_rounds=settings.bcrypt_rounds,
+                bcrypt__max_rounds=settings.bcrypt_rounds,
+            )
+        if "argon2" in settings.password_schemes:
+            options.update(
+                argon2__memory_cost=settings.argon2_memory_cost,
+                argon2__rounds=settings.argon2_time_cost,
+                argon2__min_rounds=settings.argon2_time_cost,
+                argon2__max_rounds=settings.argon2_time_cost,
+                argon2__parallelism=settings.argon2_parallelism,
+            )
+        return CryptContext(
+            schemes=settings.password_schemes, deprecated="auto", **options
+        )
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a plain password against hashed password"""
-        return self.pwd_context.verify(plain_password, hashed_password)
+        with verification_limiter.slot():
+            return self.pwd_context.verify(plain_password, hashed_password)
+
+    def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        """Verify a password and return a new hash if the stored one is outdated"""
+        with verification_limiter.slot():
+            return self.pwd_context.verify_and_update(plain_password, hashed_password)
 
     def get_password_hash(self, password: str) -> str:
         """Generate password hash"""
@@ -27,6 +80,8 @@ class AuthService:
         self, data: dict, expires_delta: Optional[timedelta] = None
     ) -> str:
         """Create JWT access token"""
+        from jose import jwt
+
         to_encode = data.copy()
         if expires_delta:
             expire = datetime.now(UTC) + expires_delta
@@ -37,26 +92,116 @@ class AuthService:
             )
             # expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
 
-        to_encode.update({"exp": expire})
+        to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": ACCESS_TOKEN})
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
 
-    def verify_token(self, token: str) -> str:
-        """Verify JWT token and return username"""
+    def create_refresh_token(
+        self, data: dict, expires_delta: Optional[timedelta] = None
+    ) -> str:
+        """Create long-lived JWT refresh token"""
+        from jose import jwt
+
+        to_encode = data.copy()
+        expire = datetime.now(UTC) + (
+            expires_delta or timedelta(days=self.refresh_token_expire_days)
+        )
+        to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": REFRESH_TOKEN})
+        return jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+
+    def create_token_pair(self, username: str, family: Optional[str] = None) -> dict:
+        """Create access and refresh tokens for a user.
+
+        Tokens rotated from one login share its `fid` (token family), so the
+        whole chain can be revoked when a rotated refresh token is reused.
+        """
+        data = {"sub": username, "fid": family or uuid.uuid4().hex}
+        return {
+            "access_token": self.create_access_token(data=data),
+            "refresh_token": self.create_refresh_token(data=data),
+            "token_type": "bearer",
+        }
+
+    def decode_token(
+        self, token: str, token_type: str = ACCESS_TOKEN, check_jti: bool = True
+    ) -> dict:
+        """Decode a JWT, checking its type and revocation state.
+
+        With ``check_jti=False`` a revoked token id is left to the caller; a
+        revoked token family is always rejected.
+        """
+        from jose import JWTError, jwt
+
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            username: str = payload.get("sub")
-            if username is None:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Could not validate credentials",
-                )
-            return username
         except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
+        if (
+            payload.get("sub") is None
+            or payload.get("type", ACCESS_TOKEN) != token_type
+            or (check_jti and revocation_list.is_revoked(payload.get("jti")))
+            or revocation_list.is_revoked(payload.get("fid"))
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+            )
+        return payload
+
+    def verify_token(self, token: str) -> str:
+        """Verify JWT token and return username"""
+        cached = token_cache.get(token)
+        if cached is not None:
+            if revocation_list.is_revoked(cached.jti) or revocation_list.is_revoked(cached.fid):
+                token_cache.revoke(token)
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Could not validate credentials",
+                )
+            return cached.username
+        payload = self.decode_token(token)
+        username: str = payload["sub"]
+        if "exp" in payload:
+            token_cache.put(
+                token, username, payload["exp"], payload.get("jti"), payload.get("fid")
+            )
+        return username
+
+    def revoke_token(self, token: str, token_type: str = ACCESS_TOKEN) -> None:
+        """Revoke a token until it expires"""
+        payload = self.decode_token(token, token_type)
+        token_cache.revoke(token)
+        if payload.get("jti") and "exp" in payload:
+            revocation_list.revoke(payload["jti"], payload["exp"])
+
+    def rotate_refresh_token(self, refresh_token: str) -> tuple[str, Optional[str]]:
+        """Revoke a refresh token; returns the username and token family it was issued to.
+
+        The revocation is written to the shared table before returning, so
+        the token can't be rotated again on any worker. A second rotation is
+        treated as theft: the whole token family is revoked.
+        """
+        payload = self.decode_token(refresh_token, REFRESH_TOKEN, check_jti=False)
+        jti = payload.get("jti")
+        if jti and "exp" in payload:
+            if revocation_list.is_revoked(jti) or not revocation_list.revoke_now(
+                jti, payload["exp"]
+            ):
+                metrics.incr("auth.refresh_reuse")
+                if payload.get("fid"):
+                    # Outlives every refresh token the family may still hold
+                    revocation_list.revoke_now(
+                        payload["fid"],
+                        (datetime.now(UTC) + timedelta(days=self.refresh_token_expire_days)).timestamp(),
+                    )
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Could not validate credentials",
+                )
+        return payload["sub"], payload.get("fid")
 
 
 # Global auth service instance
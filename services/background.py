@@ -0,0 +1,47 @@
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Run a function every `interval` seconds on a daemon thread"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], None]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the worker thread if it is not already running"""
+        if self.running or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, run_final: bool = True, timeout: float = 5.0) -> None:
+        """Stop the worker thread, optionally running the function one last time"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if run_final:
+            self._call()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._call()
+
+    def _call(self) -> None:
+        try:
+            self.func()
+        except Exception:
+            logger.exception("Periodic task %s failed", self.name)
@@ -1,8 +1,19 @@
+import time
 from abc import ABC
-from typing import TypeVar, Generic, Optional, List, Type, Any
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import TypeVar, Generic, Literal, Optional, List, Sequence, Type, Any, Callable, Hashable, get_args
+from sqlalchemy import Select, bindparam, func, select, update
+from sqlalchemy.orm import Query, Session, lazyload, selectinload
 from sqlalchemy.exc import IntegrityError
-from models.base import BaseModel
+from models.base import BaseModel, SoftDeleteMixin
+from database.connection import db_manager
+from database import search
+from services.changes import change_feed, CREATED, UPDATED, DELETED
+from services.jobs import job_queue
+from services.invalidation import FORWARD_JOB, invalidation_bus
+from services.audit import audit_writer
+from services.singleflight import single_flight
+from services import deadline as deadlines, rows
 from schemas.base import BaseCreateSchema, BaseUpdateSchema, BaseResponseSchema
 from fastapi import HTTPException, status
 
@@ -11,25 +22,213 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseCreateSchema)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseUpdateSchema)
 
 
+# How much of a record's relationships a read loads: nested objects, ids only,
+# nothing, or everything for a response with related rows in side tables
+ExpandMode = Literal["full", "ids", "none", "normalized"]
+EXPAND_MODES = get_args(ExpandMode)
+
+
+def _arrived() -> float:
+    """When the current request arrived, so shared reads never predate it"""
+    deadline = deadlines.current()
+    return deadline.started if deadline is not None else time.monotonic()
+
+
 class BaseService(ABC, Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """Base service class with common CRUD operations"""
 
+    # Relationship attributes controlled by `load_options`
+    relations: tuple[str, ...] = ()
+    # Dotted relationship paths loaded for expand=full, e.g. "roles.permissions";
+    # defaults to `relations`
+    full_paths: tuple[str, ...] = ()
+
     def __init__(self, model: Type[ModelType]):
         self.model = model
+        self.resource = model.__tablename__
+        self.soft_delete = issubclass(model, SoftDeleteMixin)
+        # Hot-path statements, built once and reused with bound parameters so
+        # each call skips construction and cache-key generation
+        self._statements: dict[Hashable, Select] = {}
+        self._option_sets: dict[str, tuple] = {}
+
+    def query(self, db: Session) -> Query:
+        """Query over live records (soft-deleted rows excluded)"""
+        query = db.query(self.model)
+        if self.soft_delete:
+            query = query.filter(self.model.deleted_at.is_(None))
+        return query
+
+    def select(self) -> Select:
+        """select() over live records (soft-deleted rows excluded)"""
+        stmt = select(self.model)
+        if self.soft_delete:
+            stmt = stmt.where(self.model.deleted_at.is_(None))
+        return stmt
+
+    def statement(
+        self, key: Hashable, build: Callable[[], Select], options: Sequence = ()
+    ) -> Select:
+        """Statement from `build`, cached under `key`.
+
+        Options returned by `load_options` are cached alongside; any other
+        options are applied to a fresh copy.
+        """
+        if options:
+            if not any(options is cached for cached in self._option_sets.values()):
+                return self.statement(key, build).options(*options)
+            key = (key, id(options))
+        stmt = self._statements.get(key)
+        if stmt is None:
+            stmt = build()
+            if options:
+                stmt = stmt.options(*options)
+            self._statements[key] = stmt
+        return stmt
 
-    def get(self, db: Session, id: int) -> Optional[ModelType]:
-        """Get single record by id"""
-        return db.query(self.model).filter(self.model.id == id).first()
+    def load_options(self, expand: ExpandMode = "full") -> tuple:
+        """Loader options for `relations` matching an expand mode (memoized)"""
+        options = self._option_sets.get(expand)
+        if options is None:
+            options = self._option_sets[expand] = tuple(self._build_load_options(expand))
+        return options
+
+    def _build_load_options(self, expand: ExpandMode) -> list:
+        if expand in ("full", "normalized"):
+            return self._full_load_options()
+        options = []
+        for name in self.relations:
+            attr = getattr(self.model, name)
+            if expand == "ids":
+                related = attr.property.mapper.class_
+                options.append(selectinload(attr).load_only(related.id))
+            else:
+                options.append(lazyload(attr))
+        return options
+
+    def get(
+        self, db: Session, id: int, options: Sequence = (), shared: bool = False
+    ) -> Optional[ModelType]:
+        """Get single record by id; see `_shared` for `shared`"""
+        if shared:
+            return self._shared(db, ("get", id), lambda own: self.get(own, id, options), options)
+        stmt = self.statement(
+            "get", lambda: self.select().where(self.model.id == bindparam("id")), options
+        )
+        return db.scalars(stmt, {"id": id}).first()
+
+    def get_many(
+        self, db: Session, ids: Sequence[int], options: Sequence = ()
+    ) -> List[ModelType]:
+        """Get records by id with one IN query, in the order requested"""
+        if not ids:
+            return []
+        stmt = self.statement(
+            "get_many",
+            lambda: self.select().where(self.model.id.in_(bindparam("ids", expanding=True))),
+            options,
+        )
+        found = {obj.id: obj for obj in db.scalars(stmt, {"ids": list(ids)})}
+        return [found[id] for id in dict.fromkeys(ids) if id in found]
+
+    def search(
+        self, db: Session, q: str, limit: int = 20, options: Sequence = ()
+    ) -> List[ModelType]:
+        """Ranked text search over the model's registered search index"""
+        index = search.get_index(self.model.__table__)
+        if index is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Search is not available for {self.resource}",
+            )
+        return self.get_many(db, index.search_ids(db, q, limit), options=options)
 
     def get_multi(
-        self, db: Session, skip: int = 0, limit: int = 100
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        options: Sequence = (),
+        shared: bool = False,
     ) -> List[ModelType]:
-        """Get multiple records with pagination"""
-        return db.query(self.model).offset(skip).limit(limit).all()
+        """Get multiple records with pagination; see `_shared` for `shared`"""
+        if shared:
+            return self._shared(
+                db,
+                ("get_multi", skip, limit),
+                lambda own: self.get_multi(own, skip, limit, options),
+                options,
+            )
+        stmt = self.statement(
+            "get_multi",
+            lambda: self.select().offset(bindparam("skip")).limit(bindparam("limit")),
+            options,
+        )
+        return list(db.scalars(stmt, {"skip": skip, "limit": limit}))
+
+    def get_rows(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        expand: ExpandMode = "full",
+        shared: bool = False,
+    ) -> list:
+        """Read-only page as `__slots__` structs, bypassing the ORM.
+
+        Same rows and relationship data as `get_multi` with the matching
+        `load_options`, for responses that are serialized and discarded.
+        Structs are not attached to any session, so `shared` callers receive
+        the leader's list as is.
+        """
+        if shared:
+            return single_flight.do(
+                (self.resource, "get_rows", skip, limit, expand),
+                lambda: self.get_rows(db, skip, limit, expand),
+                not_before=_arrived(),
+            )
+        stmt = self.statement(
+            "get_rows",
+            lambda: self.select()
+            .with_only_columns(*rows.columns_of(self.model))
+            .offset(bindparam("skip"))
+            .limit(bindparam("limit")),
+        )
+        items = rows.structs(self.model, db.execute(stmt, {"skip": skip, "limit": limit}))
+        if expand == "ids":
+            rows.attach(db, self.model, items, self.relations, ids_only=True)
+        elif expand in ("full", "normalized"):
+            rows.attach(db, self.model, items, self.full_paths or self.relations)
+        return items
+
+    def get_page(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        expand: ExpandMode = "full",
+        shared: bool = False,
+    ) -> tuple[int, list]:
+        """`get_rows` with the change feed version read just before it.
+
+        Following the feed from that version misses nothing the page lacks;
+        `shared` callers receive the version together with the rows.
+        """
+        if shared:
+            return single_flight.do(
+                (self.resource, "get_page", skip, limit, expand),
+                lambda: self.get_page(db, skip, limit, expand),
+                not_before=_arrived(),
+            )
+        return change_feed.latest(db, self.resource), self.get_rows(db, skip, limit, expand)
 
     def count(self, db: Session) -> int:
         """Get total count of records"""
-        return db.query(self.model).count()
+        stmt = self.statement(
+            "count",
+            lambda: self.select().with_only_columns(func.count(), maintain_column_froms=True),
+        )
+        return db.scalar(stmt)
 
     def create(self, db: Session, obj_in: CreateSchemaType) -> ModelType:
         """Create new record"""
@@ -39,9 +238,12 @@ class BaseService(ABC, Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             )
             db_obj = self.model(**self._prepare_create_data(obj_data))
             db.add(db_obj)
+            db.flush()
+            self._post_create(db, db_obj, obj_in)
+            self._record_change(db, CREATED, db_obj.id, db_obj)
+            self._audit(db, CREATED, db_obj.id, after=self._change_payload(db_obj))
             db.commit()
             db.refresh(db_obj)
-            self._post_create(db, db_obj, obj_in)
             return db_obj
         except IntegrityError as e:
             db.rollback()
@@ -61,14 +263,69 @@ class BaseService(ABC, Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 else obj_in.dict(exclude_unset=True)
             )
             update_data = self._prepare_update_data(update_data)
+            before = self._change_payload(db_obj) if audit_writer.enabled else None
+            db_obj.update_from_dict(update_data)
 
-            for field, value in update_data.items():
-                if hasattr(db_obj, field):
-                    setattr(db_obj, field, value)
-
+            db.flush()
+            self._post_update(db, db_obj, obj_in)
+            self._record_change(db, UPDATED, db_obj.id, db_obj)
+            self._audit(db, UPDATED, db_obj.id, before, self._change_payload(db_obj))
             db.commit()
             db.refresh(db_obj)
+            return db_obj
+        except IntegrityError as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Update failed: {str(e.orig)}",
+            )
+
+    def patch(
+        self, db: Session, id: int, obj_in: UpdateSchemaType
+    ) -> Optional[ModelType]:
+        """Partially update a record without loading it first.
+
+        Issues a single ``UPDATE ... WHERE id=? RETURNING *`` (or UPDATE
+        followed by a get where RETURNING is unsupported) and returns None
+        when no row matched. Relationships are left unloaded until accessed.
+        """
+        try:
+            update_data = self._prepare_update_data(
+                obj_in.model_dump(exclude_unset=True)
+            )
+            values = self.model.column_values(update_data)
+            if values:
+                stmt = update(self.model).where(self.model.id == id).values(**values)
+                if self.soft_delete:
+                    stmt = stmt.where(self.model.deleted_at.is_(None))
+                if db.get_bind().dialect.update_returning:
+                    db_obj = db.scalars(
+                        stmt.returning(self.model),
+                        execution_options={"populate_existing": True},
+                    ).first()
+                else:
+                    matched = db.execute(stmt).rowcount
+                    db_obj = self.get(db, id) if matched else None
+            else:
+                db_obj = self.get(db, id)
+
+            if db_obj is None:
+                db.rollback()
+                return None
+
             self._post_update(db, db_obj, obj_in)
+            self._record_change(db, UPDATED, db_obj.id, db_obj)
+            if audit_writer.enabled:
+                # The row was never loaded, so only the new values are known
+                after = self._change_payload(db_obj)
+                written = obj_in.model_dump(exclude_unset=True).keys() | update_data.keys()
+                self._audit(db, UPDATED, db_obj.id, after={key: after[key] for key in written if key in after})
+            # Keep the RETURNING values loaded so the response needs no reload
+            db.expire_on_commit = False
+            try:
+                db.commit()
+            finally:
+                db.expire_on_commit = True
             return db_obj
         except IntegrityError as e:
             db.rollback()
@@ -78,21 +335,154 @@ class BaseService(ABC, Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             )
 
     def delete(self, db: Session, id: int) -> bool:
-        """Delete record by id"""
+        """Delete record by id.
+
+        Soft-delete models are marked with a single UPDATE without loading
+        the row; `_pre_delete` only runs for hard deletes.
+        """
+        if self.soft_delete:
+            result = db.execute(
+                update(self.model)
+                .where(self.model.id == id, self.model.deleted_at.is_(None))
+                .values(deleted_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                db.rollback()
+                return False
+            self._post_delete(db, id)
+            self._record_change(db, DELETED, id)
+            self._audit(db, DELETED, id)
+            db.commit()
+            return True
+
         db_obj = self.get(db, id)
         if not db_obj:
             return False
 
         self._pre_delete(db, db_obj)
+        before = self._change_payload(db_obj) if audit_writer.enabled else None
         db.delete(db_obj)
+        self._post_delete(db, id)
+        self._record_change(db, DELETED, id)
+        self._audit(db, DELETED, id, before=before)
         db.commit()
         return True
 
+    def purge_deleted(
+        self, db: Session, deleted_before: datetime, batch_size: int = 500
+    ) -> int:
+        """Hard-delete one batch of rows soft-deleted before a cutoff"""
+        if not self.soft_delete:
+            return 0
+        ids = db.scalars(
+            select(self.model.id)
+            .where(
+                self.model.deleted_at.is_not(None),
+                self.model.deleted_at < deleted_before,
+            )
+            .order_by(self.model.deleted_at)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return 0
+        for db_obj in db.query(self.model).filter(self.model.id.in_(ids)):
+            self._pre_delete(db, db_obj)
+            db.delete(db_obj)
+        db.commit()
+        return len(ids)
+
     def get_by_field(self, db: Session, field: str, value: Any) -> Optional[ModelType]:
         """Get record by specific field"""
-        return db.query(self.model).filter(getattr(self.model, field) == value).first()
+        stmt = self.statement(
+            ("get_by_field", field),
+            lambda: self.select().where(getattr(self.model, field) == bindparam("value")).limit(1),
+        )
+        return db.scalars(stmt, {"value": value}).first()
+
+    def enqueue(self, db: Session, name: str, payload: Optional[dict] = None) -> None:
+        """Queue a background job in the current transaction.
+
+        Call from the hooks below to defer side effects (cache invalidation,
+        webhooks, ...) until after commit instead of running them inline.
+        """
+        job_queue.enqueue(db, name, payload)
+
+    def _invalidate(self, db: Session, topic: str, key: object = "") -> None:
+        """Invalidate `topic` in this worker after commit and in the others via the outbox"""
+        invalidation_bus.after_commit(db, topic, key, forward=False)
+        if invalidation_bus.forwards:
+            self.enqueue(
+                db,
+                FORWARD_JOB,
+                {"topic": topic, "key": str(key), "sender": invalidation_bus.sender},
+            )
+
+    def _record_change(
+        self, db: Session, action: str, id: int, db_obj: Optional[ModelType] = None
+    ) -> None:
+        """Append a change-feed entry in the current transaction"""
+        data = self._change_payload(db_obj) if db_obj is not None else None
+        change_feed.record(db, self.resource, id, action, data)
+
+    def _shared(
+        self, db: Session, key: tuple, read: Callable[[Session], Any], options: Sequence
+    ) -> Any:
+        """Run a read once for all concurrent callers with the same key.
+
+        The leader reads in a session of its own and detaches the result;
+        every caller merges it into `db` without a query. Callers only join
+        reads that started after their request arrived, so they see every
+        write committed before it. Only for plain reads: never use it to load
+        rows that are about to be written. Options not returned by
+        `load_options` are not shared.
+        """
+        if options and not any(options is cached for cached in self._option_sets.values()):
+            return read(db)
+
+        def load():
+            own = db_manager.SessionLocal()
+            try:
+                result = read(own)
+                own.expunge_all()
+                return result
+            finally:
+                own.close()
+
+        result = single_flight.do((self.resource, *key, id(options)), load, not_before=_arrived())
+        if isinstance(result, list):
+            return [db.merge(obj, load=False) for obj in result]
+        return None if result is None else db.merge(result, load=False)
+
+    def _audit(
+        self,
+        db: Session,
+        action: str,
+        id: int,
+        before: Optional[dict] = None,
+        after: Optional[dict] = None,
+    ) -> None:
+        """Add an audit log entry for the current transaction"""
+        if audit_writer.enabled:
+            audit_writer.record(db, self.resource, id, action, before, after)
 
     # Hook methods for customization
+    def _full_load_options(self) -> list:
+        """Eager loads for fully expanded relationships (`full_paths`)"""
+        options = []
+        for path in self.full_paths or self.relations:
+            model, option = self.model, None
+            for name in path.split("."):
+                attr = getattr(model, name)
+                option = selectinload(attr) if option is None else option.selectinload(attr)
+                model = attr.property.mapper.class_
+            options.append(option)
+        return options
+
+    def _change_payload(self, db_obj: ModelType) -> dict:
+        """Data published to the change feed for a created or updated row"""
+        return db_obj.to_dict()
+
     def _prepare_create_data(self, data: dict) -> dict:
         """Prepare data before create operation"""
         return data
@@ -104,15 +494,19 @@ class BaseService(ABC, Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def _post_create(
         self, db: Session, db_obj: ModelType, obj_in: CreateSchemaType
     ) -> None:
-        """Hook called after successful create"""
+        """Hook called after the row is flushed, before commit"""
         pass
 
     def _post_update(
         self, db: Session, db_obj: ModelType, obj_in: UpdateSchemaType
     ) -> None:
-        """Hook called after successful update"""
+        """Hook called after the row is updated, before commit"""
         pass
 
     def _pre_delete(self, db: Session, db_obj: ModelType) -> None:
-        """Hook called before delete"""
+        """Hook called before a hard delete"""
+        pass
+
+    def _post_delete(self, db: Session, id: int) -> None:
+        """Hook called after delete, before commit"""
         pass
@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, event, func, select, text
+from sqlalchemy.orm import Session
+from models.models import ChangeLog
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+# Arbitrary first key of the Postgres advisory locks ordering change log
+# writers; the second is a hash of the resource
+_CHANGE_LOG_LOCK = 0x6368616E
+
+
+class ChangeFeed:
+    """Monotonic change log shared by every CRUD resource.
+
+    Entries are written in the same transaction as the change, so the log
+    id is a version subscribers can resume from. On Postgres writers take a
+    transaction-scoped advisory lock per resource, so a resource's ids
+    become visible in commit order and a reader never skips a version that
+    commits late. Versions are therefore only ordered within a resource:
+    readers compare them against that resource's `latest`. The cost is
+    that writes to the same resource commit one at a time (each holds the
+    lock from its change until commit); writes to different resources
+    don't wait for each other.
+    """
+
+    def __init__(self):
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def record(
+        self,
+        db: Session,
+        resource: str,
+        entity_id: int,
+        action: str,
+        data: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """Append a change to the caller's transaction"""
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(
+                text("SELECT pg_advisory_xact_lock(:key, hashtext(:resource))"),
+                {"key": _CHANGE_LOG_LOCK, "resource": resource},
+            )
+        db.add(
+            ChangeLog(
+                resource=resource,
+                entity_id=entity_id,
+                action=action,
+                data=jsonable_encoder(data) if data is not None else None,
+            )
+        )
+        db.info["changes_recorded"] = True
+
+    def since(
+        self,
+        db: Session,
+        resource: str,
+        version: int,
+        limit: int,
+        until: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Changes to a resource after `version` (up to `until`), oldest first"""
+        stmt = select(ChangeLog).where(
+            ChangeLog.resource == resource, ChangeLog.id > version
+        )
+        if until is not None:
+            stmt = stmt.where(ChangeLog.id <= until)
+        entries = db.scalars(stmt.order_by(ChangeLog.id).limit(limit))
+        return [
+            {
+                "version": entry.id,
+                "id": entry.entity_id,
+                "action": entry.action,
+                "data": entry.data,
+                "at": entry.created_at,
+            }
+            for entry in entries
+        ]
+
+    def latest(self, db: Session, resource: Optional[str] = None) -> int:
+        """Highest version recorded (for one resource when given), 0 if none"""
+        stmt = select(func.max(ChangeLog.id))
+        if resource is not None:
+            stmt = stmt.where(ChangeLog.resource == resource)
+        return db.scalar(stmt) or 0
+
+    def oldest(self, db: Session) -> int:
+        """Lowest version still retained, 0 if the log is empty"""
+        return db.scalar(select(func.min(ChangeLog.id))) or 0
+
+    def trim(self, db: Session, before: datetime) -> int:
+        """Drop entries older than a cutoff; returns the number removed"""
+        result = db.execute(delete(ChangeLog).where(ChangeLog.created_at < before))
+        db.commit()
+        return result.rowcount
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until this process commits a change, or timeout; True if woken"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.discard(waiter)
+
+    def _notify(self) -> None:
+        for loop, waiter in list(self._waiters):
+            loop.call_soon_threadsafe(waiter.set)
+
+
+# Global change feed instance
+change_feed = ChangeFeed()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_subscribers(session: Session) -> None:
+    if session.info.pop("changes_recorded", False):
+        change_feed._notify()
@@ -0,0 +1,151 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from services.metrics import metrics
+
+# Checked by SQLite every this many virtual machine instructions
+SQLITE_PROGRESS_INSTRUCTIONS = 1000
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded",
+        )
+
+
+class Deadline:
+    """Time budget of one request, shared by every thread working on it.
+
+    `budget` counts from when the request arrived; None means no limit. A
+    deadline is also expired once cancelled, e.g. when the client went away.
+    It only bounds work up to the request's first commit: what follows
+    (refreshing the written row, storing the idempotent response, after-commit
+    hooks) runs to completion, as stopping it would report a failure for a
+    write that happened.
+    """
+
+    __slots__ = ("started", "expires_at", "cancelled", "committed")
+
+    def __init__(self, budget: Optional[float] = None):
+        self.started = time.monotonic()
+        self.cancelled = False
+        self.committed = False
+        self.set_budget(budget)
+
+    def set_budget(self, budget: Optional[float]) -> None:
+        self.expires_at = self.started + budget if budget and budget > 0 else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a limit"""
+        if self.committed:
+            return None
+        if self.cancelled:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        if self.committed:
+            return False
+        return self.cancelled or (
+            self.expires_at is not None and time.monotonic() >= self.expires_at
+        )
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def check(self) -> None:
+        """Raise a 504 once the deadline has passed"""
+        if self.expired:
+            raise DeadlineExceeded()
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current() -> Optional[Deadline]:
+    """Deadline of the request being handled, if any"""
+    return _current.get()
+
+
+def expired() -> bool:
+    deadline = _current.get()
+    return deadline is not None and deadline.expired
+
+
+@contextmanager
+def suspended() -> Iterator[None]:
+    """Run bookkeeping (e.g. idempotency keys) outside the request's deadline.
+
+    Its statements are never refused and its commits don't end the deadline.
+    """
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def start(budget: Optional[float] = None) -> Deadline:
+    """Begin a deadline for the current context (and threads it spawns via anyio)"""
+    deadline = Deadline(budget)
+    _current.set(deadline)
+    return deadline
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _check_before_statement(conn, cursor, statement, parameters, context, executemany):
+    deadline = _current.get()
+    if deadline is not None and deadline.expired:
+        metrics.incr("deadline.statements_skipped")
+        raise DeadlineExceeded()
+
+
+@event.listens_for(Session, "before_commit")
+def _check_before_commit(session):
+    deadline = _current.get()
+    if deadline is not None and deadline.expired:
+        metrics.incr("deadline.commits_refused")
+        raise DeadlineExceeded()
+
+
+# Inserted first, so other after-commit hooks already run past the deadline
+@event.listens_for(Session, "after_commit", insert=True)
+def _end_deadline(session):
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.committed = True
+
+
+@event.listens_for(Session, "after_begin")
+def _limit_transaction(session, transaction, connection):
+    """Cap every statement of the transaction at the request's remaining budget"""
+    deadline = _current.get()
+    if deadline is None or connection.dialect.name != "postgresql":
+        return
+    remaining = deadline.remaining()
+    if remaining is None:
+        return
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    connection.exec_driver_sql(
+        f"SET LOCAL statement_timeout = {max(int(remaining * 1000), 1)}"
+    )
+
+
+@event.listens_for(Engine, "connect")
+def _interrupt_sqlite(dbapi_connection, connection_record):
+    # SQLite has no statement timeout; the progress handler aborts a running
+    # statement ("interrupted") once the calling request's deadline passes
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.set_progress_handler(expired, SQLITE_PROGRESS_INSTRUCTIONS)
@@ -0,0 +1,261 @@
+import hashlib
+import hmac
+import importlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, UTC
+from typing import Callable, NamedTuple, Optional
+from fastapi import HTTPException, Response, status
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from database.connection import db_manager
+from models.models import IdempotencyRecord
+from services import deadline as deadlines
+from services.metrics import metrics
+from config import settings
+
+# Status codes that are safe to replay; 409/429 and 5xx let the client retry
+_UNCACHEABLE = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: bytes
+
+
+class Claim(NamedTuple):
+    """Outcome of claiming a key: `stored` is set when the key already completed"""
+
+    fingerprint: str
+    stored: Optional[StoredResponse]
+
+
+class IdempotencyBackend(ABC):
+    """Storage for idempotency keys; shared storage covers every worker"""
+
+    @abstractmethod
+    def claim(self, key: str, fingerprint: str, lock_seconds: float) -> Optional[Claim]:
+        """Reserve `key` for a new request.
+
+        Returns None when the caller now owns the key, otherwise the existing
+        claim (still in progress when `stored` is None).
+        """
+
+    @abstractmethod
+    def complete(self, key: str, response: StoredResponse, ttl_seconds: float) -> None:
+        """Store the response for replay until the TTL runs out"""
+
+    @abstractmethod
+    def release(self, key: str) -> None:
+        """Drop an unfinished claim so the client can retry"""
+
+    def purge_expired(self) -> int:
+        """Remove expired keys; returns the number removed"""
+        return 0
+
+
+class InMemoryIdempotencyBackend(IdempotencyBackend):
+    """Per-process store; enough for a single worker"""
+
+    def __init__(self):
+        self._entries: dict[str, tuple[str, Optional[StoredResponse], float]] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, fingerprint: str, lock_seconds: float) -> Optional[Claim]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > now:
+                return Claim(entry[0], entry[1])
+            self._entries[key] = (fingerprint, None, now + lock_seconds)
+        return None
+
+    def complete(self, key: str, response: StoredResponse, ttl_seconds: float) -> None:
+        with self._lock:
+            fingerprint = self._entries[key][0]
+            self._entries[key] = (fingerprint, response, time.monotonic() + ttl_seconds)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry[2] <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+
+class DatabaseIdempotencyBackend(IdempotencyBackend):
+    """Keys in the `idempotency_keys` table, claimed through its unique index"""
+
+    def claim(self, key: str, fingerprint: str, lock_seconds: float) -> Optional[Claim]:
+        now = datetime.now(UTC)
+        db = db_manager.SessionLocal()
+        try:
+            for _ in range(2):
+                db.add(
+                    IdempotencyRecord(
+                        key=key,
+                        fingerprint=fingerprint,
+                        expires_at=now + timedelta(seconds=lock_seconds),
+                    )
+                )
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    db.rollback()
+                record = db.scalar(select(IdempotencyRecord).where(IdempotencyRecord.key == key))
+                if record is None:
+                    continue
+                if record.expires_at.replace(tzinfo=record.expires_at.tzinfo or UTC) > now:
+                    stored = (
+                        StoredResponse(record.status_code, record.response)
+                        if record.status_code is not None
+                        else None
+                    )
+                    return Claim(record.fingerprint, stored)
+                # Expired: clear it and claim again
+                db.execute(
+                    delete(IdempotencyRecord).where(
+                        IdempotencyRecord.key == key,
+                        IdempotencyRecord.expires_at == record.expires_at,
+                    )
+                )
+                db.commit()
+            return Claim(fingerprint, None)
+        finally:
+            db.close()
+
+    def complete(self, key: str, response: StoredResponse, ttl_seconds: float) -> None:
+        db = db_manager.SessionLocal()
+        try:
+            record = db.scalar(select(IdempotencyRecord).where(IdempotencyRecord.key == key))
+            if record is not None:
+                record.status_code = response.status_code
+                record.response = response.body
+                record.expires_at = datetime.now(UTC) + timedelta(seconds=ttl_seconds)
+                db.commit()
+        finally:
+            db.close()
+
+    def release(self, key: str) -> None:
+        db = db_manager.SessionLocal()
+        try:
+            db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_expired(self) -> int:
+        db = db_manager.SessionLocal()
+        try:
+            result = db.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.expires_at < datetime.now(UTC))
+            )
+            db.commit()
+            return result.rowcount
+        finally:
+            db.close()
+
+
+def load_backend(name: str) -> IdempotencyBackend:
+    """Build the backend named in settings ("database", "memory" or "package.module:Class")"""
+    if name == "database":
+        return DatabaseIdempotencyBackend()
+    if name == "memory":
+        return InMemoryIdempotencyBackend()
+    module_name, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+class Idempotency:
+    """Replay the stored response for a repeated `Idempotency-Key`.
+
+    Keys are scoped to the user, method and path. Reusing a key with a
+    different payload is rejected with 422, and a key whose first request
+    is still running gets 409.
+    """
+
+    def __init__(self, backend: IdempotencyBackend, ttl_seconds: float, lock_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+
+    @staticmethod
+    def scope(user_id: int, method: str, path: str, key: str) -> str:
+        return hashlib.sha256(f"{user_id}\0{method}\0{path}\0{key}".encode()).hexdigest()
+
+    @staticmethod
+    def fingerprint(payload: bytes) -> str:
+        """Keyed hash of a request body, so bodies holding a password can't be brute-forced"""
+        return hmac.new(settings.secret_key.encode(), payload, hashlib.sha256).hexdigest()
+
+    def run(
+        self,
+        key: Optional[str],
+        scope: str,
+        payload: bytes,
+        handler: Callable[[], StoredResponse],
+    ) -> Response:
+        """Run `handler` once per key and return its (possibly replayed) response"""
+        if key is None:
+            return self._to_response(handler())
+        fingerprint = self.fingerprint(payload)
+        # Key bookkeeping must go through even after the request's deadline passed
+        with deadlines.suspended():
+            existing = self.backend.claim(scope, fingerprint, self.lock_seconds)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used with a different request",
+                )
+            if existing.stored is None:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress",
+                )
+            metrics.incr("idempotency.replayed")
+            response = self._to_response(existing.stored)
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            stored = self._call(handler)
+        except BaseException:
+            with deadlines.suspended():
+                self.backend.release(scope)
+            raise
+        with deadlines.suspended():
+            if stored.status_code >= 500 or stored.status_code in _UNCACHEABLE:
+                self.backend.release(scope)
+            else:
+                self.backend.complete(scope, stored, self.ttl_seconds)
+        return self._to_response(stored)
+
+    @staticmethod
+    def _call(handler: Callable[[], StoredResponse]) -> StoredResponse:
+        try:
+            return handler()
+        except HTTPException as e:
+            if e.headers:
+                raise
+            return StoredResponse(e.status_code, json.dumps({"detail": e.detail}).encode())
+
+    @staticmethod
+    def _to_response(stored: StoredResponse) -> Response:
+        return Response(stored.body, status_code=stored.status_code, media_type="application/json")
+
+
+# Global idempotency instance
+idempotency = Idempotency(
+    load_backend(settings.idempotency_backend),
+    ttl_seconds=settings.idempotency_ttl_seconds,
+    lock_seconds=settings.idempotency_lock_seconds,
+)
@@ -0,0 +1,295 @@
+import importlib
+import logging
+import multiprocessing.connection
+import os
+import select
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Callable, Optional
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from services.jobs import job_queue
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str], None]
+
+FORWARD_JOB = "invalidation.forward"
+
+
+class InvalidationChannel(ABC):
+    """Transport that carries invalidation messages to the other workers"""
+
+    @abstractmethod
+    def publish(self, message: str) -> None:
+        """Send a message to every other subscriber"""
+
+    def listen(self, callback: Callable[[str], None]) -> None:
+        """Start delivering incoming messages to `callback`"""
+
+    def close(self) -> None:
+        """Stop listening and release resources"""
+
+
+class LocalChannel(InvalidationChannel):
+    """Single-process deployments: nothing to deliver"""
+
+    def publish(self, message: str) -> None:
+        pass
+
+
+class PipeChannel(InvalidationChannel):
+    """Worker end of a pipe to the `PipeHub` running in the server supervisor"""
+
+    def __init__(self, conn: multiprocessing.connection.Connection):
+        self.conn = conn
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, message: str) -> None:
+        # A closed pipe raises OSError, so outbox forwarding is retried
+        with self._lock:
+            self.conn.send_bytes(message.encode())
+
+    def listen(self, callback: Callable[[str], None]) -> None:
+        def run():
+            while True:
+                try:
+                    message = self.conn.recv_bytes()
+                except (EOFError, OSError):
+                    return
+                callback(message.decode())
+
+        self._thread = threading.Thread(target=run, name="invalidation-pipe", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class PipeHub:
+    """Supervisor side: relay each worker's messages to every other worker"""
+
+    def __init__(self):
+        self.conns: dict[int, multiprocessing.connection.Connection] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def pipe(self) -> tuple[multiprocessing.connection.Connection, multiprocessing.connection.Connection]:
+        """New (hub end, worker end) pair for a worker about to be forked"""
+        return multiprocessing.Pipe()
+
+    def add(self, pid: int, conn: multiprocessing.connection.Connection) -> None:
+        with self._lock:
+            self.conns[pid] = conn
+
+    def remove(self, pid: int) -> None:
+        with self._lock:
+            conn = self.conns.pop(pid, None)
+        if conn is not None:
+            conn.close()
+
+    def close_inherited(self) -> None:
+        """In a forked worker, close the hub ends copied from the supervisor"""
+        for conn in self.conns.values():
+            conn.close()
+        self.conns = {}
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="invalidation-hub", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                conns = dict(self.conns)
+            if not conns:
+                time.sleep(0.2)
+                continue
+            for ready in multiprocessing.connection.wait(list(conns.values()), timeout=0.5):
+                try:
+                    message = ready.recv_bytes()
+                except (EOFError, OSError):
+                    continue
+                for conn in conns.values():
+                    if conn is ready:
+                        continue
+                    try:
+                        conn.send_bytes(message)
+                    except OSError:
+                        pass
+
+
+class PostgresChannel(InvalidationChannel):
+    """Postgres LISTEN/NOTIFY, for workers on several hosts (psycopg2 driver)"""
+
+    def __init__(self, channel: str = "app_invalidation"):
+        self.channel = channel
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, message: str) -> None:
+        from database.connection import db_manager
+
+        with db_manager.engine.connect() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :message)"),
+                {"channel": self.channel, "message": message},
+            )
+            conn.commit()
+
+    def listen(self, callback: Callable[[str], None]) -> None:
+        self._thread = threading.Thread(
+            target=self._run, args=(callback,), name="invalidation-listen", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, callback: Callable[[str], None]) -> None:
+        from database.connection import db_manager
+
+        while not self._stopped.is_set():
+            raw = None
+            try:
+                raw = db_manager.engine.raw_connection()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f'LISTEN "{self.channel}"')
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], 1.0)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            callback(conn.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Invalidation listener failed, reconnecting")
+                self._stopped.wait(1.0)
+            finally:
+                if raw is not None:
+                    raw.invalidate()
+
+    def close(self) -> None:
+        self._stopped.set()
+
+
+def load_channel(name: str) -> InvalidationChannel:
+    """Build a channel from a setting: "local", "pipe", "postgres" or "module:Class" """
+    if name in ("local", "pipe"):
+        # Pipe workers get their end attached by server.py after fork
+        return LocalChannel()
+    if name == "postgres":
+        return PostgresChannel(settings.invalidation_pg_channel)
+    module_name, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+class InvalidationBus:
+    """Topic-based invalidation shared by every worker.
+
+    `publish` runs the local handlers immediately and forwards the message
+    over the channel; messages from other workers run the same handlers.
+    Writes can instead hand the forwarding to the job outbox (see
+    `FORWARD_JOB`), so it is retried rather than lost if the channel fails.
+    """
+
+    def __init__(self, channel: InvalidationChannel):
+        self.channel = channel
+        self.sender = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: dict[str, list[tuple[Handler, Optional[bool]]]] = defaultdict(list)
+        self._listening = False
+
+    def on(self, topic: str, local: Optional[bool] = None) -> Callable[[Handler], Handler]:
+        """Register a handler called with the message key for `topic`.
+
+        `local=True` limits it to this worker's own writes, `local=False` to
+        messages from other workers; by default it gets both.
+        """
+
+        def register(func: Handler) -> Handler:
+            self._handlers[topic].append((func, local))
+            return func
+
+        return register
+
+    def set_channel(self, channel: InvalidationChannel) -> None:
+        """Swap the transport, e.g. in a freshly forked worker"""
+        self.channel.close()
+        self.channel = channel
+        self.sender = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._listening = False
+
+    @property
+    def forwards(self) -> bool:
+        """Whether other workers exist to hear about invalidations"""
+        return not isinstance(self.channel, LocalChannel)
+
+    def publish(self, topic: str, key: str = "", forward: bool = True) -> None:
+        self._dispatch(topic, key, local=True)
+        if not forward:
+            return
+        try:
+            self.forward(topic, key)
+        except Exception:
+            logger.exception("Failed to publish invalidation %s %s", topic, key)
+
+    def forward(self, topic: str, key: str = "", sender: Optional[str] = None) -> None:
+        """Send a message to the other workers only; raises if the channel fails"""
+        self.channel.publish(f"{sender or self.sender}|{topic}|{key}")
+
+    def _receive(self, message: str) -> None:
+        sender, _, rest = message.partition("|")
+        if sender == self.sender:
+            return
+        topic, _, key = rest.partition("|")
+        self._dispatch(topic, key, local=False)
+
+    def _dispatch(self, topic: str, key: str, local: bool) -> None:
+        for handler, only_local in self._handlers.get(topic, ()):
+            if only_local is not None and only_local != local:
+                continue
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", topic)
+
+    def start(self) -> None:
+        if not self._listening:
+            self.channel.listen(self._receive)
+            self._listening = True
+
+    def stop(self) -> None:
+        self.channel.close()
+        self._listening = False
+
+    def after_commit(
+        self, db: Session, topic: str, key: object = "", forward: bool = True
+    ) -> None:
+        """Publish once the session's transaction commits; dropped on rollback"""
+        db.info.setdefault("invalidations", set()).add((topic, str(key), forward))
+
+
+# Global invalidation bus instance
+invalidation_bus = InvalidationBus(load_channel(settings.invalidation_channel))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_invalidations(session: Session) -> None:
+    for topic, key, forward in session.info.pop("invalidations", ()):
+        invalidation_bus.publish(topic, key, forward)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_invalidations(session: Session) -> None:
+    session.info.pop("invalidations", None)
+
+
+@job_queue.handler(FORWARD_JOB)
+def _forward_invalidation(payload: dict) -> None:
+    """Tell the other workers about a committed write, retried until it is sent"""
+    sender = payload.get("sender")
+    if sender != invalidation_bus.sender:
+        # Claimed by another worker: it is not on the receiving end of its own message
+        invalidation_bus._dispatch(payload["topic"], payload["key"], local=False)
+    invalidation_bus.forward(payload["topic"], payload["key"], sender)
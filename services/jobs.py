@@ -0,0 +1,228 @@
+import asyncio
+import inspect
+import logging
+import uuid
+from datetime import datetime, timedelta, UTC
+from typing import Any, Awaitable, Callable, Optional, Union
+import anyio.to_thread
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.orm import Session
+from database.connection import db_manager
+from models.models import OutboxJob
+from services.metrics import metrics
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Union[None, Awaitable[None]]]
+
+PENDING = "pending"
+RUNNING = "running"
+DEAD = "dead"
+
+
+class JobQueue:
+    """Transactional outbox drained by in-process async workers.
+
+    ``enqueue`` only adds a row to the caller's session, so a job is stored
+    in the same transaction as the write that produced it and is never run
+    for a rolled-back write. Workers claim batches, run the registered
+    handler for each job and retry failures with exponential backoff until
+    ``max_attempts``, after which the job is marked dead.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        batch_size: int = 50,
+        max_attempts: int = 5,
+        retry_backoff: float = 2.0,
+        poll_interval: float = 1.0,
+        visibility_timeout: float = 300.0,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._handlers: dict[str, JobHandler] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def handler(self, name: str) -> Callable[[JobHandler], JobHandler]:
+        """Register a sync or async handler for jobs called `name`"""
+
+        def register(func: JobHandler) -> JobHandler:
+            self._handlers[name] = func
+            return func
+
+        return register
+
+    def enqueue(
+        self, db: Session, name: str, payload: Optional[dict] = None, delay: float = 0
+    ) -> OutboxJob:
+        """Add a job to the caller's transaction; it becomes visible on commit"""
+        job = OutboxJob(
+            name=name,
+            payload=payload or {},
+            status=PENDING,
+            attempts=0,
+            available_at=datetime.now(UTC) + timedelta(seconds=delay),
+        )
+        db.add(job)
+        db.info["jobs_enqueued"] = True
+        return job
+
+    def claim(self, limit: Optional[int] = None) -> list[tuple[int, str, dict, int]]:
+        """Lock a batch of due jobs for this worker.
+
+        Running jobs whose lock is older than the visibility timeout are
+        reclaimed, so a crashed worker cannot strand them.
+        """
+        token = uuid.uuid4().hex
+        now = datetime.now(UTC)
+        due = or_(
+            and_(OutboxJob.status == PENDING, OutboxJob.available_at <= now),
+            and_(
+                OutboxJob.status == RUNNING,
+                OutboxJob.locked_at < now - timedelta(seconds=self.visibility_timeout),
+            ),
+        )
+        db = db_manager.SessionLocal()
+        try:
+            ids = select(OutboxJob.id).where(due).order_by(OutboxJob.id).limit(
+                limit or self.batch_size
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                ids = ids.with_for_update(skip_locked=True)
+            db.execute(
+                update(OutboxJob)
+                .where(OutboxJob.id.in_(ids.scalar_subquery()), due)
+                .values(
+                    status=RUNNING,
+                    locked_by=token,
+                    locked_at=now,
+                    attempts=OutboxJob.attempts + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            rows = db.execute(
+                select(OutboxJob.id, OutboxJob.name, OutboxJob.payload, OutboxJob.attempts)
+                .where(OutboxJob.locked_by == token)
+                .order_by(OutboxJob.id)
+            ).all()
+            return [tuple(row) for row in rows]
+        finally:
+            db.close()
+
+    def finish(self, done: list[int], failed: dict[int, tuple[int, str]]) -> None:
+        """Delete completed jobs and reschedule or bury failed ones"""
+        db = db_manager.SessionLocal()
+        try:
+            if done:
+                db.execute(delete(OutboxJob).where(OutboxJob.id.in_(done)))
+            now = datetime.now(UTC)
+            for job_id, (attempts, error) in failed.items():
+                values: dict[str, Any] = {"last_error": error[:1000], "locked_by": None}
+                if attempts >= self.max_attempts:
+                    values["status"] = DEAD
+                else:
+                    values["status"] = PENDING
+                    values["available_at"] = now + timedelta(
+                        seconds=self.retry_backoff * 2 ** (attempts - 1)
+                    )
+                db.execute(update(OutboxJob).where(OutboxJob.id == job_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+        metrics.incr("jobs.completed", len(done))
+        metrics.incr("jobs.failed", len(failed))
+
+    async def process_batch(self) -> int:
+        """Claim, run and settle one batch; returns the number of jobs claimed"""
+        jobs = await anyio.to_thread.run_sync(self.claim)
+        done: list[int] = []
+        failed: dict[int, tuple[int, str]] = {}
+        for job_id, name, payload, attempts in jobs:
+            try:
+                await self._run(name, payload)
+                done.append(job_id)
+            except Exception as e:
+                logger.warning("Job %s (%s) failed: %s", job_id, name, e)
+                failed[job_id] = (attempts, f"{type(e).__name__}: {e}")
+        if jobs:
+            await anyio.to_thread.run_sync(self.finish, done, failed)
+        return len(jobs)
+
+    async def _run(self, name: str, payload: dict) -> None:
+        handler = self._handlers.get(name)
+        if handler is None:
+            raise LookupError(f"No handler registered for job {name!r}")
+        if inspect.iscoroutinefunction(handler):
+            await handler(payload)
+        else:
+            await anyio.to_thread.run_sync(handler, payload)
+
+    async def drain(self) -> int:
+        """Process batches until no job is due; returns the number processed"""
+        total = 0
+        while count := await self.process_batch():
+            total += count
+        return total
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker batch failed")
+                processed = 0
+            if processed < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _notify(self) -> None:
+        """Wake idle workers after a commit that enqueued jobs"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        """Start worker tasks on the running event loop"""
+        if self._tasks or self.workers <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel worker tasks; claimed jobs are reclaimed after the visibility timeout"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+
+# Global job queue instance
+job_queue = JobQueue(
+    workers=settings.job_workers,
+    batch_size=settings.job_batch_size,
+    max_attempts=settings.job_max_attempts,
+    retry_backoff=settings.job_retry_backoff_seconds,
+    poll_interval=settings.job_poll_interval_seconds,
+    visibility_timeout=settings.job_visibility_timeout_seconds,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_job_workers(session: Session) -> None:
+    if session.info.pop("jobs_enqueued", False):
+        job_queue._notify()
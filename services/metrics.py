@@ -0,0 +1,40 @@
+import threading
+from collections import defaultdict
+from typing import Union
+
+Number = Union[int, float]
+
+
+class Metrics:
+    """Thread-safe in-process counters and gauges"""
+
+    def __init__(self):
+        self._counters: dict[str, Number] = defaultdict(int)
+        self._gauges: dict[str, Number] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: Number = 1) -> None:
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: Number) -> None:
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str) -> Number:
+        """Return a counter or gauge value"""
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict[str, dict[str, Number]]:
+        """Return a copy of all counters and gauges"""
+        with self._lock:
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+
+# Global metrics registry
+metrics = Metrics()
@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import select
+from database.connection import db_manager
+from models.models import Permission, Role, role_closure, role_inheritance, role_permissions
+from services.invalidation import invalidation_bus
+from services.metrics import metrics
+from services.permission_matcher import PermissionMatcher
+from services.singleflight import single_flight
+
+TOPIC = "permission_graph"
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionNode:
+    """Detached, read-only permission row"""
+
+    __slots__ = ("id", "name", "description", "resource", "action", "created_at", "updated_at")
+
+    def __init__(self, permission: Permission):
+        for name in self.__slots__:
+            setattr(self, name, getattr(permission, name))
+
+
+class RoleNode:
+    """Detached, read-only role row with its permissions resolved.
+
+    `permissions` are assigned to the role itself; `grants` also cover
+    everything inherited from its ancestors.
+    """
+
+    __slots__ = (
+        "id", "name", "description", "created_at", "updated_at", "permissions", "parent_ids", "grants"
+    )
+
+    def __init__(
+        self,
+        role: Role,
+        permissions: tuple[PermissionNode, ...],
+        parent_ids: tuple[int, ...] = (),
+        inherited: Iterable[PermissionNode] = (),
+    ):
+        self.id: int = role.id
+        self.name: str = role.name
+        self.description: Optional[str] = role.description
+        self.created_at: datetime = role.created_at
+        self.updated_at: Optional[datetime] = role.updated_at
+        self.permissions = permissions
+        self.parent_ids = parent_ids
+        self.grants = frozenset(f"{p.resource}:{p.action}" for p in (*permissions, *inherited))
+
+
+class PermissionGraph:
+    """Immutable snapshot of every role and the permissions it grants"""
+
+    def __init__(self, roles: dict[int, RoleNode]):
+        self.roles = roles
+        # Compiled per distinct role set; a reload builds a new graph, so these never go stale
+        self._matchers: dict[frozenset[int], PermissionMatcher] = {}
+
+    def resolve(self, role_ids: Iterable[int]) -> frozenset[str]:
+        """Union of `resource:action` grants for a set of roles; unknown ids are ignored"""
+        grants: frozenset[str] = frozenset()
+        for role_id in role_ids:
+            role = self.roles.get(role_id)
+            if role is not None:
+                grants |= role.grants
+        return grants
+
+    def matcher(self, role_ids: Iterable[int]) -> PermissionMatcher:
+        """Compiled matcher over the grants of a set of roles, built once per set"""
+        key = frozenset(role_ids)
+        matcher = self._matchers.get(key)
+        if matcher is None:
+            matcher = self._matchers[key] = PermissionMatcher(self.resolve(key))
+        return matcher
+
+    def roles_for(self, role_ids: Iterable[int]) -> list[RoleNode]:
+        return [self.roles[role_id] for role_id in role_ids if role_id in self.roles]
+
+
+class PermissionGraphCache:
+    """Process-wide graph snapshot, loaded once and swapped atomically on change.
+
+    Readers take `snapshot()` without locking; a reload builds a new graph
+    and replaces the reference in one assignment, so requests never observe
+    a half-built graph. Reloads are triggered by the `permission_graph`
+    invalidation topic, published after role or permission writes commit.
+    The worker that made the write reloads before its request returns, so
+    it never authorizes against a revoked grant; other workers reload on a
+    background thread and use the previous graph until it finishes.
+
+    Concurrent first loads share one query through `single_flight`. Reload
+    requests that pile up behind a running reload are served by a single
+    follow-up load, which starts after all of them were requested.
+    """
+
+    def __init__(self):
+        self._graph: Optional[PermissionGraph] = None
+        self._lock = threading.Lock()
+        self._requests_lock = threading.Lock()
+        self._requested = 0
+        self._loaded = 0
+        self._scheduled = 0
+        self._settled = 0
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def snapshot(self) -> PermissionGraph:
+        graph = self._graph
+        if graph is None:
+            graph = single_flight.do(TOPIC, self._load_initial)
+        return graph
+
+    def reload(self) -> None:
+        with self._requests_lock:
+            self._requested += 1
+            generation = self._requested
+        with self._lock:
+            if self._loaded >= generation:
+                # A load that started after this request already finished
+                return
+            generation = self._requested
+            self._graph = self._load()
+            self._loaded = generation
+
+    def schedule_reload(self) -> None:
+        """Reload on the background thread; requests made meanwhile share one load"""
+        with self._requests_lock:
+            self._scheduled += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="permission-graph-reload", daemon=True
+                )
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._requests_lock:
+                scheduled = self._scheduled
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Permission graph reload failed")
+            self._settled = scheduled
+
+    def wait_reloaded(self, timeout: float = 5.0) -> bool:
+        """Wait for scheduled reloads to finish; False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._settled < self._scheduled:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _load_initial(self) -> PermissionGraph:
+        with self._lock:
+            if self._graph is None:
+                self._graph = self._load()
+            return self._graph
+
+    def resolve(self, role_ids: Iterable[int]) -> frozenset[str]:
+        return self.snapshot().resolve(role_ids)
+
+    def matcher(self, role_ids: Iterable[int]) -> PermissionMatcher:
+        return self.snapshot().matcher(role_ids)
+
+    def _load(self) -> PermissionGraph:
+        db = db_manager.SessionLocal()
+        try:
+            permissions = {p.id: PermissionNode(p) for p in db.scalars(select(Permission))}
+            granted = defaultdict(list)
+            for role_id, permission_id in db.execute(
+                select(role_permissions.c.role_id, role_permissions.c.permission_id)
+            ):
+                if permission_id in permissions:
+                    granted[role_id].append(permissions[permission_id])
+            # Ancestors at any depth come from the closure table, one row each
+            inherited = defaultdict(list)
+            for role_id, ancestor_id in db.execute(
+                select(role_closure.c.role_id, role_closure.c.inherited_id).where(
+                    role_closure.c.depth > 0
+                )
+            ):
+                inherited[role_id].extend(granted[ancestor_id])
+            parents = defaultdict(list)
+            for role_id, parent_id in db.execute(
+                select(role_inheritance.c.role_id, role_inheritance.c.parent_id)
+            ):
+                parents[role_id].append(parent_id)
+            roles = {
+                role.id: RoleNode(
+                    role, tuple(granted[role.id]), tuple(parents[role.id]), inherited[role.id]
+                )
+                for role in db.scalars(select(Role))
+            }
+        finally:
+            db.close()
+        metrics.incr("permission_graph.loads")
+        return PermissionGraph(roles)
+
+
+# Global permission graph instance
+permission_graph = PermissionGraphCache()
+
+
+@invalidation_bus.on(TOPIC, local=True)
+def _reload_graph(key: str) -> None:
+    permission_graph.reload()
+
+
+@invalidation_bus.on(TOPIC, local=False)
+def _schedule_graph_reload(key: str) -> None:
+    permission_graph.schedule_reload()
@@ -0,0 +1,80 @@
+"""Grant matching with wildcards and hierarchical resources.
+
+A grant is ``resource:action``. Resources are dotted paths
+(``users.profile``) and any segment may be ``*``: inside a path it matches
+exactly one segment (``*.profile`` matches ``users.profile``), as the last
+segment it matches one or more (``users.*`` matches ``users.profile`` and
+``users.profile.avatar``, but not ``users``). An action of ``*`` matches
+every action, so ``*:*`` grants everything.
+"""
+from typing import Iterable, Optional
+
+WILDCARD = "*"
+
+
+class _Node:
+    __slots__ = ("children", "actions", "rest")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        # Actions granted on the path ending here
+        self.actions: set[str] = set()
+        # Actions granted on every path continuing below here (trailing `*`)
+        self.rest: set[str] = set()
+
+
+def _allows(actions: set[str], action: str) -> bool:
+    return action in actions or WILDCARD in actions
+
+
+class PermissionMatcher:
+    """A set of grants compiled into a trie over resource segments.
+
+    `allows` walks one trie level per resource segment, following the
+    literal and the `*` child, so its cost depends on the depth of the
+    checked resource, not on how many grants were compiled. Answers are
+    memoized; matchers are immutable.
+    """
+
+    def __init__(self, grants: Iterable[str]):
+        self._root = _Node()
+        self._results: dict[str, bool] = {}
+        for grant in grants:
+            self._add(grant)
+
+    def _add(self, grant: str) -> None:
+        resource, _, action = grant.rpartition(":")
+        if not resource or not action:
+            return
+        node = self._root
+        segments = resource.split(".")
+        for segment in segments[:-1]:
+            node = node.children.setdefault(segment, _Node())
+        if segments[-1] == WILDCARD:
+            node.rest.add(action)
+        else:
+            node.children.setdefault(segments[-1], _Node()).actions.add(action)
+
+    def allows(self, permission: str) -> bool:
+        """Whether a concrete `resource:action` is covered by any grant"""
+        allowed = self._results.get(permission)
+        if allowed is None:
+            allowed = self._results[permission] = self._match(permission)
+        return allowed
+
+    def _match(self, permission: str) -> bool:
+        resource, _, action = permission.rpartition(":")
+        nodes = [self._root]
+        for segment in resource.split("."):
+            following = []
+            for node in nodes:
+                if _allows(node.rest, action):
+                    return True
+                for key in (segment, WILDCARD):
+                    child: Optional[_Node] = node.children.get(key)
+                    if child is not None:
+                        following.append(child)
+            if not following:
+                return False
+            nodes = following
+        return any(_allows(node.actions, action) for node in nodes)
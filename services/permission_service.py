@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from models.models import Permission
 from schemas.schemas import PermissionCreate, PermissionUpdate
 from services.base import BaseService
+from services.permission_graph import TOPIC as PERMISSION_GRAPH
 
 class PermissionService(BaseService[Permission, PermissionCreate, PermissionUpdate]):
     """Service for permission operations"""
@@ -13,5 +14,13 @@ class PermissionService(BaseService[Permission, PermissionCreate, PermissionUpda
         """Get permission by name"""
         return self.get_by_field(db, "name", name)
 
+    def _post_update(self, db: Session, db_obj: Permission, obj_in: PermissionUpdate) -> None:
+        """Reload the permission graph once the update commits"""
+        self._invalidate(db, PERMISSION_GRAPH)
+
+    def _pre_delete(self, db: Session, db_obj: Permission) -> None:
+        """Reload the permission graph once the delete commits"""
+        self._invalidate(db, PERMISSION_GRAPH)
+
 # Global permission service instance
 permission_service = PermissionService()
\ No newline at end of file
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, UTC
+from database.connection import db_manager
+from services.background import PeriodicTask
+from services.base import BaseService
+from services.changes import change_feed
+from services.idempotency import idempotency
+from services.metrics import metrics
+from services.user_service import user_service
+from config import settings
+
+
+class PurgeJob:
+    """Periodically hard-delete soft-deleted rows, old change-log entries and expired idempotency keys"""
+
+    def __init__(
+        self,
+        services: list[BaseService],
+        retention: timedelta,
+        batch_size: int,
+        interval: float,
+        change_retention: timedelta,
+    ):
+        self.services = services
+        self.retention = retention
+        self.change_retention = change_retention
+        self.batch_size = batch_size
+        self._task = PeriodicTask("soft-delete-purge", interval, self.run_once)
+
+    def run_once(self) -> int:
+        """Purge every eligible row in batches; returns the number removed"""
+        cutoff = datetime.now(UTC) - self.retention
+        total = 0
+        for service in self.services:
+            db = db_manager.SessionLocal()
+            try:
+                while True:
+                    purged = service.purge_deleted(db, cutoff, self.batch_size)
+                    total += purged
+                    if purged < self.batch_size:
+                        break
+            finally:
+                db.close()
+        metrics.incr("purge.rows", total)
+
+        db = db_manager.SessionLocal()
+        try:
+            trimmed = change_feed.trim(db, datetime.now(UTC) - self.change_retention)
+        finally:
+            db.close()
+        metrics.incr("purge.changes", trimmed)
+        metrics.incr("purge.idempotency_keys", idempotency.backend.purge_expired())
+        return total
+
+    def start(self) -> None:
+        self._task.start()
+
+    def stop(self) -> None:
+        self._task.stop(run_final=False)
+
+
+# Global purge job instance
+purge_job = PurgeJob(
+    services=[user_service],
+    retention=timedelta(days=settings.soft_delete_retention_days),
+    batch_size=settings.purge_batch_size,
+    interval=settings.purge_interval_seconds,
+    change_retention=timedelta(days=settings.change_log_retention_days),
+)
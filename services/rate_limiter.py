@@ -0,0 +1,152 @@
+import importlib
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from fastapi import HTTPException, status
+from config import settings
+from services.metrics import metrics
+
+
+class RateLimitBackend(ABC):
+    """Token bucket storage; implement this to share buckets between workers"""
+
+    @abstractmethod
+    def consume(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens from a bucket.
+
+        Returns 0 when the tokens were taken, otherwise the number of seconds
+        until enough tokens will be available.
+        """
+
+    def reset(self) -> None:
+        """Forget all buckets"""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process token buckets bounded to `max_keys` entries"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (cost - tokens) / rate if rate > 0 else math.inf
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+def load_backend(name: str) -> RateLimitBackend:
+    """Build the backend named in settings ("memory" or "package.module:Class")"""
+    if name == "memory":
+        return InMemoryRateLimitBackend()
+    module_name, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+class LoginRateLimiter:
+    """Token-bucket limits on login attempts per username and per client IP"""
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        user_rate_per_minute: float,
+        user_burst: int,
+        ip_rate_per_minute: float,
+        ip_burst: int,
+    ):
+        self.backend = backend
+        self.user_rate = user_rate_per_minute / 60
+        self.user_burst = user_burst
+        self.ip_rate = ip_rate_per_minute / 60
+        self.ip_burst = ip_burst
+
+    def check(self, username: str, client_ip: Optional[str]) -> None:
+        """Raise 429 if either bucket is empty; called before any DB or hash work"""
+        if client_ip:
+            wait = self.backend.consume(f"login:ip:{client_ip}", self.ip_rate, self.ip_burst)
+            if wait:
+                self._reject("ip", wait)
+        wait = self.backend.consume(
+            f"login:user:{username.lower()}", self.user_rate, self.user_burst
+        )
+        if wait:
+            self._reject("username", wait)
+
+    def _reject(self, scope: str, wait: float) -> None:
+        metrics.incr(f"login.rejected.{scope}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+    def reset(self) -> None:
+        """Forget all buckets"""
+        self.backend.reset()
+
+
+class VerificationLimiter:
+    """Global cap on in-flight password verifications"""
+
+    def __init__(self, max_concurrent: int, wait_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.wait_timeout = wait_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a verification slot, shedding with 503 if none frees up in time"""
+        if not self._semaphore.acquire(timeout=self.wait_timeout):
+            metrics.incr("login.rejected.concurrency")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent logins",
+                headers={"Retry-After": str(max(1, math.ceil(self.wait_timeout)))},
+            )
+        self._track(1)
+        try:
+            yield
+        finally:
+            self._track(-1)
+            self._semaphore.release()
+
+    def _track(self, delta: int) -> None:
+        with self._lock:
+            self._in_flight += delta
+            metrics.set_gauge("login.verifications_in_flight", self._in_flight)
+
+
+# Global limiter instances
+login_rate_limiter = LoginRateLimiter(
+    backend=load_backend(settings.rate_limit_backend),
+    user_rate_per_minute=settings.login_rate_per_minute,
+    user_burst=settings.login_burst,
+    ip_rate_per_minute=settings.login_ip_rate_per_minute,
+    ip_burst=settings.login_ip_burst,
+)
+verification_limiter = VerificationLimiter(
+    max_concurrent=settings.max_concurrent_password_verifications,
+    wait_timeout=settings.password_verification_wait_seconds,
+)
@@ -0,0 +1,138 @@
+import threading
+import time
+from datetime import datetime, UTC
+from typing import Optional
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from database.connection import db_manager
+from models.models import RevokedToken
+from services.background import PeriodicTask
+from config import settings
+
+
+def _timestamp(value: datetime) -> float:
+    """Convert a stored datetime to a POSIX timestamp (naive values are UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.timestamp()
+
+
+class RevocationList:
+    """In-memory index of revoked token ids with periodic persistence.
+
+    Revocation checks are a dict lookup. New revocations are buffered and
+    written to the ``revoked_tokens`` table by a background flush, which also
+    picks up ids revoked by other workers since the last flush.
+    """
+
+    def __init__(self, flush_interval: float = 30.0):
+        self._revoked: dict[str, float] = {}
+        self._pending: dict[str, float] = {}
+        self._last_id = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._task = PeriodicTask("revocation-flush", flush_interval, self.flush)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Return True if the token id has been revoked"""
+        if jti is None:
+            return False
+        if not self._loaded:
+            self.load()
+        return jti in self._revoked
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """Revoke a token id until its expiry"""
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._pending[jti] = expires_at
+
+    def revoke_now(self, jti: str, expires_at: float) -> bool:
+        """Revoke a token id in the shared table right away.
+
+        Returns False when it was already revoked, by this worker or any
+        other; the unique index on ``jti`` makes this safe to race.
+        """
+        db = db_manager.SessionLocal()
+        try:
+            db.add(RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(expires_at, UTC)))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+        with self._lock:
+            self._revoked[jti] = expires_at
+        return True
+
+    def load(self) -> None:
+        """Load unexpired revocations persisted since the last load"""
+        db = db_manager.SessionLocal()
+        try:
+            rows = (
+                db.query(RevokedToken)
+                .filter(RevokedToken.id > self._last_id)
+                .order_by(RevokedToken.id)
+                .all()
+            )
+        finally:
+            db.close()
+        now = time.time()
+        with self._lock:
+            for row in rows:
+                expires_at = _timestamp(row.expires_at)
+                if expires_at > now:
+                    self._revoked[row.jti] = expires_at
+                self._last_id = row.id
+            self._loaded = True
+
+    def flush(self) -> None:
+        """Persist pending revocations, drop expired ones and sync from the table"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            now = time.time()
+            self._revoked = {
+                jti: exp for jti, exp in self._revoked.items() if exp > now
+            }
+
+        db = db_manager.SessionLocal()
+        try:
+            if pending:
+                existing = {
+                    jti
+                    for (jti,) in db.query(RevokedToken.jti).filter(
+                        RevokedToken.jti.in_(list(pending))
+                    )
+                }
+                db.add_all(
+                    RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(exp, UTC))
+                    for jti, exp in pending.items()
+                    if jti not in existing
+                )
+            db.execute(
+                delete(RevokedToken).where(RevokedToken.expires_at < datetime.now(UTC))
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        finally:
+            db.close()
+        self.load()
+
+    def start(self) -> None:
+        """Start periodic persistence"""
+        self._task.start()
+
+    def stop(self) -> None:
+        """Stop periodic persistence and flush what is left"""
+        self._task.stop()
+
+
+# Global revocation list instance
+revocation_list = RevocationList(settings.revocation_flush_interval_seconds)
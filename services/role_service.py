@@ -1,12 +1,19 @@
+from typing import Sequence
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
-from models.models import Role, Permission
+from database import role_closure
+from models.models import Role, Permission, role_closure as closure_table, role_inheritance, role_permissions
 from schemas.schemas import RoleCreate, RoleUpdate
 from services.base import BaseService
+from services.permission_graph import TOPIC as PERMISSION_GRAPH
 
 
 class RoleService(BaseService[Role, RoleCreate, RoleUpdate]):
     """Service for role operations"""
 
+    relations = ("permissions", "parents")
+
     def __init__(self):
         super().__init__(Role)
 
@@ -14,18 +21,58 @@ class RoleService(BaseService[Role, RoleCreate, RoleUpdate]):
         """Get role by name"""
         return self.get_by_field(db, "name", name)
 
+    def effective_permissions(self, db: Session, role_ids: Sequence[int]) -> list[Permission]:
+        """Permissions granted to roles directly or through inheritance, in one query"""
+        if not role_ids:
+            return []
+        granted = (
+            select(role_permissions.c.permission_id)
+            .join(closure_table, closure_table.c.inherited_id == role_permissions.c.role_id)
+            .where(closure_table.c.role_id.in_(role_ids))
+        )
+        return list(
+            db.scalars(select(Permission).where(Permission.id.in_(granted)).order_by(Permission.id))
+        )
+
+    def _change_payload(self, db_obj: Role) -> dict:
+        """Publish permission and parent ids alongside the role columns"""
+        data = db_obj.to_dict()
+        data["permission_ids"] = db_obj.permission_ids
+        data["parent_ids"] = db_obj.parent_ids
+        return data
+
     def _prepare_create_data(self, data: dict) -> dict:
-        """Remove permission_ids from data"""
+        """Remove permission_ids and parent_ids from data"""
         data.pop("permission_ids", None)  # Handle separately in post_create
+        data.pop("parent_ids", None)
         return data
 
     def _prepare_update_data(self, data: dict) -> dict:
-        """Remove permission_ids from data"""
+        """Remove permission_ids and parent_ids from data"""
         data.pop("permission_ids", None)  # Handle separately in post_update
+        data.pop("parent_ids", None)
         return data
 
+    def _set_parents(self, db: Session, db_obj: Role, parent_ids: list[int]) -> None:
+        """Replace the roles `db_obj` inherits from and update the closure table"""
+        parent_ids = list(dict.fromkeys(parent_ids))
+        role_closure.lock(db)
+        if any(role_closure.inherits(db, parent_id, [db_obj.id]) for parent_id in parent_ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Role inheritance would create a cycle",
+            )
+        if parent_ids and role_closure.chain_depth(db, db_obj.id, parent_ids) > role_closure.MAX_DEPTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Role inheritance is limited to {role_closure.MAX_DEPTH} levels",
+            )
+        db_obj.parents = db.query(Role).filter(Role.id.in_(parent_ids)).all()
+        db.flush()
+        role_closure.refresh(db, [db_obj.id, *role_closure.inheriting(db, db_obj.id)])
+
     def _post_create(self, db: Session, db_obj: Role, obj_in: RoleCreate) -> None:
-        """Assign permissions after role creation"""
+        """Assign permissions and parents after role creation"""
         if obj_in.permission_ids:
             permissions = (
                 db.query(Permission)
@@ -33,10 +80,12 @@ class RoleService(BaseService[Role, RoleCreate, RoleUpdate]):
                 .all()
             )
             db_obj.permissions = permissions
-            db.commit()
+        if obj_in.parent_ids:
+            self._set_parents(db, db_obj, obj_in.parent_ids)
+        self._invalidate(db, PERMISSION_GRAPH)
 
     def _post_update(self, db: Session, db_obj: Role, obj_in: RoleUpdate) -> None:
-        """Update permissions after role update"""
+        """Update permissions and parents after role update"""
         if obj_in.permission_ids is not None:
             permissions = (
                 db.query(Permission)
@@ -44,7 +93,18 @@ class RoleService(BaseService[Role, RoleCreate, RoleUpdate]):
                 .all()
             )
             db_obj.permissions = permissions
-            db.commit()
+        if obj_in.parent_ids is not None:
+            self._set_parents(db, db_obj, obj_in.parent_ids)
+        self._invalidate(db, PERMISSION_GRAPH)
+
+    def _pre_delete(self, db: Session, db_obj: Role) -> None:
+        """Detach inheriting roles and reload the permission graph once the delete commits"""
+        role_closure.lock(db)
+        inheriting = role_closure.inheriting(db, db_obj.id)
+        db.execute(delete(role_inheritance).where(role_inheritance.c.parent_id == db_obj.id))
+        db.execute(delete(closure_table).where(closure_table.c.role_id == db_obj.id))
+        role_closure.refresh(db, inheriting)
+        self._invalidate(db, PERMISSION_GRAPH)
 
 
 # Global role service instance
@@ -0,0 +1,158 @@
+"""Read-only row structs for list endpoints, bypassing the ORM.
+
+A page is read with Core ``select()``s into ``__slots__`` structs that mirror
+a model: its columns, its relationships and its plain properties (so
+``User.role_ids`` works on a ``UserRow``). Structs carry no session,
+identity map or change tracking, and `dumper` turns them into plain dicts
+for the JSON encoder. Each relationship level is filled by one grouped
+query over the page's ids.
+"""
+from collections import defaultdict
+from typing import Any, Callable, Iterable, List, Sequence, get_args, get_origin
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+from sqlalchemy import Select, bindparam, inspect, select
+from sqlalchemy.orm import Session
+
+_structs: dict[type, type] = {}
+_statements: dict[tuple, Select] = {}
+
+
+def struct_for(model: type) -> type:
+    """The `__slots__` struct class for a model, created once"""
+    cls = _structs.get(model)
+    if cls is None:
+        mapper = inspect(model)
+        columns = tuple(attr.key for attr in mapper.column_attrs)
+        namespace: dict[str, Any] = {}
+        for klass in reversed(model.__mro__):
+            namespace.update(
+                (name, value) for name, value in vars(klass).items() if isinstance(value, property)
+            )
+        namespace.update(
+            __slots__=columns + tuple(mapper.relationships.keys()),
+            __module__=__name__,
+            __repr__=lambda self: f"<{type(self).__name__}(id={self.id})>",
+            _columns=columns,
+        )
+        cls = _structs[model] = type(f"{model.__name__}Row", (), namespace)
+    return cls
+
+
+def columns_of(model: type) -> list:
+    """Column expressions matching `struct_for(model)._columns`"""
+    return [attr.columns[0] for attr in inspect(model).column_attrs]
+
+
+def structs(model: type, rows: Iterable[Sequence]) -> list:
+    """Build structs from rows selected with `columns_of(model)`"""
+    cls = struct_for(model)
+    names = cls._columns
+    items = []
+    for row in rows:
+        obj = cls.__new__(cls)
+        for name, value in zip(names, row):
+            setattr(obj, name, value)
+        items.append(obj)
+    return items
+
+
+def attach(db: Session, model: type, items: list, paths: Iterable[str], ids_only: bool = False) -> None:
+    """Fill dotted relationship `paths` on `items`, one query per level.
+
+    With `ids_only` the related structs carry just their `id`, enough for
+    properties such as `role_ids`.
+    """
+    nested: dict[str, list[str]] = {}
+    for path in paths:
+        head, _, rest = path.partition(".")
+        children = nested.setdefault(head, [])
+        if rest:
+            children.append(rest)
+    for name, rest in nested.items():
+        related = _attach_relation(db, model, items, name, ids_only and not rest)
+        if rest:
+            attach(db, inspect(model).relationships[name].mapper.class_, related, rest)
+
+
+def _relation_statement(model: type, name: str, ids_only: bool) -> Select:
+    key = (model, name, ids_only)
+    stmt = _statements.get(key)
+    if stmt is None:
+        rel = inspect(model).relationships[name]
+        if rel.secondary is None:
+            raise ValueError(f"{model.__name__}.{name}: only many-to-many relationships are supported")
+        ((_, parent_fk),) = rel.synchronize_pairs
+        ((target_pk, target_fk),) = rel.secondary_synchronize_pairs
+        ids = parent_fk.in_(bindparam("ids", expanding=True))
+        if ids_only:
+            stmt = select(parent_fk, target_fk).where(ids)
+        else:
+            target = rel.mapper.class_
+            stmt = (
+                select(parent_fk, *columns_of(target))
+                .join_from(rel.secondary, target.__table__, target_fk == target_pk)
+                .where(ids)
+            )
+        stmt = _statements[key] = stmt
+    return stmt
+
+
+def _attach_relation(db: Session, model: type, items: list, name: str, ids_only: bool) -> list:
+    """Set relationship `name` on every item; returns the distinct related structs"""
+    if not items:
+        return []
+    target = inspect(model).relationships[name].mapper.class_
+    cls = struct_for(target)
+    stmt = _relation_statement(model, name, ids_only)
+    # Rows shared by several parents (a role held by many users) are built once
+    unique: dict[Any, Any] = {}
+    grouped: dict[Any, list] = defaultdict(list)
+    for parent_id, *values in db.execute(stmt, {"ids": [item.id for item in items]}):
+        if ids_only:
+            child = unique.get(values[0])
+            if child is None:
+                child = unique[values[0]] = cls.__new__(cls)
+                child.id = values[0]
+        else:
+            child = unique.get(values[cls._columns.index("id")])
+            if child is None:
+                (child,) = structs(target, [values])
+                unique[child.id] = child
+        grouped[parent_id].append(child)
+    for item in items:
+        setattr(item, name, grouped.get(item.id, []))
+    return list(unique.values())
+
+
+def dumper(schema: type[BaseModel]) -> Callable[[Any], dict]:
+    """Struct -> dict with the fields of a response schema, without validation.
+
+    Rows come from the database, so re-validating them (email normalization,
+    nested models) on the way out only costs time. Nested schemas, single or
+    in lists, are dumped recursively; missing attributes take the field
+    default, as `from_attributes` validation would.
+    """
+    fields = []
+    for name, field in schema.model_fields.items():
+        annotation, many = field.annotation, False
+        if get_origin(annotation) in (list, List):
+            annotation, many = get_args(annotation)[0], True
+        nested = (
+            dumper(annotation)
+            if isinstance(annotation, type) and issubclass(annotation, BaseModel)
+            else None
+        )
+        default = None if field.default is PydanticUndefined else field.default
+        fields.append((name, nested, many, default))
+
+    def dump(obj: Any) -> dict:
+        data = {}
+        for name, nested, many, default in fields:
+            value = getattr(obj, name, default)
+            if nested is not None and value is not None:
+                value = [nested(child) for child in value] if many else nested(value)
+            data[name] = value
+        return data
+
+    return dump
@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+from fastapi import HTTPException, status
+from services.metrics import metrics
+from config import settings
+
+
+class _Call:
+    __slots__ = ("started", "done", "result", "error")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait for it and receive the same result or
+    the same exception. Nothing is cached: once the leader finishes, the
+    next call for the key runs again. Followers give up after `timeout`
+    seconds with a 504 while the leader carries on.
+
+    A caller passing `not_before` (a `time.monotonic()` value, typically
+    when its request arrived) only joins a call started at or after it, so
+    it never receives a result read before that moment; otherwise it leads
+    a new call that later callers join.
+    """
+
+    def __init__(self, timeout: float = 10.0):
+        self.timeout = timeout
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Hashable,
+        func: Callable[[], Any],
+        timeout: Optional[float] = None,
+        not_before: Optional[float] = None,
+    ) -> Any:
+        """Run `func`, or wait for the run already in flight for `key`"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None or (not_before is not None and call.started < not_before)
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr("singleflight.shared")
+            if not call.done.wait(self.timeout if timeout is None else timeout):
+                metrics.incr("singleflight.timeouts")
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail="Timed out waiting for a concurrent identical read",
+                )
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # A newer call may have taken over the key
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# Global single-flight instance for shared reads
+single_flight = SingleFlight(timeout=settings.single_flight_timeout_seconds)
@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from config import settings
+from services.invalidation import invalidation_bus
+
+
+class CachedToken:
+    """Verified token claims and the user resolved for them"""
+
+    __slots__ = ("username", "expires_at", "jti", "fid", "user")
+
+    def __init__(
+        self,
+        username: str,
+        expires_at: float,
+        jti: Optional[str] = None,
+        fid: Optional[str] = None,
+    ):
+        self.username = username
+        self.expires_at = expires_at
+        self.jti = jti
+        self.fid = fid
+        self.user: Any = None
+
+
+class TokenCache:
+    """Bounded LRU of verified bearer tokens keyed by token digest"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, CachedToken]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        """Digest used as cache key so raw tokens are never kept in memory"""
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[CachedToken]:
+        """Return the cached entry for a token unless it is missing or expired"""
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(
+        self,
+        token: str,
+        username: str,
+        expires_at: float,
+        jti: Optional[str] = None,
+        fid: Optional[str] = None,
+    ) -> Optional[CachedToken]:
+        """Cache verified claims until the token's expiry"""
+        if self.maxsize <= 0:
+            return None
+        key = self.digest(token)
+        entry = CachedToken(username, expires_at, jti, fid)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_user(self, token: str) -> Any:
+        """Return the user cached for a token, if any"""
+        entry = self.get(token)
+        return entry.user if entry is not None else None
+
+    def set_user(self, token: str, user: Any) -> None:
+        """Attach a detached, fully loaded user to a cached token"""
+        entry = self.get(token)
+        if entry is not None:
+            entry.user = user
+
+    def revoke(self, token: str) -> None:
+        """Drop a token from the cache"""
+        with self._lock:
+            self._entries.pop(self.digest(token), None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Forget the cached user object for every token of a user"""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.user is not None and entry.user.id == user_id:
+                    entry.user = None
+
+    def invalidate_users(self) -> None:
+        """Forget every cached user object, keeping verified claims"""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.user = None
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global token cache instance
+token_cache = TokenCache(settings.token_cache_size)
+
+
+@invalidation_bus.on("user")
+def _invalidate_user(key: str) -> None:
+    token_cache.invalidate_user(int(key))
@@ -1,4 +1,5 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam
+from sqlalchemy.orm import Session, joinedload, selectinload
 from models.models import User, Role
 from schemas.schemas import UserCreate, UserUpdate
 from services.base import BaseService
@@ -6,6 +7,10 @@ from services.auth_service import auth_service
 
 class UserService(BaseService[User, UserCreate, UserUpdate]):
     """Service for user operations"""
+
+    relations = ("roles",)
+    # UserResponse nests roles with their permissions
+    full_paths = ("roles.permissions", "roles.parents")
     
     def __init__(self):
         super().__init__(User)
@@ -18,13 +23,46 @@ class UserService(BaseService[User, UserCreate, UserUpdate]):
         """Get user by username"""
         return self.get_by_field(db, "username", username)
 
+    def get_with_role_ids(self, db: Session, username: str) -> User | None:
+        """Get user by username with only the ids of its roles loaded, in one query"""
+        stmt = self.statement(
+            "get_with_role_ids",
+            lambda: self.select()
+            .options(joinedload(User.roles).load_only(Role.id))
+            .where(User.username == bindparam("username")),
+        )
+        return db.scalars(stmt, {"username": username}).unique().first()
+
+    def get_with_permissions(self, db: Session, username: str) -> User | None:
+        """Get user by username with roles and permissions eagerly loaded"""
+        return (
+            self.query(db)
+            .options(selectinload(User.roles).selectinload(Role.permissions))
+            .filter(User.username == username)
+            .first()
+        )
+
     def authenticate(self, db: Session, username: str, password: str) -> User | None:
-        """Authenticate user with username and password"""
+        """Authenticate user with username and password, rehashing outdated hashes"""
         user = self.get_by_username(db, username)
-        if not user or not auth_service.verify_password(password, user.hashed_password):
+        if not user:
             return None
+        verified, new_hash = auth_service.verify_and_update(password, user.hashed_password)
+        if not verified:
+            return None
+        if new_hash:
+            user.hashed_password = new_hash
+            db.commit()
         return user
     
+    def _change_payload(self, db_obj: User) -> dict:
+        """Publish role ids, never the password hash"""
+        data = db_obj.to_dict()
+        data.pop("hashed_password", None)
+        data.pop("deleted_at", None)
+        data["role_ids"] = db_obj.role_ids
+        return data
+
     def _prepare_create_data(self, data: dict) -> dict:
         """Hash password before creating user"""
         if "password" in data:
@@ -44,14 +82,17 @@ class UserService(BaseService[User, UserCreate, UserUpdate]):
         if obj_in.role_ids:
             roles = db.query(Role).filter(Role.id.in_(obj_in.role_ids)).all()
             db_obj.roles = roles
-            db.commit()
     
     def _post_update(self, db: Session, db_obj: User, obj_in: UserUpdate) -> None:
         """Update roles after user update"""
         if obj_in.role_ids is not None:
             roles = db.query(Role).filter(Role.id.in_(obj_in.role_ids)).all()
             db_obj.roles = roles
-            db.commit()
+        self._invalidate(db, "user", db_obj.id)
+
+    def _post_delete(self, db: Session, id: int) -> None:
+        """Drop cached copies of the deleted user in every worker"""
+        self._invalidate(db, "user", id)
 
 # Global user service instance
 user_service = UserService()
\ No newline at end of file
@@ -0,0 +1,119 @@
+import os
+import sys
+import threading
+import time
+
+import anyio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.admission import AdmissionMiddleware
+from services.metrics import metrics
+
+app = FastAPI()
+app.add_middleware(
+    AdmissionMiddleware,
+    capacity=1,
+    limits={"bulk": 1},
+    max_wait={"auth": 5.0, "point": 5.0, "list": 5.0, "bulk": 0.2},
+    bulk_paths=["/export"],
+)
+
+gate = threading.Event()
+served = []
+
+
+async def hold(name: str):
+    served.append(name)
+    await anyio.to_thread.run_sync(gate.wait, 5)
+    return {"name": name}
+
+
+@app.get("/export")
+async def export():
+    return await hold("export")
+
+
+@app.get("/items/")
+async def items():
+    return await hold("list")
+
+
+@app.get("/items/{item_id}")
+async def item(item_id: int):
+    return await hold("point")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
+
+
+def in_background(client, path, results):
+    thread = threading.Thread(target=lambda: results.append(client.get(path)))
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_classify():
+    middleware = AdmissionMiddleware(app, bulk_paths=["/export"], bulk_limit=500)
+    cases = {
+        ("POST", "/auth/login", b""): "auth",
+        ("GET", "/users/7", b""): "point",
+        ("PATCH", "/users/7", b""): "point",
+        ("POST", "/users/", b""): "point",
+        ("GET", "/users/", b"limit=100"): "list",
+        ("GET", "/users/search", b"q=ad"): "list",
+        ("GET", "/users/", b"limit=5000"): "bulk",
+        ("GET", "/export", b""): "bulk",
+        ("GET", "/users/changes", b"wait=25"): None,
+        ("GET", "/health", b""): None,
+    }
+    for (method, path, query), expected in cases.items():
+        scope = {"type": "http", "method": method, "path": path, "query_string": query}
+        assert middleware.classify(scope) == expected, path
+
+
+def test_overloaded_class_is_shed_with_retry_after():
+    gate.clear()
+    shed = metrics.get("admission.shed.bulk")
+    results = []
+    with TestClient(app) as client:
+        running = in_background(client, "/export", results)
+        wait_for(lambda: "export" in served)
+        res = client.get("/export")
+        assert res.status_code == 503
+        assert int(res.headers["retry-after"]) >= 1
+        # Exempt routes still answer while every slot is taken
+        assert client.get("/health").status_code == 200
+        gate.set()
+        running.join()
+    assert results[0].status_code == 200
+    assert metrics.get("admission.shed.bulk") == shed + 1
+
+
+def test_freed_slot_goes_to_higher_priority():
+    gate.clear()
+    served.clear()
+    results = []
+    with TestClient(app) as client:
+        threads = [in_background(client, "/items/", results)]
+        wait_for(lambda: served == ["list"])
+        threads.append(in_background(client, "/items/", results))
+        wait_for(lambda: metrics.get("admission.queue_depth.list") == 1)
+        threads.append(in_background(client, "/items/1", results))
+        wait_for(lambda: metrics.get("admission.queue_depth.point") == 1)
+        gate.set()
+        for thread in threads:
+            thread.join()
+    assert served == ["list", "point", "list"]
+    assert [res.status_code for res in results] == [200, 200, 200]
@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.audit import audit_writer
+
+client = TestClient(app)
+
+
+def get_auth_headers(client, username="admin", password="admin123"):
+    """Get JWT auth headers"""
+    res = client.post("/auth/login", json={"username": username, "password": password})
+    assert res.status_code == 200
+    token = res.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="module")
+def auth_client():
+    client.headers.update(get_auth_headers(client))
+    return client
+
+
+def create_role(auth_client):
+    name = f"audit_role_{datetime.now().timestamp()}"
+    res = auth_client.post("/roles/", json={"name": name, "description": "before"})
+    assert res.status_code == 201
+    return res.json()["id"]
+
+
+def test_audit_records_diffs(auth_client):
+    admin_id = auth_client.get("/auth/me").json()["id"]
+    role_id = create_role(auth_client)
+    assert auth_client.put(f"/roles/{role_id}", json={"description": "after"}).status_code == 200
+    assert auth_client.delete(f"/roles/{role_id}").status_code == 200
+    audit_writer.flush()
+
+    res = auth_client.get("/audit/", params={"resource": "roles", "entity_id": role_id})
+    assert res.status_code == 200
+    deleted, updated, created = res.json()["items"][:3]
+
+    assert [created["action"], updated["action"], deleted["action"]] == ["created", "updated", "deleted"]
+    assert {entry["actor_id"] for entry in (created, updated, deleted)} == {admin_id}
+    assert created["before"] is None and created["after"]["description"] == "before"
+    assert updated["before"]["description"] == "before"
+    assert updated["after"]["description"] == "after"
+    assert "name" not in updated["after"]
+    assert deleted["before"]["description"] == "after" and deleted["after"] is None
+
+
+def test_audit_keyset_pagination(auth_client):
+    role_id = create_role(auth_client)
+    for i in range(3):
+        auth_client.put(f"/roles/{role_id}", json={"description": f"v{i}"})
+    audit_writer.flush()
+
+    params = {"resource": "roles", "entity_id": role_id}
+    everything = auth_client.get("/audit/", params=params).json()
+    assert everything["next"] is None
+
+    paged, cursor = [], {}
+    while True:
+        page = auth_client.get("/audit/", params={**params, **cursor, "limit": 2}).json()
+        paged += page["items"]
+        if page["next"] is None:
+            break
+        cursor = {"before_id": page["next"]}
+
+    ids = [entry["id"] for entry in paged]
+    assert len(ids) >= 4 and ids == sorted(ids, reverse=True)
+    assert ids == [entry["id"] for entry in everything["items"]]
+
+
+def test_audit_skips_rolled_back_writes(auth_client):
+    role_id = create_role(auth_client)
+    taken = auth_client.get(f"/roles/{role_id}").json()["name"]
+    other_id = create_role(auth_client)
+    assert auth_client.put(f"/roles/{other_id}", json={"name": taken}).status_code == 400
+    audit_writer.flush()
+
+    items = auth_client.get("/audit/", params={"resource": "roles", "entity_id": other_id}).json()["items"]
+    assert [entry["action"] for entry in items] == ["created"]
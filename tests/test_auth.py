@@ -0,0 +1,214 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.token_cache import token_cache
+from services.rate_limiter import login_rate_limiter
+from services.metrics import metrics
+from services.auth_service import auth_service
+from services.user_service import user_service
+from database.connection import db_manager
+from config import settings
+
+client = TestClient(app)
+
+
+def get_auth_headers(client, username="admin", password="admin123"):
+    """Get JWT auth headers"""
+    res = client.post("/auth/login", json={"username": username, "password": password})
+    assert res.status_code == 200
+    token = res.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    return get_auth_headers(client)
+
+
+def mock_user(admin_headers):
+    unique_name = f"test_auth_{datetime.now().timestamp()}"
+    payload = {
+        "email": f"{unique_name}@gm.com",
+        "username": unique_name,
+        "password": "password123",
+    }
+    res = client.post("/users/", json=payload, headers=admin_headers)
+    assert res.status_code == 201
+    return res.json()["id"], unique_name
+
+
+def test_me_is_served_from_token_cache(admin_headers):
+    res = client.get("/auth/me", headers=admin_headers)
+    assert res.status_code == 200
+    assert res.json()["username"] == "admin"
+
+    token = admin_headers["Authorization"].split()[1]
+    assert token_cache.get_user(token) is not None
+
+    res = client.get("/auth/me", headers=admin_headers)
+    assert res.status_code == 200
+    assert res.json()["username"] == "admin"
+
+
+def test_user_update_invalidates_cached_user(admin_headers):
+    user_id, username = mock_user(admin_headers)
+    headers = get_auth_headers(client, username, "password123")
+
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    res = client.put(f"/users/{user_id}", json={"is_active": False}, headers=admin_headers)
+    assert res.status_code == 200
+
+    res = client.get("/auth/me", headers=headers)
+    assert res.status_code == 400
+    assert res.json()["detail"] == "Inactive user"
+
+
+def test_invalid_token_is_rejected():
+    res = client.get("/auth/me", headers={"Authorization": "Bearer not-a-token"})
+    assert res.status_code == 401
+
+
+def test_refresh_rotates_tokens():
+    res = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    assert res.status_code == 200
+    refresh_token = res.json()["refresh_token"]
+
+    res = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert res.status_code == 200
+    tokens = res.json()
+    assert tokens["refresh_token"] != refresh_token
+
+    res = client.get("/auth/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert res.status_code == 200
+
+    # A rotated refresh token cannot be used again
+    res = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert res.status_code == 401
+
+
+def test_reused_refresh_token_revokes_its_family():
+    tokens = client.post("/auth/login", json={"username": "admin", "password": "admin123"}).json()
+    old_headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/auth/me", headers=old_headers).status_code == 200
+
+    res = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert res.status_code == 200
+    rotated = res.json()
+    new_headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+    assert client.get("/auth/me", headers=new_headers).status_code == 200
+
+    reuse = metrics.get("auth.refresh_reuse")
+    res = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert res.status_code == 401
+    assert metrics.get("auth.refresh_reuse") == reuse + 1
+
+    # Reuse revoked the whole family, including tokens served from the cache
+    assert client.get("/auth/me", headers=old_headers).status_code == 401
+    assert client.get("/auth/me", headers=new_headers).status_code == 401
+    res = client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert res.status_code == 401
+
+
+def test_refresh_token_is_not_an_access_token():
+    res = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    refresh_token = res.json()["refresh_token"]
+
+    res = client.get("/auth/me", headers={"Authorization": f"Bearer {refresh_token}"})
+    assert res.status_code == 401
+
+
+def test_logout_revokes_access_token():
+    headers = get_auth_headers(client)
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    res = client.post("/auth/logout", headers=headers)
+    assert res.status_code == 200
+
+    res = client.get("/auth/me", headers=headers)
+    assert res.status_code == 401
+
+
+def test_metrics_require_permission(admin_headers):
+    assert client.get("/metrics").status_code == 403
+
+    _, username = mock_user(admin_headers)
+    res = client.post("/auth/login", json={"username": username, "password": "password123"})
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+    assert client.get("/metrics", headers=headers).status_code == 403
+
+    res = client.get("/metrics", headers=admin_headers)
+    assert res.status_code == 200
+    assert "counters" in res.json()
+
+
+def test_login_is_rate_limited_per_username(monkeypatch):
+    login_rate_limiter.reset()
+    monkeypatch.setattr(login_rate_limiter, "user_burst", 2)
+    monkeypatch.setattr(login_rate_limiter, "user_rate", 0.001)
+    username = f"test_limited_{datetime.now().timestamp()}"
+    payload = {"username": username, "password": "wrong-password"}
+    rejected = metrics.get("login.rejected.username")
+
+    assert client.post("/auth/login", json=payload).status_code == 401
+    assert client.post("/auth/login", json=payload).status_code == 401
+
+    res = client.post("/auth/login", json=payload)
+    assert res.status_code == 429
+    assert int(res.headers["Retry-After"]) >= 1
+    assert metrics.get("login.rejected.username") == rejected + 1
+
+    # Other usernames keep their own bucket
+    assert client.post("/auth/login", json={"username": "admin", "password": "admin123"}).status_code == 200
+    login_rate_limiter.reset()
+
+
+def test_login_rehashes_outdated_password(admin_headers, monkeypatch):
+    _, username = mock_user(admin_headers)
+
+    monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+    monkeypatch.setattr(auth_service, "pwd_context", auth_service._build_pwd_context())
+    get_auth_headers(client, username, "password123")
+
+    db = db_manager.SessionLocal()
+    try:
+        user = user_service.get_by_username(db, username)
+        assert user.hashed_password.startswith("$2b$05$")
+    finally:
+        db.close()
+
+
+def test_me_query_count_drops_to_one_then_zero(admin_headers):
+    from sqlalchemy import event
+    from services.permission_graph import permission_graph
+
+    permission_graph.snapshot()
+    client.get("/auth/me", headers=admin_headers)
+    headers = get_auth_headers(client)
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_manager.engine, "before_cursor_execute", count)
+    try:
+        # Token cache miss: one joined query for the user and its role ids
+        assert client.get("/auth/me", headers=headers).status_code == 200
+        assert len(statements) == 1
+
+        # Cache hit: the user is merged into the request session without SQL
+        statements.clear()
+        res = client.get("/auth/me", headers=headers)
+        assert res.status_code == 200
+        assert res.json()["roles"][0]["permissions"]
+        assert statements == []
+    finally:
+        event.remove(db_manager.engine, "before_cursor_execute", count)
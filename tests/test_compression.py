@@ -0,0 +1,71 @@
+import gzip
+import os
+import sys
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.compression import CompressionMiddleware
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100, algorithms=["zstd", "br", "gzip"])
+
+
+@app.get("/large")
+def large():
+    return {"items": [{"name": "permission", "resource": "users"}] * 50}
+
+
+@app.get("/small")
+def small():
+    return {"status": "ok"}
+
+
+@app.get("/binary")
+def binary():
+    return PlainTextResponse("x" * 500, media_type="application/octet-stream")
+
+
+@app.get("/events")
+def events():
+    return PlainTextResponse("data: {}\n\n" * 50, media_type="text/event-stream")
+
+
+client = TestClient(app)
+
+
+def test_large_json_is_gzipped():
+    res = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in res.headers["vary"]
+    assert int(res.headers["content-length"]) < len(res.content)
+    assert res.json()["items"][0]["name"] == "permission"
+
+
+def test_small_and_binary_responses_are_not_compressed():
+    res = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in res.headers
+
+    res = client.get("/binary", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in res.headers
+
+    res = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in res.headers
+
+
+def test_identity_when_client_does_not_accept_compression():
+    res = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in res.headers
+
+
+def test_negotiation_respects_quality_and_availability():
+    middleware = CompressionMiddleware(app, algorithms=["zstd", "br", "gzip"])
+    assert middleware.negotiate("gzip;q=0") is None
+    assert middleware.negotiate("*") == next(iter(middleware.encoders))
+    assert middleware.negotiate("br;q=1, gzip;q=0.5") in ("br", "gzip")
+    assert list(middleware.encoders)[-1] == "gzip"
+    assert gzip.decompress(middleware.encoders["gzip"](b"abc")) == b"abc"
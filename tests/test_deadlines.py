@@ -0,0 +1,155 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import create_app
+from api.base import BaseCRUDRouter
+from api.dependencies import get_db
+from database.connection import db_manager
+from schemas.schemas import RoleCreate, RoleResponse, RoleUpdate
+from services import deadline as deadlines
+from services.role_service import role_service
+
+# Counts to 100M, far longer than any budget below
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) "
+    "SELECT count(*) FROM c"
+)
+
+app = create_app()
+
+
+@app.get("/slow", dependencies=[Depends(lambda: deadlines.current().set_budget(0.2))])
+def slow(db: Session = Depends(get_db)):
+    return {"count": db.execute(SLOW_QUERY).scalar()}
+
+
+@app.get("/fast")
+def fast(db: Session = Depends(get_db)):
+    return {"one": db.execute(text("SELECT 1")).scalar()}
+
+
+app.include_router(
+    BaseCRUDRouter(
+        service=role_service,
+        prefix="/hurried_roles",
+        resource="roles",
+        create_schema=RoleCreate,
+        update_schema=RoleUpdate,
+        response_schema=RoleResponse,
+        deadlines={"read_items": 0.000001},
+    ).router
+)
+app.include_router(
+    BaseCRUDRouter(
+        service=role_service,
+        prefix="/committing_roles",
+        resource="roles",
+        create_schema=RoleCreate,
+        update_schema=RoleUpdate,
+        response_schema=RoleResponse,
+        deadlines={"create_item": 0.3},
+    ).router
+)
+
+client = TestClient(app)
+
+
+def get_auth_headers(client, username="admin", password="admin123"):
+    """Get JWT auth headers"""
+    res = client.post("/auth/login", json={"username": username, "password": password})
+    assert res.status_code == 200
+    token = res.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_slow_query_is_interrupted_with_504():
+    start = time.monotonic()
+    res = client.get("/slow")
+    assert res.status_code == 504
+    assert time.monotonic() - start < 2
+    # The connection went back to the pool in a usable state
+    assert client.get("/fast").json() == {"one": 1}
+
+
+def test_route_budget_from_router():
+    headers = get_auth_headers(client)
+    assert client.get("/hurried_roles/", headers=headers).status_code == 504
+    assert client.get("/roles/", headers=headers).status_code == 200
+
+
+def test_expired_deadline_skips_statements():
+    db = db_manager.SessionLocal()
+    try:
+        deadlines.start(0.000001)
+        time.sleep(0.001)
+        with pytest.raises(deadlines.DeadlineExceeded):
+            db.execute(text("SELECT 1"))
+    finally:
+        deadlines.start(None)
+        db.close()
+    assert deadlines.current().remaining() is None
+
+
+def test_cancelled_deadline_interrupts_sqlite():
+    db = db_manager.SessionLocal()
+    deadline = deadlines.start(None)
+    try:
+        threading.Timer(0.1, deadline.cancel).start()
+        with pytest.raises(Exception, match="interrupted"):
+            db.execute(SLOW_QUERY)
+    finally:
+        deadlines.start(None)
+        db.close()
+
+
+def test_deadline_passing_after_commit_keeps_the_write():
+    headers = get_auth_headers(client)
+    name = f"test_committed_{time.time()}"
+
+    def outlast_deadline(session):
+        if deadlines.current() is not None:
+            time.sleep(0.5)
+
+    # The create commits, then the budget runs out before the response
+    event.listen(Session, "after_commit", outlast_deadline)
+    try:
+        res = client.post(
+            "/committing_roles/", json={"name": name}, headers={**headers, "Idempotency-Key": name}
+        )
+    finally:
+        event.remove(Session, "after_commit", outlast_deadline)
+    assert res.status_code == 201
+    assert res.json()["name"] == name
+
+    # The key was completed, so a retry replays instead of creating again
+    retry = client.post(
+        "/committing_roles/", json={"name": name}, headers={**headers, "Idempotency-Key": name}
+    )
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert [r["id"] for r in client.get("/roles/search", params={"q": name}, headers=headers).json()] == [
+        res.json()["id"]
+    ]
+
+
+def test_expired_deadline_refuses_commit():
+    db = db_manager.SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        deadlines.start(0.000001)
+        time.sleep(0.001)
+        with pytest.raises(deadlines.DeadlineExceeded):
+            db.commit()
+    finally:
+        deadlines.start(None)
+        db.close()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+
+from sqlalchemy import select
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app  # noqa: F401 - configures the database
+from database.connection import db_manager
+from models.models import OutboxJob
+from services.jobs import job_queue, DEAD, PENDING
+
+executed = []
+attempts = {"count": 0}
+
+
+@job_queue.handler("test.record")
+def record(payload):
+    executed.append(payload["value"])
+
+
+@job_queue.handler("test.flaky")
+async def flaky(payload):
+    attempts["count"] += 1
+    if attempts["count"] < 2:
+        raise RuntimeError("temporary failure")
+    executed.append(payload["value"])
+
+
+def get_job(job_id):
+    db = db_manager.SessionLocal()
+    try:
+        return db.get(OutboxJob, job_id)
+    finally:
+        db.close()
+
+
+def test_job_runs_after_commit_and_is_removed():
+    db_manager.create_tables()
+    db = db_manager.SessionLocal()
+    try:
+        job = job_queue.enqueue(db, "test.record", {"value": "committed"})
+        db.commit()
+        job_id = job.id
+    finally:
+        db.close()
+
+    asyncio.run(job_queue.drain())
+    assert "committed" in executed
+    assert get_job(job_id) is None
+
+
+def test_rolled_back_job_is_never_run():
+    db = db_manager.SessionLocal()
+    try:
+        job_queue.enqueue(db, "test.record", {"value": "rolled back"})
+        db.flush()
+        db.rollback()
+    finally:
+        db.close()
+
+    asyncio.run(job_queue.drain())
+    assert "rolled back" not in executed
+
+
+def test_failed_job_is_retried_then_dead_lettered(monkeypatch):
+    monkeypatch.setattr(job_queue, "retry_backoff", 0)
+    monkeypatch.setattr(job_queue, "max_attempts", 2)
+    db = db_manager.SessionLocal()
+    try:
+        flaky_job = job_queue.enqueue(db, "test.flaky", {"value": "retried"})
+        missing_job = job_queue.enqueue(db, "test.unregistered")
+        db.commit()
+        flaky_id, missing_id = flaky_job.id, missing_job.id
+    finally:
+        db.close()
+
+    asyncio.run(job_queue.drain())
+    assert attempts["count"] == 2
+    assert "retried" in executed
+    assert get_job(flaky_id) is None
+
+    dead = get_job(missing_id)
+    assert dead.status == DEAD
+    assert dead.attempts == 2
+    assert "No handler" in dead.last_error
+
+    db = db_manager.SessionLocal()
+    try:
+        db.delete(db.get(OutboxJob, missing_id))
+        db.commit()
+        assert not db.scalars(
+            select(OutboxJob).where(OutboxJob.status == PENDING)
+        ).all()
+    finally:
+        db.close()
@@ -0,0 +1,230 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.invalidation import (
+    FORWARD_JOB,
+    InvalidationBus,
+    InvalidationChannel,
+    LocalChannel,
+    PipeChannel,
+    PipeHub,
+    invalidation_bus,
+)
+from services.jobs import job_queue, DEAD
+from database.connection import db_manager
+from models.models import OutboxJob
+from sqlalchemy import select
+from services.permission_graph import permission_graph
+from services.permission_matcher import PermissionMatcher
+from services.metrics import metrics
+
+client = TestClient(app)
+
+
+def get_auth_headers(client, username="admin", password="admin123"):
+    """Get JWT auth headers"""
+    res = client.post("/auth/login", json={"username": username, "password": password})
+    assert res.status_code == 200
+    token = res.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    return get_auth_headers(client)
+
+
+def test_role_change_applies_to_logged_in_user(admin_headers):
+    unique_name = f"test_graph_{datetime.now().timestamp()}"
+    read_users = next(
+        p["id"]
+        for p in client.get("/permissions/", headers=admin_headers).json()
+        if p["resource"] == "users" and p["action"] == "read"
+    )
+    role = client.post(
+        "/roles/", json={"name": unique_name, "permission_ids": [read_users]}, headers=admin_headers
+    ).json()
+    client.post(
+        "/users/",
+        json={
+            "username": unique_name,
+            "email": f"{unique_name}@gm.com",
+            "password": "password123",
+            "role_ids": [role["id"]],
+        },
+        headers=admin_headers,
+    )
+    headers = get_auth_headers(client, unique_name, "password123")
+    assert client.get("/users/", headers=headers).status_code == 200
+
+    assert permission_graph.wait_reloaded()
+    loads = metrics.get("permission_graph.loads")
+    res = client.patch(f"/roles/{role['id']}", json={"permission_ids": []}, headers=admin_headers)
+    assert res.status_code == 200
+    # Reloaded once, before the write returned
+    assert metrics.get("permission_graph.loads") == loads + 1
+
+    # The cached user keeps its role ids; the graph supplies the new grants
+    assert client.get("/users/", headers=headers).status_code == 403
+    me = client.get("/auth/me", headers=headers).json()
+    assert me["roles"][0]["permissions"] == []
+
+
+def test_wildcard_grants_match():
+    matcher = PermissionMatcher(["users:*", "*:read", "reports.*:export", "*.profile:update"])
+    assert matcher.allows("users:delete")
+    assert matcher.allows("roles:read")
+    assert matcher.allows("users.profile.avatar:read")
+    assert matcher.allows("reports.monthly:export")
+    assert matcher.allows("reports.monthly.q1:export")
+    assert not matcher.allows("reports:export")
+    assert matcher.allows("users.profile:update")
+    assert not matcher.allows("users.profile.avatar:update")
+    assert not matcher.allows("users.profile:delete")
+    assert not matcher.allows("roles:update")
+    assert PermissionMatcher(["*:*"]).allows("anything.at.all:whatever")
+    assert not PermissionMatcher([]).allows("users:read")
+
+
+def test_wildcard_permission_grants_access(admin_headers):
+    unique_name = f"test_wildcard_{datetime.now().timestamp()}".replace(".", "_")
+    res = client.post(
+        "/permissions/",
+        json={"name": unique_name, "resource": "roles", "action": "*"},
+        headers=admin_headers,
+    )
+    assert res.status_code == 201
+    role = client.post(
+        "/roles/", json={"name": unique_name, "permission_ids": [res.json()["id"]]}, headers=admin_headers
+    ).json()
+    client.post(
+        "/users/",
+        json={
+            "username": unique_name,
+            "email": f"{unique_name}@gm.com",
+            "password": "password123",
+            "role_ids": [role["id"]],
+        },
+        headers=admin_headers,
+    )
+    headers = get_auth_headers(client, unique_name, "password123")
+    assert permission_graph.wait_reloaded()
+    assert client.get("/roles/", headers=headers).status_code == 200
+    assert client.post("/roles/", json={"name": f"{unique_name}_made"}, headers=headers).status_code == 201
+    assert client.get("/users/", headers=headers).status_code == 403
+
+    res = client.post(
+        "/permissions/",
+        json={"name": f"{unique_name}_bad", "resource": "users:", "action": "read"},
+        headers=admin_headers,
+    )
+    assert res.status_code == 422
+
+
+def test_user_permission_helpers_use_the_graph():
+    from services.user_service import user_service
+
+    db = db_manager.SessionLocal()
+    try:
+        admin = user_service.get_with_role_ids(db, "admin")
+        assert admin.get_permissions() == ["*:*"]
+        assert admin.has_permission("users", "delete")
+        assert admin.has_permission("reports.monthly", "export")
+    finally:
+        db.close()
+
+
+def test_remote_invalidation_reloads_graph():
+    assert permission_graph.wait_reloaded()
+    loads = metrics.get("permission_graph.loads")
+    invalidation_bus._receive(f"{invalidation_bus.sender}|permission_graph|")
+    assert permission_graph.wait_reloaded()
+    assert metrics.get("permission_graph.loads") == loads
+
+    invalidation_bus._receive("another-worker|permission_graph|")
+    assert permission_graph.wait_reloaded()
+    assert metrics.get("permission_graph.loads") == loads + 1
+
+
+class RecordingChannel(InvalidationChannel):
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, message):
+        self.messages.append(message)
+
+
+def test_writes_forward_invalidations_through_the_outbox(admin_headers, monkeypatch):
+    channel = RecordingChannel()
+    monkeypatch.setattr(invalidation_bus, "channel", channel)
+    role = client.post(
+        "/roles/", json={"name": f"test_forward_{datetime.now().timestamp()}"}, headers=admin_headers
+    ).json()
+    assert permission_graph.wait_reloaded()
+    # Reloaded here on commit, but the other workers only hear of it from the job
+    assert channel.messages == []
+
+    asyncio.run(job_queue.drain())
+    assert channel.messages == [f"{invalidation_bus.sender}|permission_graph|"]
+    client.delete(f"/roles/{role['id']}", headers=admin_headers)
+
+
+def test_failed_forward_is_retried(admin_headers, monkeypatch):
+    hub_end, worker_end = PipeHub().pipe()
+    hub_end.close()
+    monkeypatch.setattr(invalidation_bus, "channel", PipeChannel(worker_end))
+    monkeypatch.setattr(job_queue, "retry_backoff", 0)
+    monkeypatch.setattr(job_queue, "max_attempts", 2)
+    role = client.post(
+        "/roles/", json={"name": f"test_retry_{datetime.now().timestamp()}"}, headers=admin_headers
+    ).json()
+
+    asyncio.run(job_queue.drain())
+    db = db_manager.SessionLocal()
+    try:
+        job = db.scalars(
+            select(OutboxJob).where(OutboxJob.name == FORWARD_JOB).order_by(OutboxJob.id.desc())
+        ).first()
+        # The closed pipe failed every attempt instead of dropping the message
+        assert (job.status, job.attempts) == (DEAD, 2)
+        db.delete(job)
+        db.commit()
+    finally:
+        db.close()
+    monkeypatch.setattr(invalidation_bus, "channel", LocalChannel())
+    client.delete(f"/roles/{role['id']}", headers=admin_headers)
+
+
+def test_pipe_hub_relays_between_workers():
+    hub = PipeHub()
+    buses, received = [], []
+    for pid in (1, 2):
+        hub_end, worker_end = hub.pipe()
+        hub.add(pid, hub_end)
+        bus = InvalidationBus(LocalChannel())
+        bus.set_channel(PipeChannel(worker_end))
+        bus.sender = f"worker-{pid}"
+        bus.on("user")(lambda key, pid=pid: received.append((pid, key)))
+        bus.start()
+        buses.append(bus)
+    hub.start()
+
+    buses[0].publish("user", "42")
+    deadline = time.monotonic() + 5
+    while len(received) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(received) == [(1, "42"), (2, "42")]
+
+    for bus in buses:
+        bus.stop()
+    for pid in (1, 2):
+        hub.remove(pid)
@@ -8,6 +8,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main import app
+from services.permission_graph import permission_graph
 
 client = TestClient(app)
 
@@ -84,6 +85,21 @@ def test_update_role(auth_client):
     assert_result(res, f"{unique_name}_updated")
 
 
+def test_patch_role(auth_client):
+    role_id, unique_name, _res = mock_data(auth_client)
+    payload = {"description": "patched"}
+
+    res = auth_client.patch(f"/roles/{role_id}", json=payload)
+    assert_result(res, unique_name)
+    assert res.json()["description"] == "patched"
+    assert res.json()["updated_at"] is not None
+
+
+def test_patch_missing_role(auth_client):
+    res = auth_client.patch("/roles/999999999", json={"description": "patched"})
+    assert res.status_code == 404
+
+
 def test_delete_role(auth_client):
     role_id, unique_name, _res = mock_data(auth_client)
 
@@ -93,3 +109,161 @@ def test_delete_role(auth_client):
 
     res = auth_client.get(f"/roles/{role_id}")
     assert res.status_code == 404
+
+
+def test_role_change_feed(auth_client):
+    version = int(auth_client.get("/roles/").headers["X-Change-Version"])
+
+    role_id, unique_name, _res = mock_data(auth_client)
+    auth_client.patch(f"/roles/{role_id}", json={"description": "changed"})
+    auth_client.delete(f"/roles/{role_id}")
+
+    res = auth_client.get("/roles/changes", params={"since": version})
+    assert res.status_code == 200
+    data = res.json()
+    changes = [change for change in data["changes"] if change["id"] == role_id]
+    assert [change["action"] for change in changes] == ["created", "updated", "deleted"]
+    assert changes[0]["data"]["name"] == unique_name
+    assert changes[0]["data"]["permission_ids"] == []
+    assert changes[1]["data"]["description"] == "changed"
+    assert changes[2]["data"] is None
+    assert data["version"] >= changes[-1]["version"]
+
+    # Caught up: an immediate poll returns nothing new
+    res = auth_client.get("/roles/changes", params={"since": data["version"]})
+    assert res.json() == {"version": data["version"], "changes": []}
+
+
+def test_role_inheritance(auth_client):
+    stamp = datetime.now().timestamp()
+    permission = auth_client.post(
+        "/permissions/",
+        json={
+            "name": f"Inherited {stamp}",
+            "description": "Granted through a parent role",
+            "resource": f"inherited_{stamp}",
+            "action": "read",
+        },
+    ).json()
+    base = auth_client.post(
+        "/roles/", json={"name": f"base_{stamp}", "permission_ids": [permission["id"]]}
+    ).json()
+    lead = auth_client.post(
+        "/roles/", json={"name": f"lead_{stamp}", "parent_ids": [base["id"]]}
+    ).json()
+    head = auth_client.post(
+        "/roles/", json={"name": f"head_{stamp}", "parent_ids": [lead["id"]]}
+    ).json()
+    assert lead["parent_ids"] == [base["id"]]
+    assert head["permissions"] == []
+
+    res = auth_client.get(f"/roles/{head['id']}/permissions")
+    assert res.status_code == 200
+    assert [p["id"] for p in res.json()] == [permission["id"]]
+
+    # A role can't inherit from itself or a descendant
+    res = auth_client.patch(f"/roles/{base['id']}", json={"parent_ids": [head["id"]]})
+    assert res.status_code == 400
+    res = auth_client.patch(f"/roles/{base['id']}", json={"parent_ids": [base["id"]]})
+    assert res.status_code == 400
+
+    # Deleting the middle role cuts the chain for its descendants
+    assert auth_client.delete(f"/roles/{lead['id']}").status_code == 200
+    assert auth_client.get(f"/roles/{head['id']}/permissions").json() == []
+    assert auth_client.get(f"/roles/{head['id']}").json()["parent_ids"] == []
+
+
+def test_inherited_permissions_are_enforced(auth_client):
+    stamp = datetime.now().timestamp()
+    reader = auth_client.post("/roles/", json={"name": f"reader_{stamp}"}).json()
+    permissions = auth_client.get("/permissions/?limit=1000").json()
+    roles_read = next(p["id"] for p in permissions if (p["resource"], p["action"]) == ("roles", "read"))
+    auth_client.patch(f"/roles/{reader['id']}", json={"permission_ids": [roles_read]})
+    child = auth_client.post("/roles/", json={"name": f"child_{stamp}", "parent_ids": [reader["id"]]}).json()
+    auth_client.post(
+        "/users/",
+        json={
+            "username": f"child_{stamp}",
+            "email": f"child_{int(stamp * 1000)}@example.com",
+            "password": "secret123",
+            "role_ids": [child["id"]],
+        },
+    )
+    headers = get_auth_headers(TestClient(app), f"child_{stamp}", "secret123")
+    assert permission_graph.wait_reloaded()
+    assert TestClient(app).get("/roles/", headers=headers).status_code == 200
+    assert TestClient(app).get("/users/", headers=headers).status_code == 403
+
+
+def test_concurrent_inheritance_cannot_form_a_cycle(auth_client, monkeypatch):
+    import threading
+    import time
+    from database import role_closure
+
+    stamp = datetime.now().timestamp()
+    first = auth_client.post("/roles/", json={"name": f"first_{stamp}"}).json()
+    second = auth_client.post("/roles/", json={"name": f"second_{stamp}"}).json()
+
+    inherits = role_closure.inherits
+
+    def slow_inherits(*args):
+        found = inherits(*args)
+        time.sleep(0.3)  # both checks would overlap without the lock
+        return found
+
+    monkeypatch.setattr(role_closure, "inherits", slow_inherits)
+    results = []
+
+    def link(child, parent):
+        res = client.patch(f"/roles/{child['id']}", json={"parent_ids": [parent["id"]]})
+        results.append(res.status_code)
+
+    threads = [
+        threading.Thread(target=link, args=(first, second)),
+        threading.Thread(target=link, args=(second, first)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [200, 400]
+
+
+def test_closure_rebuild_stops_on_a_cycle():
+    from sqlalchemy import delete, insert, select
+    from database import role_closure
+    from database.connection import db_manager
+    from models.models import Role, role_inheritance, role_closure as closure
+
+    stamp = datetime.now().timestamp()
+    db = db_manager.SessionLocal()
+    try:
+        a, b = Role(name=f"cycle_a_{stamp}"), Role(name=f"cycle_b_{stamp}")
+        db.add_all([a, b])
+        db.flush()
+        # Written behind the service's back
+        db.execute(insert(role_inheritance), [
+            {"role_id": a.id, "parent_id": b.id}, {"role_id": b.id, "parent_id": a.id},
+        ])
+        role_closure.refresh(db, [a.id, b.id])
+        depths = dict(db.execute(
+            select(closure.c.inherited_id, closure.c.depth).where(closure.c.role_id == a.id)
+        ).all())
+        assert depths == {a.id: 0, b.id: 1}
+        db.execute(delete(role_inheritance).where(role_inheritance.c.role_id.in_([a.id, b.id])))
+        role_closure.refresh(db, [a.id, b.id])
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_change_version_is_per_resource(auth_client):
+    version = int(auth_client.get("/roles/").headers["X-Change-Version"])
+    stamp = datetime.now().timestamp()
+    auth_client.post(
+        "/users/",
+        json={"username": f"versioned_{stamp}", "email": f"versioned_{int(stamp * 1000)}@gm.com", "password": "secret123"},
+    )
+    assert int(auth_client.get("/roles/").headers["X-Change-Version"]) == version
+    res = auth_client.get("/roles/changes", params={"since": version})
+    assert res.json() == {"version": version, "changes": []}
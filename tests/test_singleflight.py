@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app  # noqa: F401 - configures the database
+from database.connection import db_manager
+from services.metrics import metrics
+from services.permission_graph import permission_graph
+from services.role_service import role_service
+from services.singleflight import SingleFlight
+
+
+def run_concurrently(count, target):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def slow(calls, result=None, error=None, delay=0.2):
+    def func():
+        calls.append(1)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return func
+
+
+def test_concurrent_calls_share_one_execution():
+    flight, calls, shared = SingleFlight(), [], object()
+    results, errors = run_concurrently(8, lambda: flight.do("key", slow(calls, shared)))
+    assert not errors
+    assert len(calls) == 1
+    assert len(results) == 8 and all(result is shared for result in results)
+    assert flight.in_flight() == 0
+
+
+def test_error_reaches_every_waiter():
+    flight, calls = SingleFlight(), []
+    error = RuntimeError("database is down")
+    results, errors = run_concurrently(5, lambda: flight.do("key", slow(calls, error=error)))
+    assert not results
+    assert len(calls) == 1
+    assert len(errors) == 5 and all(e is error for e in errors)
+    # Nothing is cached: the next call runs again
+    assert flight.do("key", lambda: "recovered") == "recovered"
+
+
+def test_waiter_times_out_with_504():
+    flight, calls = SingleFlight(timeout=0.05), []
+    leader = threading.Thread(target=flight.do, args=("key", slow(calls, "late", delay=0.5)))
+    leader.start()
+    time.sleep(0.05)
+    with pytest.raises(HTTPException) as exc:
+        flight.do("key", slow(calls))
+    leader.join()
+    assert exc.value.status_code == 504
+    assert len(calls) == 1
+
+
+def test_late_caller_does_not_join_an_older_call():
+    flight, calls = SingleFlight(), []
+    leader = threading.Thread(target=flight.do, args=("key", slow(calls, "stale", delay=0.3)))
+    leader.start()
+    time.sleep(0.05)
+    # Arrived after the running call started: it may have missed a write
+    assert flight.do("key", slow(calls, "fresh", delay=0.1), not_before=time.monotonic()) == "fresh"
+    leader.join()
+    assert len(calls) == 2
+    assert flight.in_flight() == 0
+
+
+def test_shared_get_merges_into_each_session():
+    role = role_service.get_multi(db_manager.SessionLocal(), limit=1)[0]
+    options = role_service.load_options("full")
+
+    def read():
+        db = db_manager.SessionLocal()
+        try:
+            found = role_service.get(db, role.id, options=options, shared=True)
+            assert found in db
+            return found.name, len(found.permissions)
+        finally:
+            db.close()
+
+    results, errors = run_concurrently(8, read)
+    assert not errors
+    assert len(set(results)) == 1
+
+
+def test_reload_requests_coalesce():
+    assert permission_graph.wait_reloaded()
+    loads = metrics.get("permission_graph.loads")
+    requested = permission_graph._requested
+    # Hold the graph lock as a running reload would while requests pile up
+    with permission_graph._lock:
+        threads = [threading.Thread(target=permission_graph.reload) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+    while permission_graph._requested < requested + 10:
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    assert metrics.get("permission_graph.loads") == loads + 1
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from config import settings
+from bench_startup import ROOT, measure_startup
+
+
+def test_startup_within_budget():
+    # Best of three to keep a noisy machine from failing the build
+    created = min(measure_startup()[1] for _ in range(3))
+    assert created < settings.startup_budget_seconds
+
+
+def test_heavy_imports_are_deferred():
+    script = (
+        "import sys, main; main.create_app(); "
+        "print(' '.join(m for m in ('jose', 'passlib') if m in sys.modules))"
+    )
+    env = dict(os.environ, DATABASE_URL="sqlite://")
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+        env=env,
+    ).stdout
+    assert output.strip() == ""
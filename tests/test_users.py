@@ -1,13 +1,17 @@
+import json
 import os
 import sys
 
 import pytest
 from fastapi.testclient import TestClient
-from datetime import datetime
+from datetime import datetime, timedelta
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main import app
+from database.connection import db_manager
+from models.models import User
+from services.user_service import user_service
 
 client = TestClient(app)
 
@@ -81,6 +85,17 @@ def test_update_user(auth_client):
     assert_result(res, f"{username}_updated")
 
 
+def test_patch_user(auth_client):
+    user_id, username, _res = mock_user(auth_client)
+    role_id = auth_client.get("/roles/").json()[0]["id"]
+
+    payload = {"email": f"{username}_patched@gm.com", "role_ids": [role_id]}
+    res = auth_client.patch(f"/users/{user_id}", json=payload)
+    assert_result(res, username)
+    assert res.json()["email"] == f"{username}_patched@gm.com"
+    assert [role["id"] for role in res.json()["roles"]] == [role_id]
+
+
 def test_delete_user(auth_client):
     user_id, username, _res = mock_user(auth_client)
 
@@ -89,4 +104,236 @@ def test_delete_user(auth_client):
     assert res.json()["message"] == "User deleted successfully"
 
     res = auth_client.get(f"/users/{user_id}")
-    assert res.status_code == 404
\ No newline at end of file
+    assert res.status_code == 404
+
+
+def test_soft_deleted_username_can_be_reused(auth_client):
+    user_id, username, _res = mock_user(auth_client)
+    payload = {"email": f"{username}@gm.com", "username": username, "password": "password123"}
+    assert auth_client.post("/users/", json=payload).status_code == 400
+
+    assert auth_client.delete(f"/users/{user_id}").status_code == 200
+    new_id, _name, res = mock_user(auth_client, username)
+    assert res.status_code == 201
+    assert new_id != user_id
+
+
+def test_soft_deleted_user_is_purged(auth_client):
+    user_id, username, _res = mock_user(auth_client)
+    assert auth_client.delete(f"/users/{user_id}").status_code == 200
+
+    db = db_manager.SessionLocal()
+    try:
+        db_user = db.get(User, user_id)
+        assert db_user is not None and db_user.deleted_at is not None
+        assert user_service.get(db, user_id) is None
+
+        deleted_before = datetime.now(db_user.deleted_at.tzinfo) + timedelta(days=1)
+        while user_service.purge_deleted(db, deleted_before):
+            pass
+        db.expire_all()
+        assert db.get(User, user_id) is None
+    finally:
+        db.close()
+
+
+def test_user_change_feed_hides_password_hash(auth_client):
+    version = int(auth_client.get("/users/").headers["X-Change-Version"])
+    user_id, username, _res = mock_user(auth_client)
+
+    res = auth_client.get("/users/changes", params={"since": version, "wait": 1})
+    assert res.status_code == 200
+    created = [change for change in res.json()["changes"] if change["id"] == user_id]
+    assert created[0]["action"] == "created"
+    assert created[0]["data"]["username"] == username
+    assert "hashed_password" not in created[0]["data"]
+    assert created[0]["data"]["role_ids"] == []
+
+
+def test_batch_get_users_by_ids(auth_client):
+    first_id, first_name, _res = mock_user(auth_client)
+    second_id, second_name, _res = mock_user(auth_client)
+
+    res = auth_client.get("/users/", params={"ids": f"{second_id},{first_id},999999"})
+    assert res.status_code == 200
+    data = res.json()
+    assert [user["username"] for user in data] == [second_name, first_name]
+    assert "roles" in data[0]
+
+
+def test_batch_get_users_expand_modes(auth_client):
+    role_id = auth_client.get("/roles/").json()[0]["id"]
+    user_id, username, _res = mock_user(auth_client)
+    auth_client.patch(f"/users/{user_id}", json={"role_ids": [role_id]})
+
+    res = auth_client.get("/users/", params={"ids": str(user_id), "expand": "ids"})
+    assert res.status_code == 200
+    assert res.json()[0]["role_ids"] == [role_id]
+    assert "roles" not in res.json()[0]
+
+    res = auth_client.get(f"/users/{user_id}", params={"expand": "none"})
+    assert res.status_code == 200
+    assert res.json()["username"] == username
+    assert "roles" not in res.json() and "role_ids" not in res.json()
+
+    res = auth_client.get("/users/", params={"expand": "none"})
+    assert res.status_code == 200
+    assert "X-Change-Version" in res.headers
+
+
+def test_list_rows_match_orm_reads(auth_client):
+    role_id = auth_client.get("/roles/").json()[0]["id"]
+    user_id, _, _res = mock_user(auth_client)
+    auth_client.patch(f"/users/{user_id}", json={"role_ids": [role_id]})
+
+    for expand in ("full", "ids", "none", "normalized"):
+        listed = auth_client.get("/users/", params={"limit": 20, "expand": expand}).json()
+        items = listed["items"] if expand == "normalized" else listed
+        ids = ",".join(str(user["id"]) for user in items)
+        # Batch reads by id still go through the ORM
+        batch = auth_client.get("/users/", params={"ids": ids, "expand": expand}).json()
+        assert listed == batch
+
+
+def test_batch_get_users_rejects_bad_ids(auth_client):
+    assert auth_client.get("/users/", params={"ids": "1,abc"}).status_code == 422
+    assert auth_client.get("/users/", params={"expand": "everything"}).status_code == 422
+
+
+def test_normalized_shape_emits_related_rows_once(auth_client):
+    role_id = auth_client.get("/roles/").json()[0]["id"]
+    first_id, _, _res = mock_user(auth_client)
+    second_id, _, _res = mock_user(auth_client)
+    for user_id in (first_id, second_id):
+        auth_client.patch(f"/users/{user_id}", json={"role_ids": [role_id]})
+
+    res = auth_client.get(
+        "/users/", params={"ids": f"{first_id},{second_id}", "expand": "normalized"}
+    )
+    assert res.status_code == 200
+    data = res.json()
+    assert [user["role_ids"] for user in data["items"]] == [[role_id], [role_id]]
+    assert [role["id"] for role in data["roles"]] == [role_id]
+    permission_ids = [permission["id"] for permission in data["permissions"]]
+    assert permission_ids == sorted(set(permission_ids))
+    assert set(data["roles"][0]["permission_ids"]) == set(permission_ids)
+
+
+def test_search_users_by_partial_name(auth_client):
+    unique = f"{datetime.now().timestamp():.6f}".replace(".", "")
+    user_id, username, _res = mock_user(auth_client, f"searchable_{unique}")
+
+    res = auth_client.get("/users/search", params={"q": unique[-8:]})
+    assert res.status_code == 200
+    assert [user["id"] for user in res.json()] == [user_id]
+
+    res = auth_client.get("/users/search", params={"q": f"SEARCHABLE_{unique}@gm", "expand": "none"})
+    assert res.json()[0]["username"] == username
+
+    # Prefix matches rank first; short queries use the prefix path
+    res = auth_client.get("/users/search", params={"q": "ad", "limit": 5})
+    assert res.json()[0]["username"] == "admin"
+    # ... and are case-insensitive, like the longer ones
+    res = auth_client.get("/users/search", params={"q": "AD", "limit": 5})
+    assert res.json()[0]["username"] == "admin"
+    res = auth_client.get("/users/search", params={"q": "ADM", "limit": 5})
+    assert res.json()[0]["username"] == "admin"
+
+    auth_client.patch(
+        f"/users/{user_id}",
+        json={"username": f"renamed_{unique}", "email": f"renamed_{unique}@gm.com"},
+    )
+    assert auth_client.get("/users/search", params={"q": f"searchable_{unique}"}).json() == []
+    auth_client.delete(f"/users/{user_id}")
+    assert auth_client.get("/users/search", params={"q": f"renamed_{unique}"}).json() == []
+
+
+def test_search_skips_deleted_rows_before_the_candidate_limit(auth_client, monkeypatch):
+    from database import search
+
+    unique = str(datetime.now().timestamp()).replace(".", "")
+    deleted_id, _, _res = mock_user(auth_client, f"crowded_{unique}_a")
+    _, live_name, _res = mock_user(auth_client, f"crowded_{unique}_b")
+    auth_client.delete(f"/users/{deleted_id}")
+
+    monkeypatch.setattr(search, "MAX_CANDIDATES", 1)
+    res = auth_client.get("/users/search", params={"q": f"crowded_{unique}"})
+    assert [user["username"] for user in res.json()] == [live_name]
+
+
+def test_search_limit_is_bounded(auth_client):
+    res = auth_client.get("/users/search", params={"q": "test", "limit": 1000})
+    assert res.status_code == 422
+
+
+def test_create_user_with_idempotency_key_replays(auth_client, monkeypatch):
+    from services.auth_service import auth_service
+
+    unique_name = f"test_user_{datetime.now().timestamp()}"
+    payload = {"email": f"{unique_name}@gm.com", "username": unique_name, "password": "password123"}
+    headers = {"Idempotency-Key": f"create-{unique_name}"}
+
+    first = auth_client.post("/users/", json=payload, headers=headers)
+    assert first.status_code == 201
+
+    hashes = []
+    monkeypatch.setattr(auth_service, "get_password_hash", lambda password: hashes.append(password))
+    retry = auth_client.post("/users/", json=payload, headers=headers)
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert hashes == []
+
+    # The stored fingerprint is keyed: no bare hash of a payload holding the password
+    import hashlib
+    from services.idempotency import idempotency
+
+    admin_id = auth_client.get("/auth/me").json()["id"]
+    scope = idempotency.scope(admin_id, "POST", "/users/", headers["Idempotency-Key"])
+    claim = idempotency.backend.claim(scope, "", 60)
+    from schemas.schemas import UserCreate
+
+    body = UserCreate(**payload).model_dump_json().encode()
+    assert claim.fingerprint == idempotency.fingerprint(body)
+    assert claim.fingerprint != hashlib.sha256(body).hexdigest()
+
+    changed = auth_client.post("/users/", json={**payload, "email": f"other_{unique_name}@gm.com"}, headers=headers)
+    assert changed.status_code == 422
+
+
+def test_idempotency_key_in_progress_and_failures(auth_client):
+    from services.idempotency import idempotency
+
+    user_id, username, _res = mock_user(auth_client)
+    admin_id = auth_client.get("/auth/me").json()["id"]
+    key = f"delete-{username}"
+    scope = idempotency.scope(admin_id, "DELETE", f"/users/{user_id}", key)
+    # Another request with the same key is still running
+    assert idempotency.backend.claim(scope, idempotency.fingerprint(b""), 60) is None
+    res = auth_client.delete(f"/users/{user_id}", headers={"Idempotency-Key": key})
+    assert res.status_code == 409
+    idempotency.backend.release(scope)
+
+    res = auth_client.delete(f"/users/{user_id}", headers={"Idempotency-Key": key})
+    assert res.status_code == 200
+    replay = auth_client.delete(f"/users/{user_id}", headers={"Idempotency-Key": key})
+    assert replay.status_code == 200
+    assert replay.json() == {"message": "User deleted successfully"}
+
+    # 404s are stored too, so a retry does not turn into a different answer
+    res = auth_client.delete("/users/999999", headers={"Idempotency-Key": key + "-missing"})
+    assert res.status_code == 404
+    assert auth_client.delete("/users/999999", headers={"Idempotency-Key": key + "-missing"}).headers[
+        "Idempotent-Replayed"
+    ] == "true"
+
+
+def test_openapi_documents_every_expand_shape(auth_client):
+    spec = auth_client.get("/openapi.json").json()
+    schema = spec["paths"]["/users/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    refs = json.dumps(schema)
+    for name in ("UserResponse", "UserWithIds", "UserSummary", "UserPageNormalized"):
+        assert f"#/components/schemas/{name}" in refs
+    assert set(spec["components"]["schemas"]["UserPageNormalized"]["properties"]) == {
+        "items", "roles", "permissions"
+    }